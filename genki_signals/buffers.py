@@ -2,6 +2,7 @@ import logging
 import re
 from abc import ABC, abstractmethod
 from collections.abc import MutableMapping
+from functools import partial
 
 import numpy as np
 import pandas as pd
@@ -16,6 +17,290 @@ def _slice(data, length, end=True):
         return {k: v[..., :length] for k, v in data.items()}
 
 
+class ArrayStorage(ABC):
+    """
+    Backing store for a single array where the last dimension is the buffer dimension.
+    Used by `NumpyBuffer` and `DataBuffer` for storage modes other than "concat".
+    """
+
+    @abstractmethod
+    def extend(self, data):
+        pass
+
+    @abstractmethod
+    def view(self, n=None):
+        """View the first n elements (all if n is None)"""
+        pass
+
+    @abstractmethod
+    def popleft(self, n):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    @abstractmethod
+    def freeze(self):
+        """Returns a tight array of the contents that isn't modified by later writes to the storage"""
+        pass
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+
+class RingArray(ArrayStorage):
+    """
+    Fixed capacity circular storage. An array of shape (*shape, capacity) is allocated on the first call to extend
+    and incoming data is written into it in place, overwriting the oldest elements when full.
+
+    Views are slices of the backing array when the requested elements don't wrap around its end, otherwise a
+    single copy is made. Since the backing array is reused, views are only valid until the next call to extend.
+    """
+
+    def __init__(self, capacity):
+        if capacity is None or capacity < 1:
+            raise ValueError("Capacity of a ring array has to be at least 1")
+        self.capacity = capacity
+        self._array = None
+        self._start = 0
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def _reserve(self, data):
+        if self._array is None or (self._len == 0 and self._array.shape[:-1] != data.shape[:-1]):
+            self._array = np.empty((*data.shape[:-1], self.capacity), dtype=data.dtype)
+            self._start = 0
+            return
+        if self._array.shape[:-1] != data.shape[:-1]:
+            raise ValueError(f"Expected shape {self._array.shape[:-1]} along the non-buffer dims, got {data.shape=}")
+        dtype = np.result_type(self._array, data)
+        if dtype != self._array.dtype:
+            # Upcast like np.concatenate would, e.g. when floats are written to an int buffer
+            self._array = self._array.astype(dtype)
+
+    def extend(self, data):
+        data = np.asarray(data)
+        self._reserve(data)
+        n = data.shape[-1]
+        cap = self.capacity
+        if n >= cap:
+            self._array[...] = data[..., n - cap:]
+            self._start, self._len = 0, cap
+            return
+
+        end = (self._start + self._len) % cap
+        first = min(n, cap - end)
+        self._array[..., end : end + first] = data[..., :first]
+        if first < n:
+            self._array[..., : n - first] = data[..., first:]
+
+        overflow = self._len + n - cap
+        if overflow > 0:
+            self._start = (self._start + overflow) % cap
+            self._len = cap
+        else:
+            self._len += n
+
+    def view(self, n=None):
+        if self._array is None:
+            return np.empty((0,))
+        k = self._len if n is None else min(n, self._len)
+        stop = self._start + k
+        if stop <= self.capacity:
+            return self._array[..., self._start : stop]
+        return np.concatenate([self._array[..., self._start :], self._array[..., : stop - self.capacity]], axis=-1)
+
+    def popleft(self, n):
+        out = self.view(n)
+        if out.base is self._array:
+            # The popped slots are overwritten by the next extend
+            out = out.copy()
+        k = out.shape[-1]
+        self._start = (self._start + k) % self.capacity
+        self._len -= k
+        return out
+
+    def clear(self):
+        self._start = 0
+        self._len = 0
+
+    def freeze(self):
+        return self.view().copy()
+
+    def __repr__(self):
+        shape = None if self._array is None else (*self._array.shape[:-1], self._len)
+        return f"{self.__class__.__name__}(capacity={self.capacity}, shape={shape})"
+
+
+class GrowableArray(ArrayStorage):
+    """
+    Unbounded storage with amortized O(1) appends. The backing array doubles in capacity when full, like a vector.
+
+    Data is only ever appended past the end of the live elements, and reallocations copy into a new array, so views
+    stay valid after later extends. Use `shrink_to_fit` to drop the spare capacity.
+    """
+
+    def __init__(self, initial_capacity=256):
+        if initial_capacity < 1:
+            raise ValueError("Initial capacity has to be at least 1")
+        self.initial_capacity = initial_capacity
+        self._array = None
+        self._start = 0
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def capacity(self):
+        return 0 if self._array is None else self._array.shape[-1]
+
+    def _reallocate(self, capacity, dtype, shape):
+        new_array = np.empty((*shape, capacity), dtype=dtype)
+        if self._len > 0:
+            new_array[..., : self._len] = self.view()
+        self._array = new_array
+        self._start = 0
+
+    def _reserve(self, data):
+        n = data.shape[-1]
+        if self._array is None or (self._len == 0 and self._array.shape[:-1] != data.shape[:-1]):
+            self._len = 0
+            self._reallocate(max(n, self.initial_capacity), data.dtype, data.shape[:-1])
+            return
+        if self._array.shape[:-1] != data.shape[:-1]:
+            raise ValueError(f"Expected shape {self._array.shape[:-1]} along the non-buffer dims, got {data.shape=}")
+        dtype = np.result_type(self._array, data)
+        if dtype != self._array.dtype or self._start + self._len + n > self.capacity:
+            # The capacity is 0 after shrinking an empty array to fit
+            capacity = max(self.capacity, self.initial_capacity)
+            while self._len + n > capacity // 2:
+                capacity *= 2
+            self._reallocate(capacity, dtype, data.shape[:-1])
+
+    def extend(self, data):
+        data = np.asarray(data)
+        self._reserve(data)
+        end = self._start + self._len
+        n = data.shape[-1]
+        self._array[..., end : end + n] = data
+        self._len += n
+
+    def view(self, n=None):
+        if self._array is None:
+            return np.empty((0,))
+        k = self._len if n is None else min(n, self._len)
+        return self._array[..., self._start : self._start + k]
+
+    def popleft(self, n):
+        out = self.view(n)
+        self._start += out.shape[-1]
+        self._len -= out.shape[-1]
+        return out
+
+    def clear(self):
+        self._array = None
+        self._start = 0
+        self._len = 0
+
+    def shrink_to_fit(self):
+        if self._array is not None and self.capacity != self._len:
+            self._array = self.view().copy()
+            self._start = 0
+
+    def freeze(self):
+        self.shrink_to_fit()
+        return self.view()
+
+    def __repr__(self):
+        shape = None if self._array is None else (*self._array.shape[:-1], self._len)
+        return f"{self.__class__.__name__}(capacity={self.capacity}, shape={shape})"
+
+
+class ChunkedArray(ArrayStorage):
+    """
+    Unbounded storage that keeps a list of the extended chunks and only concatenates them when viewed.
+
+    The chunks are stored by reference, so they shouldn't be modified after being passed to extend.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def _consolidate(self):
+        if len(self._chunks) > 1:
+            self._chunks = [np.concatenate(self._chunks, axis=-1)]
+
+    def extend(self, data):
+        data = np.asarray(data)
+        if self._chunks and self._chunks[0].shape[:-1] != data.shape[:-1]:
+            if self._len > 0:
+                shape = self._chunks[0].shape[:-1]
+                raise ValueError(f"Expected shape {shape} along the non-buffer dims, got {data.shape=}")
+            self._chunks = []
+        if data.shape[-1] > 0 or not self._chunks:
+            self._chunks.append(data)
+            self._len += data.shape[-1]
+
+    def view(self, n=None):
+        if not self._chunks:
+            return np.empty((0,))
+        if n is not None and n <= self._chunks[0].shape[-1]:
+            return self._chunks[0][..., :n]
+        self._consolidate()
+        return self._chunks[0] if n is None else self._chunks[0][..., :n]
+
+    def popleft(self, n):
+        out = self.view(n)
+        k = out.shape[-1]
+        self._chunks[0] = self._chunks[0][..., k:]
+        if len(self._chunks) > 1 and self._chunks[0].shape[-1] == 0:
+            self._chunks.pop(0)
+        self._len -= k
+        return out
+
+    def clear(self):
+        self._chunks = []
+        self._len = 0
+
+    def shrink_to_fit(self):
+        self._consolidate()
+        if self._chunks and self._chunks[0].base is not None:
+            # Release the memory of chunks that were partially popped or sliced from a larger array
+            self._chunks[0] = self._chunks[0].copy()
+
+    def freeze(self):
+        self.shrink_to_fit()
+        return self.view()
+
+    def __repr__(self):
+        shape = None if not self._chunks else (*self._chunks[0].shape[:-1], self._len)
+        return f"{self.__class__.__name__}(n_chunks={len(self._chunks)}, shape={shape})"
+
+
+def _storage_factory(storage, maxlen):
+    """Returns a callable that creates an empty `ArrayStorage` for the storage mode, or None for "concat" storage"""
+    if storage == "concat":
+        return None
+    if storage == "ring":
+        if maxlen is None:
+            raise ValueError("Ring storage requires maxlen to be set")
+        return partial(RingArray, maxlen)
+    if storage in ("growable", "chunked"):
+        if maxlen is not None:
+            raise ValueError(f"{storage.capitalize()} storage is unbounded and can't be used with maxlen")
+        return GrowableArray if storage == "growable" else ChunkedArray
+    raise ValueError(f"Unknown storage type: {storage}")
+
+
 class Buffer(ABC):
     """deque-like buffer for pandas dataframes and numpy arrays"""
 
@@ -81,7 +366,7 @@ class Buffer(ABC):
         if len(self) == 0:
             raise IndexError("Pop from empty buffer")
         data_out = self._slice(self._data, n)
-        n_to_keep = self._data.shape[-1] - n
+        n_to_keep = len(self) - n
         self._data = self._slice(self._data, n_to_keep, end=True) if n_to_keep > 0 else self._empty()
         return data_out
 
@@ -98,34 +383,68 @@ class DataBuffer(MutableMapping, Buffer):
     The arrays can have an arbitrary number of dimensions with any shapes, but
     the last dimension is synced across the arrays and is the buffer dimension.
     If maxlen is set, the buffer will be sliced to that length along the last dimension.
+
+    The storage argument selects how the arrays are stored:
+        "concat": each extend concatenates the new data onto the arrays (default)
+        "ring":   each key is stored in a preallocated `RingArray` of size maxlen, which is written in place.
+                  Arrays returned from the buffer may be views into the ring and are only valid until the next extend.
+        "growable": each key is stored in a `GrowableArray` that doubles its capacity when full (requires maxlen=None)
+        "chunked":  each key is stored as a list of chunks in a `ChunkedArray`, concatenated lazily when viewed
+                    (requires maxlen=None)
+
+    Use `freeze` to get a "concat" DataBuffer with tight arrays, e.g. before pickling or handing the data off.
     """
 
+    # Buffers pickled before storage modes were added don't have this attribute set
+    storage = "concat"
+
     # ========================
     #  Direct dict operations
     # ========================
-    def __init__(self, maxlen=None, data=None):
+    def __init__(self, maxlen=None, data=None, storage="concat"):
         super().__init__(maxlen, None)
+        self.storage = storage
+        self._new_storage = _storage_factory(storage, maxlen)
+
+        if self._new_storage is not None:
+            self._data = {}
+            if data is not None:
+                self.extend(data)
+            return
 
         self._data = data if data is not None else {}
         if self.maxlen is not None and len(self) > maxlen:
             self._data = _slice(self._data, self.maxlen, end=True)
 
+    @property
+    def _uses_storage(self):
+        return self.storage != "concat"
+
     def __len__(self):
         if self._data == {}:
             return 0
+        if self._uses_storage:
+            return max(len(v) for v in self._data.values())
         return max(v.shape[-1] for v in self._data.values())
 
+    def _get(self, key):
+        return self._data[key].view() if self._uses_storage else self._data[key]
+
     def __getitem__(self, k):
         if k not in self.keys():
             m = re.match(r"(.+)_(\d+)", k)
             if m is not None:
                 key, index = m.groups()
-                return self._data[key][int(index)]
+                return self._get(key)[int(index)]
             else:
                 raise KeyError(f"Key {k} not found in {self.keys()}")
-        return self._data[k]
+        return self._get(k)
 
     def __setitem__(self, key, value):
+        if self._uses_storage:
+            store = self._new_storage()
+            store.extend(value)
+            value = store
         self._data[key] = value
 
     def _add_series(self, key, value, max_size=None):
@@ -133,7 +452,7 @@ class DataBuffer(MutableMapping, Buffer):
             max_size = self.maxlen
         if max_size is not None and len(value) > max_size:
             value = value[-max_size:]
-        self._data[key] = value
+        self[key] = value
 
     def __delitem__(self, v):
         del self._data[v]
@@ -145,28 +464,67 @@ class DataBuffer(MutableMapping, Buffer):
         return self._data.keys()
 
     def values(self):
+        if self._uses_storage:
+            return self.as_dict().values()
         return self._data.values()
 
     def clear(self):
         self._data = {}
 
     def __copy__(self):
+        if self._uses_storage:
+            return DataBuffer(self.maxlen, self.as_dict(), storage=self.storage)
         return DataBuffer(self.maxlen, self._data.copy())
 
     def copy(self):
         return self.__copy__()
 
     def _init_cols_if_needed(self, data):
-        if len(self) == 0:
+        if len(self) == 0 and not self._uses_storage:
             self._data = {k: np.empty((*v.shape[:-1], 0), dtype=v.dtype) for k, v in data.items()}
 
     # ========================
     #  Buffer operations
     # ========================
 
+    def view(self, n=None):
+        if self._uses_storage:
+            return {k: v.view(n) for k, v in self._data.items()}
+        return super().view(n)
+
     def extend(self, data):
         """Appends data to the buffer and pops off and slices s.t. the length matches maxlen"""
-        super().extend(data)
+        if not self._uses_storage:
+            super().extend(data)
+            return
+        for k, v in data.items():
+            if k not in self._data:
+                self._data[k] = self._new_storage()
+            self._data[k].extend(v)
+
+    def popleft(self, n):
+        if not self._uses_storage:
+            return super().popleft(n)
+        if n == 0:
+            return self._empty()
+        if len(self) == 0:
+            raise IndexError("Pop from empty buffer")
+        return {k: v.popleft(n) for k, v in self._data.items()}
+
+    def shrink_to_fit(self):
+        """Release spare capacity held by growable and chunked storage"""
+        for v in self._data.values():
+            if hasattr(v, "shrink_to_fit"):
+                v.shrink_to_fit()
+
+    def freeze(self):
+        """
+        Returns a DataBuffer with "concat" storage holding tight arrays of the contents. The arrays are not affected
+        by later writes to this buffer.
+        """
+        if not self._uses_storage:
+            return DataBuffer(self.maxlen, self._data.copy())
+        return DataBuffer(self.maxlen, {k: v.freeze() for k, v in self._data.items()})
 
     def _empty(self):
         return {}
@@ -194,6 +552,27 @@ class DataBuffer(MutableMapping, Buffer):
         pts = {k: np.array([v]).T for k, v in pt.items()}
         self.extend(pts)
 
+    @classmethod
+    def from_records(cls, records, maxlen=None, chunked=False):
+        """
+        Create a DataBuffer from a list of data points, each a dict with a value (scalar or array) per key for one
+        time step. The values of each key are stacked once along a new last axis, instead of being concatenated onto
+        the buffer one data point at a time like `append` does.
+
+        With chunked=True each data point is a chunk of time steps along the last axis of each (non-scalar) value, and
+        the chunks are concatenated instead. Scalar values are still stacked, giving one value per chunk.
+        """
+        if len(records) == 0:
+            return cls(maxlen=maxlen)
+        data = {}
+        for key in records[0]:
+            values = [record[key] for record in records]
+            if chunked and np.ndim(values[0]) > 0:
+                data[key] = np.concatenate(values, axis=-1)
+            else:
+                data[key] = np.stack(values, axis=-1)
+        return cls(maxlen=maxlen, data=data)
+
     # ==============
     # Serialization
     # ==============
@@ -204,7 +583,7 @@ class DataBuffer(MutableMapping, Buffer):
 
     def to_dataframe(self):
         flat_data = {}
-        for k, v in self._data.items():
+        for k, v in self.as_dict().items():
             if v.ndim == 1:
                 flat_data[k] = v
             elif v.ndim == 2:
@@ -223,10 +602,12 @@ class DataBuffer(MutableMapping, Buffer):
         raise NotImplementedError
 
     def as_dict(self):
+        if self._uses_storage:
+            return {k: v.view() for k, v in self._data.items()}
         return self._data
 
     def __repr__(self):
-        data_str = "\n".join(f"{k}: {v.shape}" for k, v in self._data.items())
+        data_str = "\n".join(f"{k}: {v.shape}" for k, v in self.as_dict().items())
         return f"DataBuffer(max_size={self.maxlen}, data={data_str})"
 
 
@@ -249,15 +630,54 @@ class PandasBuffer(Buffer):
 
 
 class NumpyBuffer(Buffer):
-    def __init__(self, maxlen, n_cols=None):
+    """
+    A buffer for a single numpy array, the last dimension is the buffer dimension.
+    See `DataBuffer` for the available storage modes.
+    """
+
+    # Buffers pickled before storage modes were added don't have these attributes set
+    storage = "concat"
+    _store = None
+
+    def __init__(self, maxlen, n_cols=None, storage="concat"):
         if isinstance(n_cols, int):
             n_cols = (n_cols,)
         self.cols = n_cols
         super().__init__(maxlen, n_cols)
+        self.storage = storage
+        new_storage = _storage_factory(storage, maxlen)
+        self._store = new_storage() if new_storage is not None else None
 
     def __len__(self):
+        if self._store is not None:
+            return len(self._store)
         return self._data.shape[-1]
 
+    def view(self, n=None):
+        if self._store is None:
+            return super().view(n)
+        if len(self._store) == 0:
+            return self._empty()
+        return self._store.view(n)
+
+    def extend(self, data):
+        if self._store is None:
+            super().extend(data)
+            return
+        self._init_cols_if_needed(data)
+        self._validate(data)
+        if data.shape[-1] > 0:
+            self._store.extend(data)
+
+    def popleft(self, n):
+        if self._store is None:
+            return super().popleft(n)
+        if n == 0:
+            return self._empty()
+        if len(self) == 0:
+            raise IndexError("Pop from empty buffer")
+        return self._store.popleft(n)
+
     def _init_cols_if_needed(self, data):
         # don't set cols for empty data
         if data.shape[-1] == 0:
@@ -292,4 +712,4 @@ class NumpyBuffer(Buffer):
         self.extend(pt[..., None])
 
     def __repr__(self):
-        return f"{self.__class__.__name__}({self.maxlen, self._data.shape})"
+        return f"{self.__class__.__name__}({self.maxlen, self.view().shape})"
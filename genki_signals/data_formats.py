@@ -0,0 +1,219 @@
+"""
+This module contains readers and writers for the raw data file formats used by recorders and sessions.
+
+Chunked format (raw_data.chunks)
+--------------------------------
+An append-only file that starts with the 8 byte magic string `CHUNKED_MAGIC`, followed by any number of chunks.
+Each chunk is self-describing:
+
+    uint32 (little endian)  length of the header in bytes
+    header                  utf-8 json: {"arrays": [{"key": ..., "dtype": ..., "shape": [...], "offset": ...}]}
+    array data              raw C-ordered bytes of each array, `offset` is relative to the end of the header
+
+The header is padded with spaces and the arrays with zeros s.t. all array data is aligned to `ALIGNMENT` bytes.
+A chunk only depends on itself, so writing a chunk never requires reading the earlier ones.
+
+Columnar format (raw_data.columns)
+----------------------------------
+A directory with one .npy file per signal and an index.json mapping each signal to its file, dtype and shape.
+The arrays are stored in Fortran order, which makes the time axis (the last one) the slowest varying. This means
+a recording can be appended to each file as it comes in, and a time range of a memory mapped array is a
+contiguous range of bytes in the file.
+
+The .npy headers have a fixed size (`NPY_HEADER_SIZE`) s.t. they can be rewritten with the final shape in place.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import re
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from genki_signals.buffers import DataBuffer
+
+logger = logging.getLogger(__name__)
+
+CHUNKED_MAGIC = b"GSCHNK01"
+ALIGNMENT = 16
+
+_HEADER_LEN = struct.Struct("<I")
+
+
+def _padding(n: int) -> int:
+    return -n % ALIGNMENT
+
+
+def write_chunk(file, data) -> int:
+    """Append a chunk with the arrays in `data` to an open binary file, returns the number of bytes written"""
+    arrays = []
+    entries = []
+    offset = 0
+    for key, value in data.items():
+        value = np.ascontiguousarray(value)
+        if value.dtype.hasobject:
+            raise TypeError(f"Can't write signal '{key}' with dtype {value.dtype} to a chunked file")
+        entries.append({"key": key, "dtype": value.dtype.str, "shape": list(value.shape), "offset": offset})
+        arrays.append(value)
+        offset += value.nbytes + _padding(value.nbytes)
+
+    header = json.dumps({"arrays": entries}).encode("utf-8")
+    position = file.tell() + _HEADER_LEN.size + len(header)
+    header += b" " * _padding(position)
+
+    file.write(_HEADER_LEN.pack(len(header)))
+    file.write(header)
+    for value in arrays:
+        file.write(memoryview(value).cast("B"))
+        file.write(b"\0" * _padding(value.nbytes))
+    return _HEADER_LEN.size + len(header) + offset
+
+
+def iter_chunks(path: Path | str):
+    """
+    Iterate over the chunks in a chunked file, yielding a dict of arrays for each chunk.
+    The arrays are read-only views into a memory map of the file, so no data is read until it's accessed.
+    """
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    if raw[: len(CHUNKED_MAGIC)].tobytes() != CHUNKED_MAGIC:
+        raise ValueError(f"{path} is not a chunked raw data file")
+
+    position = len(CHUNKED_MAGIC)
+    while position < len(raw):
+        try:
+            if position + _HEADER_LEN.size > len(raw):
+                raise EOFError
+            (header_len,) = _HEADER_LEN.unpack(raw[position : position + _HEADER_LEN.size].tobytes())
+            data_start = position + _HEADER_LEN.size + header_len
+            if data_start > len(raw):
+                raise EOFError
+            header = json.loads(raw[position + _HEADER_LEN.size : data_start].tobytes())
+
+            chunk = {}
+            chunk_end = data_start
+            for entry in header["arrays"]:
+                dtype = np.dtype(entry["dtype"])
+                shape = tuple(entry["shape"])
+                start = data_start + entry["offset"]
+                end = start + dtype.itemsize * int(np.prod(shape))
+                if end > len(raw):
+                    raise EOFError
+                chunk[entry["key"]] = raw[start:end].view(dtype).reshape(shape)
+                chunk_end = max(chunk_end, end + _padding(end - data_start))
+        except EOFError:
+            # The recording was most likely interrupted while writing the last chunk
+            logger.warning(f"Ignoring truncated chunk at byte {position} of {path}")
+            return
+        yield chunk
+        position = chunk_end
+
+
+def read_chunked_file(path: Path | str, mmap: bool = False) -> DataBuffer:
+    """
+    Read a chunked raw data file into a DataBuffer.
+
+    If mmap is False the chunks are concatenated into arrays in memory. Otherwise the chunks are kept as views into a
+    memory map of the file and only concatenated when a signal is accessed.
+    """
+    data = DataBuffer(storage="chunked")
+    for chunk in iter_chunks(path):
+        data.extend(chunk)
+    return data if mmap else data.freeze()
+
+
+NPY_HEADER_SIZE = 256
+COLUMNS_INDEX = "index.json"
+
+
+def npy_header(dtype: np.dtype, shape: tuple[int, ...]) -> bytes:
+    """A version 1.0 .npy header for a Fortran ordered array, padded to `NPY_HEADER_SIZE` bytes"""
+    descr = np.lib.format.dtype_to_descr(np.dtype(dtype))
+    header = f"{{'descr': {descr!r}, 'fortran_order': True, 'shape': {tuple(shape)!r}, }}"
+    n_pad = NPY_HEADER_SIZE - len(np.lib.format.MAGIC_PREFIX) - 4 - len(header) - 1
+    if n_pad < 0:
+        raise ValueError(f"Header for array with {shape=} and {dtype=} doesn't fit in {NPY_HEADER_SIZE} bytes")
+    header = (header + " " * n_pad + "\n").encode("latin1")
+    return np.lib.format.MAGIC_PREFIX + bytes([1, 0]) + struct.pack("<H", len(header)) + header
+
+
+def column_filename(key: str, i: int) -> str:
+    return f"{key}.npy" if re.fullmatch(r"[\w\-.]+", key) else f"signal_{i}.npy"
+
+
+def write_column(file, data: np.ndarray) -> int:
+    """Append an array to an open .npy file written with `npy_header`, returns the number of bytes written"""
+    # The C ordered bytes of the transpose are the Fortran ordered bytes of the array
+    data = np.ascontiguousarray(data.T)
+    file.write(memoryview(data).cast("B"))
+    return data.nbytes
+
+
+def read_columns(path: Path | str, mmap: bool = True) -> DataBuffer:
+    """Read a columnar raw data directory into a DataBuffer, the arrays are memory mapped (read-only) by default"""
+    path = Path(path)
+    with open(path / COLUMNS_INDEX, "r") as f:
+        index = json.load(f)
+
+    data = {}
+    for key, entry in index.items():
+        shape = tuple(entry["shape"])
+        if shape[-1] == 0:
+            # Empty files can't be memory mapped
+            data[key] = np.empty(shape, dtype=np.dtype(entry["dtype"]))
+        else:
+            data[key] = np.load(path / entry["file"], mmap_mode="r" if mmap else None)
+    return DataBuffer(data=data)
+
+
+_WAV_FORMAT_PCM = 1
+_WAV_FORMAT_FLOAT = 3
+
+
+def memmap_wav(path: Path | str) -> np.ndarray:
+    """
+    Memory map the samples in the data chunk of a PCM wav file. Multi-channel audio is returned interleaved, i.e.
+    with the same layout as it was recorded in.
+    """
+    with open(path, "rb") as f:
+        riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError(f"{path} is not a wav file")
+
+        audio_format = bits_per_sample = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                raise ValueError(f"No data chunk found in {path}")
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+            if chunk_id == b"fmt ":
+                fmt = f.read(chunk_size)
+                audio_format, _, _, _, _, bits_per_sample = struct.unpack("<HHIIHH", fmt[:16])
+                if audio_format == 0xFFFE and len(fmt) >= 26:  # WAVE_FORMAT_EXTENSIBLE, format is in the sub format
+                    (audio_format,) = struct.unpack("<H", fmt[24:26])
+            elif chunk_id == b"data":
+                data_offset = f.tell()
+                break
+            else:
+                f.seek(chunk_size, 1)
+            if chunk_size % 2:
+                f.seek(1, 1)
+
+    dtypes = {
+        (_WAV_FORMAT_PCM, 8): np.uint8,
+        (_WAV_FORMAT_PCM, 16): np.dtype("<i2"),
+        (_WAV_FORMAT_PCM, 32): np.dtype("<i4"),
+        (_WAV_FORMAT_FLOAT, 32): np.dtype("<f4"),
+        (_WAV_FORMAT_FLOAT, 64): np.dtype("<f8"),
+    }
+    if (audio_format, bits_per_sample) not in dtypes:
+        raise NotImplementedError(f"Can't memory map wav files with {audio_format=} and {bits_per_sample=}")
+    dtype = np.dtype(dtypes[audio_format, bits_per_sample])
+
+    # The size in the chunk header isn't reliable if the recording was interrupted, use the file size as a bound
+    n_bytes = min(chunk_size, Path(path).stat().st_size - data_offset)
+    n_samples = n_bytes // dtype.itemsize
+    if n_samples == 0:
+        return np.empty((0,), dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=data_offset, shape=(n_samples,))
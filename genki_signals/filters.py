@@ -167,6 +167,24 @@ class Filter:
     def as_ba(self):
         return self._params.as_ba()
 
+    def settling_samples(self, tol: float = 1e-6) -> int | None:
+        """
+        Number of samples until the effect of the initial filter state on the output has decayed below `tol`,
+        exact for FIR filters. Returns None for unstable filters.
+        """
+        if isinstance(self._params, SosParams):
+            _, poles, _ = signal.sos2zpk(self._params.sos)
+            n_taps = 2 * len(self._params.sos)
+        else:
+            poles = np.roots(self._params.a) if len(self._params.a) > 1 else np.array([])
+            n_taps = len(self._params.b)
+        radius = np.max(np.abs(poles)) if len(poles) > 0 else 0.0
+        if radius >= 1.0:
+            return None
+        if radius == 0.0:
+            return n_taps - 1
+        return n_taps - 1 + int(np.ceil(np.log(tol) / np.log(radius)))
+
     @reshape_input_and_output
     def process(self, x_in: np.ndarray | float):
         # NOTE: Expects col vectors
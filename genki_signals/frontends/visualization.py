@@ -106,7 +106,7 @@ class Line(PlottableWidget):
         x_range = {"min": x_range[0], "max": x_range[1]}
         y_range = {"min": y_range[0], "max": y_range[1]}
 
-        self.buffer = DataBuffer(maxlen=n_visible_points)
+        self.buffer = DataBuffer(maxlen=n_visible_points, storage="ring")
 
         self.x_key, self.x_idx = x_access
         self.y_key, self.y_idx = y_access
@@ -130,8 +130,9 @@ class Line(PlottableWidget):
         )
 
         with self.line.hold_sync():
-            self.line.x = self.buffer["x_key"]
-            self.line.y = self.buffer["y_key"]
+            # Copied, since bqplot may keep the arrays while the ring views are overwritten by the next extend
+            self.line.x = self.buffer["x_key"].copy()
+            self.line.y = self.buffer["y_key"].copy()
 
 
 class Scatter(PlottableWidget):
@@ -169,7 +170,7 @@ class Scatter(PlottableWidget):
         x_range = {"min": x_range[0], "max": x_range[1]}
         y_range = {"min": y_range[0], "max": y_range[1]}
 
-        self.buffer = DataBuffer(maxlen=n_visible_points)
+        self.buffer = DataBuffer(maxlen=n_visible_points, storage="ring")
 
         self.x_key, self.x_idx = x_access
         self.y_key, self.y_idx = y_access
@@ -194,8 +195,9 @@ class Scatter(PlottableWidget):
             }
         )
         with self.scatter.hold_sync():
-            self.scatter.x = self.buffer["x_key"]
-            self.scatter.y = self.buffer["y_key"]
+            # Copied, since bqplot may keep the arrays while the ring views are overwritten by the next extend
+            self.scatter.x = self.buffer["x_key"].copy()
+            self.scatter.y = self.buffer["y_key"].copy()
 
 
 class Histogram(PlottableWidget):
@@ -223,7 +225,7 @@ class Histogram(PlottableWidget):
 
         y_range = {"min": y_range[0], "max": y_range[1]}
 
-        self.buffer = DataBuffer(maxlen=lookback_size)
+        self.buffer = DataBuffer(maxlen=lookback_size, storage="ring")
 
         self.y_key, self.y_idx = y_access
 
@@ -237,7 +239,8 @@ class Histogram(PlottableWidget):
     def update(self, data: DataBuffer):
         self.buffer.extend({"y_key": data[self.y_key] if self.y_idx is None else data[self.y_key][self.y_idx]})
         with self.hist.hold_sync():
-            self.hist.sample = self.buffer["y_key"]
+            # Copied, since the ring view is overwritten by the next extend
+            self.hist.sample = self.buffer["y_key"].copy()
 
 
 class Bar(PlottableWidget):
@@ -17,3 +17,4 @@ from .windowed import *  # noqa: F401, F403
 from .shape import *  # noqa: F401, F403
 from .waveforms import *  # noqa: F401, F403
 from .base import compute_signal_functions, SignalFunction, SignalName  # noqa: F401, F403
+from .pipeline import Pipeline  # noqa: F401
@@ -3,7 +3,6 @@ from __future__ import annotations
 import numpy as np
 from scipy import integrate
 
-from genki_signals.buffers import NumpyBuffer
 from genki_signals.functions.base import SignalFunction, SignalName
 
 
@@ -101,6 +100,10 @@ class Integrate(SignalFunction):
         self.state = 0.0
         self.last_b = None
 
+    @property
+    def history(self):
+        return None
+
     def __call__(self, a, b):
         if self.trapezoid:
             val = self.state + integrate.cumulative_trapezoid(y=a, x=b, initial=0.0, axis=-1)
@@ -128,6 +131,10 @@ class Differentiate(SignalFunction):
         self.last_a = None
         self.last_b = None
 
+    @property
+    def history(self):
+        return 1
+
     def __call__(self, a, b=None):
         if b is None:  # I.e. use discrete difference
             b = np.arange(len(a))
@@ -149,17 +156,68 @@ class Differentiate(SignalFunction):
 
 
 class MovingAverage(SignalFunction):
-    """Returns the moving average of a signal"""
+    """
+    Returns the moving average of a signal over the last `length` samples. The first length - 1 outputs are averages
+    over all samples seen so far.
+
+    The sum of the last length - 1 samples is carried between calls, along with a ring of those samples, s.t. each
+    call only touches the samples of its chunk and the (at most as many) samples that leave the window.
+    """
 
     def __init__(self, input_signal: SignalName, name: str, length: int):
         super().__init__(input_signal, name=name, params={"length": length})
-        self.buffer = NumpyBuffer(maxlen=length)
+        self.length = length
+        # The last (up to) length - 1 samples, their sum and the number of them
+        self._ring = None
+        self._sum = None
+        self._count = 0
+        # Index in the ring to write the next sample to
+        self._next = 0
+        # Samples added since the sum was last recomputed from the ring
+        self._since_anchor = 0
+
+    @property
+    def history(self):
+        return self.length - 1
 
     def __call__(self, x):
-        output = np.zeros(x.shape)
-        for i in range(x.shape[-1]):
-            self.buffer.extend(x[..., i : i + 1])
-            output[i] = np.mean(self.buffer.view(), axis=-1)
+        x = np.asarray(x, dtype=np.float64)
+        n = x.shape[-1]
+        capacity = self.length - 1
+        if capacity == 0:
+            return x.copy()
+        if self._ring is None:
+            self._ring = np.zeros(x.shape[:-1] + (capacity,))
+            self._sum = np.zeros(x.shape[:-1])
+        k = self._count
+
+        # With z the carried samples followed by x, the window ending at x[j] is z[r_j : k + j + 1] where
+        # r_j = max(0, k + j + 1 - length), and its sum is the running sum plus cumsum(x)[j] minus the sum of z[:r_j].
+        # Only the first r = k + n - capacity samples of z ever leave the window, s.t. only those are summed.
+        cumsum = np.cumsum(x, axis=-1)
+        r = max(0, k + n - capacity)
+        m = min(k, r)
+        leaving = np.take(self._ring, (self._next - k + np.arange(m)) % capacity, axis=-1)
+        left = np.zeros(x.shape[:-1] + (r + 1,))
+        np.cumsum(leaving, axis=-1, out=left[..., 1 : m + 1])
+        left[..., m + 1 :] = self._sum[..., np.newaxis] + cumsum[..., : r - m]
+
+        j = np.arange(n)
+        start = np.maximum(0, k + j + 1 - self.length)
+        output = (self._sum[..., np.newaxis] + cumsum - left[..., start]) / (k + j + 1 - start)
+
+        # Carry the last (up to) capacity samples
+        if n > 0:
+            self._sum = self._sum + cumsum[..., -1] - left[..., r]
+        w = min(n, capacity)
+        self._ring[..., (self._next + n - w + np.arange(w)) % capacity] = x[..., n - w :]
+        self._next = (self._next + n) % capacity
+        self._count = min(k + n, capacity)
+        self._since_anchor += n
+        if self._since_anchor >= capacity:
+            # The running sum accumulates rounding errors, it's recomputed from the ring (amortized O(1) per sample)
+            self._sum = self._ring.sum(axis=-1)
+            self._since_anchor = 0
         return output
 
 
@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import abc
 from inspect import signature
 from typing import NewType
@@ -37,18 +39,34 @@ class SignalFunction(abc.ABC):
     def frequency_ratio(self):
         return 1
 
+    @property
+    def history(self):
+        """
+        Number of past input samples needed to compute the same output as a function that has seen all of its
+        input, or None if the output depends on the entire input (e.g. integrals and orientation filters).
+        Used to warm up stateful functions when computing a time range of a recorded session.
+        """
+        return 0
+
+    @property
+    def history_alignment(self):
+        """Warm up has to start on a multiple of this many samples, e.g. for functions that process fixed windows"""
+        return 1
+
+
+def signal_history(functions: list[SignalFunction]) -> tuple[int | None, int]:
+    """
+    The number of raw samples needed to warm up a pipeline of functions, along with the alignment the warm up
+    has to start on. The history is None if some output depends on the entire input. See `Pipeline.history`.
+    """
+    # The pipeline module imports this one
+    from genki_signals.functions.pipeline import Pipeline
+
+    return Pipeline(functions).history()
+
+
+def compute_signal_functions(data: DataBuffer, functions: list[SignalFunction], instrumentation=None) -> DataBuffer:
+    """Compute all functions on data, returns the data along with the computed signals. See `Pipeline`."""
+    from genki_signals.functions.pipeline import Pipeline
 
-def compute_signal_functions(data: DataBuffer, functions: list[SignalFunction]):
-    data = data.copy()
-    for signal in functions:
-        inputs = tuple(data[name] for name in signal.input_signals)
-
-        # TODO: error reporting here? Remove ill-behaved signals?
-        #       * If the signal throws an exception, this context is useful
-        try:
-            output = signal(*inputs)
-            data[signal.name] = output
-        except Exception as e:
-            logger.exception(f"Error computing signal function {signal.name}")
-            raise e
-    return data
+    return Pipeline(functions, instrumentation=instrumentation)(data)
@@ -31,6 +31,10 @@ class GaussianSmooth(SignalFunction):
             self.filter = self.filter_factory(self.width_in_sec, self.sample_rate, n_channels=x.shape[-1])
         return self.filter.process(x).squeeze()
 
+    @property
+    def history(self):
+        return self.filter_factory(self.width_in_sec, self.sample_rate).settling_samples()
+
 
 class HighPassFilter(SignalFunction):
     """
@@ -54,6 +58,10 @@ class HighPassFilter(SignalFunction):
             return self.filter.process(val)
         return val
 
+    @property
+    def history(self):
+        return self.filter.settling_samples()
+
 
 class BandPassFilter(SignalFunction):
     """
@@ -77,6 +85,10 @@ class BandPassFilter(SignalFunction):
             return self.filter.process(val)
         return val
 
+    @property
+    def history(self):
+        return self.filter.settling_samples()
+
 
 class LowPassFilter(SignalFunction):
     """
@@ -100,6 +112,10 @@ class LowPassFilter(SignalFunction):
             return self.filter.process(val)
         return val
 
+    @property
+    def history(self):
+        return self.filter.settling_samples()
+
 
 __all__ = [
     "GaussianSmooth",
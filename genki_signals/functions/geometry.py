@@ -2,13 +2,13 @@ from __future__ import annotations
 
 import logging
 
-import imufusion
 import numpy as np
-from ahrs.filters import Madgwick
-from scipy.spatial.transform import Rotation
 
+from genki_signals import quaternion
 from genki_signals.dead_reckoning import calc_per_t_power, combine_power
 from genki_signals.filters import FirFilter
+from genki_signals.fusion import FusionAHRS, MadgwickAHRS, OffsetGyro
+from genki_signals.functions.arithmetic import MovingAverage
 from genki_signals.functions.base import SignalFunction, SignalName
 
 logger = logging.getLogger(__name__)
@@ -39,11 +39,7 @@ class EulerOrientation(SignalFunction):
         super().__init__(input_signal, name=name)
 
     def __call__(self, qs):
-        qw = qs[0:1]
-        angle = 2 * np.arccos(qw)
-        norm = np.sqrt(1 - qw**2)
-        normed = qs[1:] / norm
-        return np.concatenate([angle * 360 / (2 * np.pi), normed], axis=0)
+        return quaternion.to_axis_angle(qs)
 
 
 class EulerAngle(SignalFunction):
@@ -55,22 +51,7 @@ class EulerAngle(SignalFunction):
         super().__init__(input_signal, name=name)
 
     def __call__(self, qs):
-        qw, qx, qy, qz = qs[0], qs[1], qs[2], qs[3]
-
-        # roll
-        sinr = 2 * (qw * qx + qy * qz)
-        cosr = 1 - 2 * (qx**2 + qy**2)
-        roll = np.arctan2(sinr, cosr)
-
-        # pitch
-        sinp = 2 * (qw * qy - qz * qx)
-        pitch = np.where(sinp < 1, np.arcsin(sinp), np.sign(sinp) * (np.pi / 2))
-
-        # yaw
-        siny = 2 * (qw * qz + qx * qy)
-        cosy = 1 - 2 * (qy**2 + qz**2)
-        yaw = np.arctan2(siny, cosy)
-        return np.stack([roll, pitch, yaw])
+        return quaternion.to_euler(qs)
 
 
 class Gravity(SignalFunction):
@@ -82,17 +63,13 @@ class Gravity(SignalFunction):
         super().__init__(input_signal, name=name)
 
     def __call__(self, qs):
-        qw, qx, qy, qz = qs[0], qs[1], qs[2], qs[3]
-
-        grav_x = 2.0 * (qx * qz - qw * qy)
-        grav_y = 2.0 * (qw * qx + qy * qz)
-        grav_z = 2.0 * (qw * qw - 0.5 + qz * qz)
-        return np.stack([grav_x, grav_y, grav_z])
+        return quaternion.gravity(qs)
 
 
 class Rotate(SignalFunction):
     """
-    Compute a rotated version of a 3D input signal with a quaternion input signal representing 3D pose
+    Compute a rotated version of a 3D input signal with a quaternion input signal representing 3D pose,
+    i.e. rotate the input signal from the device frame to the global frame
     """
 
     def __init__(
@@ -104,8 +81,7 @@ class Rotate(SignalFunction):
         super().__init__(input_signal, orientation_signal, name=name)
 
     def __call__(self, xs, qs):
-        rot = Rotation.from_quat(qs[:, [1, 2, 3, 0]].T)
-        return rot.apply(xs.T).T
+        return quaternion.rotate(qs, xs)
 
 
 def _half_plane(data: np.ndarray) -> np.ndarray:
@@ -137,7 +113,7 @@ def calc_angle_from_org(xy_vectors: np.ndarray, xy_org: np.ndarray) -> np.ndarra
     xy_vectors = xy_vectors / np.linalg.norm(xy_vectors, axis=-1).reshape(-1, 1)
     dot_prod = xy_vectors @ xy_org
     vector_angle = np.arccos(np.clip(dot_prod, -1.0, 1.0))
-    vector_angle = _half_plane(xy_vectors) * vector_angle
+    vector_angle = _half_plane(xy_vectors.T) * vector_angle
     return np.rad2deg(vector_angle)
 
 
@@ -158,17 +134,15 @@ class OrientationXy(SignalFunction):
 
     def __init__(self, input_signal: SignalName, name: str):
         super().__init__(input_signal, name=name)
-        self.xyz_org = np.array([1, 0, 0])
+        self.xyz_org = np.array([1.0, 0.0, 0.0])
         self.xy_org = self.xyz_org[:2]
 
     def __call__(self, qs):
-        rotator = qs.copy()
+        out = np.empty((4, qs.shape[-1]))
         # The conjugate gives us global -> local coordinate rotation
-        rotator.loc[:, [0, 1, 2]] = -rotator[:, [0, 1, 2]]
-        xyz = Rotation.from_quat(rotator).apply(self.xyz_org)
-        xy = xyz[:, :2]
-        angles = calc_angle_from_org(xy, self.xy_org)
-        out = np.c_[angles, xyz]
+        rotator = quaternion.conjugate(qs)
+        xyz = quaternion.rotate(rotator, self.xyz_org, out=out[1:])
+        out[0] = calc_angle_from_org(xyz[:2].T, self.xy_org)
         return out
 
 
@@ -176,6 +150,8 @@ class MadgwickOrientation(SignalFunction):
     """
     Create quaternion orientation representation from raw acc/gyro signals
     using Madgwick's algorithm. Includes gyro debiasing.
+
+    The inputs are of shape (3, t) and the output of shape (4, t), like the inputs of `Gravity`, `Rotate` etc.
     """
 
     def __init__(
@@ -190,42 +166,29 @@ class MadgwickOrientation(SignalFunction):
         super().__init__(
             gyro_signal, acc_signal, name=name, params={"sample_rate": sample_rate, "gain": gain, "q0": q0}
         )
-        self.Q = np.array(q0 or [1.0, 0.0, 0.0, 0.0])
-        self.madgwick = Madgwick(gain=gain, frequency=sample_rate, q0=self.Q)
-        self.offset = imufusion.Offset(int(sample_rate))  # gyro debiasing
-        self.synced = False
-
-    def __call__(self, gyro, acc):
-        acc = acc * 9.8
-        qs = np.zeros((len(acc), 4))
-        for i in range(len(acc)):
-            gyro_i = self.offset.update(gyro[i]) / 180 * np.pi
-            self.Q = self.madgwick.updateIMU(self.Q, gyro_i, acc[i])
-            qs[i] = self.Q
-        return qs
-
+        self.madgwick = MadgwickAHRS(sample_rate, gain=gain, q0=q0)
+        self.offset = OffsetGyro(int(sample_rate))  # gyro debiasing
 
-def ahrs(
-    gain: float,
-    sample_rate: int,
-    mag_rejection: float = 90.0,
-    acc_rejection: float = 90.0,
-    rejection_timeout_sec: float = 3,
-) -> imufusion.Ahrs:
-    _ahrs = imufusion.Ahrs()
-    _ahrs.settings = imufusion.Settings(gain, mag_rejection, acc_rejection, int(rejection_timeout_sec * sample_rate))
-    return _ahrs
+    @property
+    def Q(self):
+        return self.madgwick.q
 
+    @property
+    def history(self):
+        return None
 
-class OffsetIdentity:
-    def update(self, x):
-        return x
+    def __call__(self, gyro, acc):
+        # The filters work on (t, 3) rows
+        gyro = self.offset.update_batch(gyro.T) / 180 * np.pi
+        return self.madgwick.update_batch(gyro, acc.T).T
 
 
 class FusionOrientation(SignalFunction):
     """
     Create quaternion orientation representation from raw acc/gyro signals
     using the Fusion algorithm. Includes gyro debiasing.
+
+    The inputs are of shape (3, t) and the output of shape (4, t), like the inputs of `Gravity`, `Rotate` etc.
     """
 
     def __init__(
@@ -243,31 +206,34 @@ class FusionOrientation(SignalFunction):
             name=name,
             params={"sample_rate": sample_rate, "gain": gain, "use_offset": use_offset},
         )
-        self.ahrs = ahrs(
-            gain,
-            sample_rate,
-            mag_rejection=90.0,
-            acc_rejection=90.0,
-            rejection_timeout_sec=3,
-        )
-        self.offset = imufusion.Offset(sample_rate) if use_offset else OffsetIdentity()
-        self.dt = 1 / sample_rate
+        self.ahrs = FusionAHRS(sample_rate, gain, acc_rejection=90.0, rejection_timeout_sec=3)
+        self.offset = OffsetGyro(sample_rate) if use_offset else None
+
+    @property
+    def history(self):
+        return None
 
     def __call__(self, gyro, acc):
-        qs = np.zeros((len(gyro), 4))
-        for i in range(len(qs)):
-            gyro_i = self.offset.update(gyro[i])
-            self.ahrs.update_no_magnetometer(gyro_i, acc[i], self.dt)
-            qs[i] = self.ahrs.quaternion.array
-            if np.sum(qs[i] ** 2) > 1 + 1e-3:
-                logger.warn(f"Fusion orientation '{self.name}' computed invalid quaternion: {qs[i]}")
+        # The filters work on (t, 3) rows
+        gyro, acc = gyro.T, acc.T
+        if self.offset is not None:
+            gyro = self.offset.update_batch(gyro)
+        qs = self.ahrs.update_batch(gyro, acc).T
+        invalid = np.sum(qs**2, axis=0) > 1 + 1e-3
+        if np.any(invalid):
+            logger.warning(f"Fusion orientation '{self.name}' computed invalid quaternions: {qs[:, invalid]}")
         return qs
 
 
 class GravityProjection(SignalFunction):
     """
     Compute a projection of a 3D input signal onto the 2D subspace
-    orthogonal to gravity.
+    orthogonal to gravity. Both inputs are of shape (3, t), the output is of shape (2, t).
+
+    The subspace is spanned by a closed form orthonormal basis (e1, e2) of the plane orthogonal to gravity,
+    see Duff et al. 2017, "Building an Orthonormal Basis, Revisited". The basis is well defined for any direction
+    of gravity, including g_z = 0, and (e1, e2, g) is right-handed. When gravity points along +z, e1 and e2 are the
+    x and y axes of the device.
     """
 
     def __init__(
@@ -277,28 +243,22 @@ class GravityProjection(SignalFunction):
         name: str,
     ):
         super().__init__(input_signal, gravity_signal, name=name)
-        self.qr_fact = np.vectorize(np.linalg.qr, signature="(n, m, r)->(n, m, r),(n, r, r)")
-
-    def __call__(self, G, x):
-        ones = np.ones(len(G))
-        zeros = np.zeros_like(ones)
-        # A is a column matrix made from two vectors that we know are
-        # orthogonal to G. For the first vector, we arbitrarily choose
-        # 1 and 0 for the first two components, and compute the third
-        # component s.t. the vector is orthogonal to G. For the second vector, we
-        # similarly 0 and 1 for the first two components. We end up with
-        # the vectors [1, 0, -g_x / g_z] and [0, 1, -g_y / g_z].
-        A = np.dstack([ones, zeros, zeros, ones, -G[:, 0] / G[:, 2], -G[:, 1] / G[:, 2]]).reshape(-1, 3, 2)
-        # The QR factorization of A gives us Q, a 3x2 matrix with orthogonal
-        # columns that span the subspace orthogonal to G.
-        Qv, Rv = self.qr_fact(A)
-        # P, the 2x3 projection matrix onto the subspace, is the inverse of Q
-        # (since Q has orthogonal columns, the inverse is the same as the transpose)
-        P = Qv.transpose(0, 2, 1)
-        # Batch matrix multiplication - P is a sequence of 2x3 matrices,
-        # and x is a sequence of 3x1 vectors. We compute P[i] @ x[i] for each i.
-        X_P = np.einsum("Bij,Bj->Bi", P, x)
-        return X_P[:, 1:0]  # Swap names for consistency with x/y on trackpad
+
+    @staticmethod
+    def basis(g):
+        """The orthonormal basis of the planes orthogonal to g (3, t), as an array of shape (2, 3, t)"""
+        norm = np.linalg.norm(g, axis=0)
+        gx, gy, gz = g / np.where(norm > 0, norm, 1)
+        sign = np.copysign(1.0, gz)
+        a = -1.0 / (sign + gz)
+        b = gx * gy * a
+        e1 = np.stack([1.0 + sign * gx * gx * a, sign * b, -sign * gx])
+        e2 = np.stack([b, sign + gy * gy * a, -gy])
+        return np.stack([e1, e2])
+
+    def __call__(self, x, g):
+        x_p = np.einsum("kit,it->kt", self.basis(g), x)
+        return x_p[::-1]  # Swap names for consistency with x/y on trackpad
 
 
 class AngleBetween(SignalFunction):
@@ -364,6 +324,10 @@ class DeadReckoning(SignalFunction):
         self.beta = beta
         self.threshold = threshold
 
+    @property
+    def history(self):
+        return max(self.filter_gyro.settling_samples(), self.filter_linacc.settling_samples())
+
     def __call__(self, gyro, linacc):
         pow_gyro = calc_per_t_power(gyro)
         pow_gyro = self.filter_gyro.process(pow_gyro)
@@ -383,25 +347,37 @@ class DeadReckoning(SignalFunction):
 
 
 class ZeroCrossing(SignalFunction):
-    """Returns the zero crossings of an input signal as 1 and otherwise 0"""
+    """
+    Returns the zero crossings of an input signal as 1 and otherwise 0, as an int8 array of the same shape as the
+    input. A sample is a crossing if its sign (x >= 0) differs from the sign of the previous sample, which is carried
+    over from the previous call. Each channel of a multichannel input is handled independently.
 
-    def __init__(self, input_signal: SignalName, name: str):
-        super().__init__(input_signal, name=name)
+    If rate_window is given, the zero crossing rate (the fraction of crossings among the last rate_window samples)
+    is returned instead.
+    """
+
+    def __init__(self, input_signal: SignalName, name: str, rate_window: int | None = None):
+        params = {} if rate_window is None else {"rate_window": rate_window}
+        super().__init__(input_signal, name=name, params=params)
         self.state = None
+        self.rate_window = rate_window
+        self.rate = None if rate_window is None else MovingAverage(input_signal, name=name, length=rate_window)
 
-    @staticmethod
-    def _calc_curr_state(x):
-        return x >= 0
+    @property
+    def history(self):
+        return 1 if self.rate is None else self.rate_window
 
     def __call__(self, xs):
-        out = []
-        self.state = self._calc_curr_state(xs[0]) if self.state is None else self.state
-        for x in xs:
-            curr_state = self._calc_curr_state(x)
-            val = 0 if self.state == curr_state else 1
-            out.append(val)
-            self.state = curr_state
-        return out
+        xs = np.asarray(xs)
+        signs = xs >= 0
+        state = signs[..., :1] if self.state is None else self.state
+        previous = np.concatenate([state, signs[..., :-1]], axis=-1)
+        crossings = (signs != previous).view(np.int8)
+        if xs.shape[-1] > 0:
+            self.state = signs[..., -1:]
+        if self.rate is not None:
+            return self.rate(crossings)
+        return crossings
 
 
 __all__ = [
@@ -1,20 +1,90 @@
 from __future__ import annotations
 
 import logging
+import threading
+from pathlib import Path
 
 import numpy as np
-from onnxruntime import InferenceSession
+from onnxruntime import GraphOptimizationLevel, InferenceSession, OrtValue, SessionOptions
 
 from genki_signals.functions.base import SignalFunction, SignalName
 from genki_signals.functions.windowed import WindowedSignalFunction
 
 logger = logging.getLogger(__name__)
 
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+_session_cache = {}
+_session_cache_lock = threading.Lock()
+
+
+def get_session(
+    model_filename,
+    intra_op_num_threads: int | None = None,
+    inter_op_num_threads: int | None = None,
+    graph_optimization_level: str | None = None,
+    optimized_model_filepath: str | None = None,
+) -> InferenceSession:
+    """
+    Get an InferenceSession for a model, sessions are cached for the whole process by model file and options s.t. each
+    model is only loaded and optimized once. InferenceSession.run is thread safe, so sessions can be shared between
+    signal functions.
+
+    graph_optimization_level is one of "disable", "basic", "extended" or "all". If optimized_model_filepath is given,
+    the optimized model is saved there, and can be loaded with graph_optimization_level="disable" later.
+    """
+    path = Path(model_filename).resolve()
+    key = (
+        path.as_posix(),
+        path.stat().st_mtime_ns,
+        intra_op_num_threads,
+        inter_op_num_threads,
+        graph_optimization_level,
+        optimized_model_filepath,
+    )
+    with _session_cache_lock:
+        if key not in _session_cache:
+            options = SessionOptions()
+            if intra_op_num_threads is not None:
+                options.intra_op_num_threads = intra_op_num_threads
+            if inter_op_num_threads is not None:
+                options.inter_op_num_threads = inter_op_num_threads
+            if graph_optimization_level is not None:
+                if graph_optimization_level not in GRAPH_OPTIMIZATION_LEVELS:
+                    raise ValueError(f"Unknown graph optimization level: {graph_optimization_level}")
+                options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[graph_optimization_level]
+            if optimized_model_filepath is not None:
+                options.optimized_model_filepath = str(optimized_model_filepath)
+            _session_cache[key] = InferenceSession(path.as_posix(), sess_options=options)
+        return _session_cache[key]
+
+
+def _session_params(model_filename, session_options: dict | None) -> dict:
+    """The model and session options as JSON serializable params, s.t. the function can be decoded again"""
+    params = {"model_filename": str(model_filename)}
+    if session_options is not None:
+        params["session_options"] = {
+            key: str(value) if isinstance(value, Path) else value for key, value in session_options.items()
+        }
+    return params
+
+
+def clear_session_cache():
+    with _session_cache_lock:
+        _session_cache.clear()
+
 
 class Inference(SignalFunction):
     """
     Run real-time inference using an ONNX model. Operates on a single input signal, and one sample at a time.
     If stateful=True, the model is run as an RNN, and the state is passed in as a parameter and stored between calls.
+    The model is run for every sample in the input, so the output has one sample for each input sample.
+    session_options are passed to `get_session`.
     """
 
     def __init__(
@@ -24,44 +94,150 @@ class Inference(SignalFunction):
         model_filename,
         stateful: bool,
         init_state=None,
+        session_options: dict | None = None,
     ):
-        super().__init__(
-            input_signal, name=name, params={"model": model_filename, "stateful": stateful, "init_state": init_state}
-        )
+        params = {
+            **_session_params(model_filename, session_options),
+            "stateful": stateful,
+            "init_state": None if init_state is None else np.asarray(init_state).tolist(),
+        }
+        super().__init__(input_signal, name=name, params=params)
         self.stateful = stateful
+        self.session = get_session(model_filename, **(session_options or {}))
+        self._binding = None
         self.state = init_state
-        self.session = InferenceSession(model_filename)
 
-    def __call__(self, x):
-        # x shape (6, 16, t)
-        x = x[np.newaxis, ..., -1]  # note doesn't work offline
+    @property
+    def history(self):
+        return None if self.stateful else 0
+
+    @property
+    def state(self):
+        if not self.stateful:
+            return None
+        return self._states[self._current_state].copy()
+
+    @state.setter
+    def state(self, state):
+        if not self.stateful:
+            return
+        meta = {node.name: node for node in self.session.get_inputs()}["input_state"]
+        if state is None:
+            state = np.zeros(meta.shape, dtype=np.float32)
+        # The state is passed between two buffers, each step reads one and writes the other
+        self._states = [np.array(state, dtype=np.float32), np.zeros(np.shape(state), dtype=np.float32)]
+        self._current_state = 0
+        self._binding = None
+
+    def _bind(self, sample_shape):
+        """Bind preallocated input, output (and state) buffers to the session s.t. no arrays are allocated per step"""
+        self._input = np.zeros((1, *sample_shape), dtype=np.float32)
+        output_shape = [dim if isinstance(dim, int) else 1 for dim in self.session.get_outputs()[0].shape]
+        self._output = np.zeros(output_shape, dtype=np.float32)
+
+        def binding(state_in=None, state_out=None):
+            b = self.session.io_binding()
+            b.bind_ortvalue_input("input", OrtValue.ortvalue_from_numpy(self._input))
+            b.bind_ortvalue_output("output", OrtValue.ortvalue_from_numpy(self._output))
+            if state_in is not None:
+                b.bind_ortvalue_input("input_state", OrtValue.ortvalue_from_numpy(state_in))
+                b.bind_ortvalue_output("output_state", OrtValue.ortvalue_from_numpy(state_out))
+            return b
+
         if self.stateful:
-            output, self.state = self.session.run(
-                ["output", "output_state"],
-                {
-                    "input": x.astype(np.float32),
-                    "input_state": self.state.astype(np.float32),
-                },
-            )
+            self._binding = [binding(*self._states), binding(*self._states[::-1])]
         else:
-            output, output_extra = self.session.run(["output", "output_extra"], {"input": x.astype(np.float32)})
-        return output[0, ..., None]
+            self._binding = [binding()]
+
+    def __call__(self, x):
+        # x shape (6, 16, t)
+        if self._binding is None or self._input.shape[1:] != x.shape[:-1]:
+            self._bind(x.shape[:-1])
+        outputs = np.empty((*self._output.shape[1:], x.shape[-1]), dtype=np.float32)
+        for i in range(x.shape[-1]):
+            np.copyto(self._input[0], x[..., i], casting="unsafe")
+            if self.stateful:
+                self.session.run_with_iobinding(self._binding[self._current_state])
+                self._current_state = 1 - self._current_state
+            else:
+                self.session.run_with_iobinding(self._binding[0])
+            outputs[..., i] = self._output[0]
+        return outputs
 
 
 class WindowedInference(WindowedSignalFunction, SignalFunction):
     """
     Run real-time inference using an ONNX model. Operates on a single input signal, and on a
     window of samples at a time, window_kwargs specify the windowing parameters (window_length and window_overlap).
+
+    All windows that are ready are run as one batch, split into batches of at most max_batch_size windows. Models
+    exported with a fixed batch size are run with batches of exactly that size (padded if needed), with the input
+    and output bound to reusable buffers. session_options are passed to `get_session`.
     """
-    def __init__(self, input_signal: SignalName, name: str, model_filename, **window_kwargs):
-        super().__init__(input_signal, name=name, params={"model_filename": model_filename, **window_kwargs})
+    def __init__(
+        self,
+        input_signal: SignalName,
+        name: str,
+        model_filename,
+        max_batch_size: int = 64,
+        session_options: dict | None = None,
+        **window_kwargs,
+    ):
+        params = {**_session_params(model_filename, session_options), "max_batch_size": max_batch_size, **window_kwargs}
+        super().__init__(input_signal, name=name, params=params)
         self.init_windowing(**window_kwargs)
-        self.session = InferenceSession(model_filename)
+        self.session = get_session(model_filename, **(session_options or {}))
+        batch_dim = self.session.get_inputs()[0].shape[0]
+        # Symbolic (dynamic) batch dimensions are strings or None
+        self.fixed_batch_size = batch_dim if isinstance(batch_dim, int) else None
+        self.max_batch_size = self.fixed_batch_size or max_batch_size
+        # Outputs can only be bound to a preallocated buffer if their shape is known
+        self._bind_output = self.fixed_batch_size is not None and all(
+            isinstance(dim, int) for dim in self.session.get_outputs()[0].shape
+        )
+        self._input_buffer = None
+        self._binding = None
+
+    def _batch_input(self, windows):
+        """Copy a batch of windows into the preallocated float32 input, in the layout of the model"""
+        n = windows.shape[0]
+        if self._input_buffer is None or self._input_buffer.shape[1:] != windows.shape[1:]:
+            self._input_buffer = np.zeros((self.max_batch_size, *windows.shape[1:]), dtype=np.float32)
+            self._binding = None
+        np.copyto(self._input_buffer[:n], windows, casting="unsafe")
+        if self.fixed_batch_size is not None:
+            return self._input_buffer
+        return self._input_buffer[:n]
+
+    def _run_batch(self, windows):
+        model_input = self._batch_input(windows)
+        if not self._bind_output:
+            (output,) = self.session.run(["output"], {"input": model_input})
+            return output[: len(windows)]
+        if self._binding is None:
+            output_shape = self.session.get_outputs()[0].shape
+            self._output_buffer = np.zeros(output_shape, dtype=np.float32)
+            self._binding = self.session.io_binding()
+            self._binding.bind_ortvalue_input("input", OrtValue.ortvalue_from_numpy(self._input_buffer))
+            self._binding.bind_ortvalue_output("output", OrtValue.ortvalue_from_numpy(self._output_buffer))
+        self.session.run_with_iobinding(self._binding)
+        return self._output_buffer[: len(windows)].copy()
 
     def windowed_fn(self, x):
-        x = x.T[np.newaxis, ...]
-        output, output_extra = self.session.run(["output", "output_extra"], {"input": x.astype(np.float32)})
-        return output[0]
+        return self.windowed_fn_batch(x[..., np.newaxis, :])
+
+    def windowed_fn_batch(self, windows):
+        # (..., n_windows, win_size) -> (n_windows, win_size, ...) with the leading dims reversed, like x.T per window
+        k = windows.ndim
+        windows = windows.transpose(k - 2, k - 1, *range(k - 3, -1, -1))
+        n_windows = windows.shape[0]
+        outputs = []
+        for start in range(0, n_windows, self.max_batch_size):
+            outputs.append(self._run_batch(windows[start : start + self.max_batch_size]))
+        output = np.concatenate(outputs, axis=0)
+        # (n_windows, ..., m) -> (..., n_windows * m), the per window outputs concatenated along the last axis
+        output = np.moveaxis(output, 0, -2)
+        return output.reshape(*output.shape[:-2], -1)
 
 
 __all__ = [
@@ -0,0 +1,348 @@
+"""
+A Pipeline compiles a list of signal functions into an execution plan.
+
+The plan is a dependency graph built from the `input_signals` and `name` of each function. Compiling it
+validates that every input is available and that there are no cycles. It prunes the functions that
+nothing requested depends on, and finds where each intermediate signal is last used so that it can be
+dropped as early as possible. Plans are cached per set of input signals, so they are compiled once and
+reused on every call.
+
+With `max_workers` set, steps that don't depend on each other run concurrently on a thread pool. This helps when
+the heavy functions spend their time in code that releases the GIL (numpy FFTs, scipy filters, onnxruntime). Each
+function still runs once per call and writes only its own output, so the result is the same as running sequentially.
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+import math
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from genki_signals.buffers import DataBuffer
+from genki_signals.functions.base import SignalFunction
+from genki_signals.instrumentation import Instrumentation, n_samples
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Step:
+    function: SignalFunction
+    # Index of the function in the pipeline
+    index: int
+    # (key, index) pairs to read the inputs from, index is None unless the input is of the form '<key>_<index>'
+    inputs: list[tuple[str, int | None]]
+    # Indices of the steps this step depends on
+    depends_on: set[int] = field(default_factory=set)
+    # Intermediate signals that can be dropped once this step has run
+    release: list[str] = field(default_factory=list)
+
+
+@dataclass
+class Plan:
+    steps: list[Step]
+    input_keys: frozenset[str]
+    # The signals of the input data that the steps or the requested outputs read
+    used_inputs: frozenset[str]
+
+
+class Pipeline:
+    """
+    Compiles and runs a list of signal functions. If `outputs` is given, only the functions needed to compute
+    those signals are run, and intermediate signals are not included in the output. With prune_stateful=False,
+    functions that carry state between calls (a `history` other than 0) are run even if nothing requested depends on
+    them, s.t. they have seen all of the data if a later pipeline needs them.
+
+    If `max_workers` is given, independent functions are run concurrently on a thread pool with that many threads.
+    The pool is created on first use and shut down by `close`, unless an `executor` is passed in, which is used
+    instead and is left for its owner to shut down (e.g. to share one pool between pipelines).
+    The time each function took in the last call is kept in `timings`, and if an `instrumentation` is given every
+    call is recorded in it.
+    """
+
+    def __init__(
+        self,
+        functions: list[SignalFunction],
+        outputs: list[str] | None = None,
+        max_workers: int | None = None,
+        instrumentation: Instrumentation | None = None,
+        executor: Executor | None = None,
+        prune_stateful: bool = True,
+    ):
+        self.functions = list(functions)
+        self.outputs = None if outputs is None else list(outputs)
+        self.prune_stateful = prune_stateful
+        self.max_workers = max_workers
+        self.instrumentation = instrumentation
+        self.timings = {}
+        self._plans = {}
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._last_plan = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.functions}, outputs={self.outputs})"
+
+    def compile(self, input_keys) -> Plan:
+        """Compile (or get the cached) execution plan for data with the given signals"""
+        input_keys = frozenset(input_keys)
+        if input_keys not in self._plans:
+            self._plans[input_keys] = self._compile(input_keys)
+        return self._plans[input_keys]
+
+    def validate(self, input_keys=None):
+        """
+        Raise a ValueError if the pipeline can't be compiled, e.g. because of cyclic dependencies. If input_keys is
+        None, every signal that isn't computed by a function is assumed to be available.
+        """
+        if input_keys is not None:
+            self.compile(input_keys)
+        else:
+            self._compile(self._assumed_inputs())
+
+    def _assumed_inputs(self) -> frozenset[str]:
+        """All signals used by the functions (or requested) that aren't computed by a function"""
+        computed = {fn.name for fn in self.functions}
+        names = {name for fn in self.functions for name in fn.input_signals} | set(self.outputs or [])
+        return frozenset(names - computed)
+
+    def history(self, input_keys=None) -> tuple[int | None, int]:
+        """
+        The number of input samples needed to warm up the functions that are run (see `SignalFunction.history`),
+        along with the alignment the warm up has to start on. The history is None if some output depends on the
+        entire input. If input_keys is None, every signal that isn't computed by a function is assumed to be available.
+        """
+        plan = self.compile(input_keys) if input_keys is not None else self._compile(self._assumed_inputs())
+        histories = {}
+        for step in plan.steps:
+            history = step.function.history
+            input_histories = [histories[i] for i in step.depends_on]
+            if history is not None and None not in input_histories:
+                histories[step.index] = history + max(input_histories, default=0)
+            else:
+                histories[step.index] = None
+        total = None if None in histories.values() else max(histories.values(), default=0)
+        alignment = math.lcm(*(step.function.history_alignment for step in plan.steps)) if plan.steps else 1
+        return total, alignment
+
+    def _compile(self, input_keys: frozenset[str]) -> Plan:
+        producers = {}
+        for i, fn in enumerate(self.functions):
+            if fn.name in producers:
+                raise ValueError(f"Multiple signal functions named '{fn.name}'")
+            producers[fn.name] = i
+
+        def resolve(name, i):
+            """Returns (key, index, producer), producer is None for signals in the input data"""
+            m = re.match(r"(.+)_(\d+)$", name)
+            candidates = [(name, None)] if m is None else [(name, None), (m.group(1), int(m.group(2)))]
+            for key, index in candidates:
+                producer = producers.get(key)
+                # A function may shadow an input signal, in which case functions before it see the input signal
+                if producer is not None and (producer < i or key not in input_keys):
+                    return key, index, producer
+                if key in input_keys:
+                    return key, index, None
+            return None
+
+        steps = {}
+        missing_inputs = {}
+        # Signals of the input data read by each step
+        step_inputs = {}
+        for i, fn in enumerate(self.functions):
+            inputs, depends_on = [], set()
+            step_inputs[i] = set()
+            for name in fn.input_signals:
+                resolved = resolve(name, i)
+                if resolved is None:
+                    missing_inputs.setdefault(i, []).append(name)
+                    continue
+                key, index, producer = resolved
+                inputs.append((key, index))
+                if producer is not None:
+                    depends_on.add(producer)
+                else:
+                    step_inputs[i].add(key)
+            steps[i] = Step(fn, i, inputs, depends_on)
+
+        missing = []
+        used_inputs = set()
+        if self.outputs is None:
+            needed = set(steps)
+        else:
+            needed = set()
+            stack = [] if self.prune_stateful else [i for i, fn in enumerate(self.functions) if fn.history != 0]
+            for name in self.outputs:
+                resolved = resolve(name, len(self.functions))
+                if resolved is None:
+                    missing.append(f"'{name}' (requested output)")
+                elif resolved[2] is not None:
+                    stack.append(resolved[2])
+                else:
+                    used_inputs.add(resolved[0])
+            while stack:
+                i = stack.pop()
+                if i not in needed:
+                    needed.add(i)
+                    stack.extend(steps[i].depends_on)
+
+        # Only report missing inputs for functions that would actually run
+        for i in sorted(needed & missing_inputs.keys()):
+            missing.extend(f"'{name}' (input to '{self.functions[i].name}')" for name in missing_inputs[i])
+        if missing:
+            raise ValueError(f"Missing signals: {', '.join(missing)}. Available signals: {sorted(input_keys)}")
+
+        order = self._topological_order({i: steps[i] for i in needed})
+
+        if self.outputs is not None:
+            outputs = {key for name in self.outputs for key, _, _ in [resolve(name, len(self.functions))]}
+            last_use = {}
+            for position, i in enumerate(order):
+                for key, _ in steps[i].inputs:
+                    last_use[key] = position
+            for key, position in last_use.items():
+                if key in producers and key not in outputs and key not in input_keys:
+                    steps[order[position]].release.append(key)
+            for i in order:
+                # Computed signals that nothing uses and weren't requested
+                name = steps[i].function.name
+                if name not in outputs and name not in last_use:
+                    steps[i].release.append(name)
+
+        used_inputs.update(*(step_inputs[i] for i in needed))
+        return Plan([steps[i] for i in order], input_keys, frozenset(used_inputs))
+
+    @staticmethod
+    def _topological_order(steps: dict[int, Step]) -> list[int]:
+        """Kahn's algorithm, ties are broken by the order of the functions s.t. the order is deterministic"""
+        n_deps = {i: len(step.depends_on & steps.keys()) for i, step in steps.items()}
+        dependents = {i: [] for i in steps}
+        for i, step in steps.items():
+            for j in step.depends_on & steps.keys():
+                dependents[j].append(i)
+
+        ready = [i for i, n in n_deps.items() if n == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            i = heapq.heappop(ready)
+            order.append(i)
+            for j in dependents[i]:
+                n_deps[j] -= 1
+                if n_deps[j] == 0:
+                    heapq.heappush(ready, j)
+
+        if len(order) < len(steps):
+            cycle = sorted(steps[i].function.name for i in steps if i not in order)
+            raise ValueError(f"Signal functions have cyclic dependencies: {cycle}")
+        return order
+
+    def __call__(self, data: DataBuffer) -> DataBuffer:
+        plan = self.compile(data.keys())
+        self._last_plan = plan
+        values = dict(data.items())
+        if self.max_workers is None or len(plan.steps) < 2:
+            self._run_sequential(plan, values)
+        else:
+            self._run_parallel(plan, values)
+        return DataBuffer(data.maxlen, values)
+
+    @staticmethod
+    def _inputs(step: Step, values: dict) -> tuple:
+        return tuple(values[key] if index is None else values[key][index] for key, index in step.inputs)
+
+    @staticmethod
+    def _run_step(step: Step, args: tuple):
+        """Run a step, returns the output, the wall and CPU time in ns and the number of input samples"""
+        start, start_cpu = time.perf_counter_ns(), time.thread_time_ns()
+        try:
+            output = step.function(*args)
+        except Exception as e:
+            logger.exception(f"Error computing signal function {step.function.name}")
+            raise e
+        wall_ns, cpu_ns = time.perf_counter_ns() - start, time.thread_time_ns() - start_cpu
+        return output, wall_ns, cpu_ns, n_samples(args[0]) if args else 0
+
+    def _store(self, step: Step, values: dict, output, wall_ns: int, cpu_ns: int, samples_in: int):
+        name = step.function.name
+        values[name] = output
+        self.timings[name] = wall_ns / 1e9
+        if self.instrumentation is not None:
+            self.instrumentation.record_function(name, wall_ns, cpu_ns, samples_in, n_samples(output))
+
+    def _run_sequential(self, plan: Plan, values: dict):
+        for step in plan.steps:
+            self._store(step, values, *self._run_step(step, self._inputs(step, values)))
+            for key in step.release:
+                del values[key]
+
+    def _run_parallel(self, plan: Plan, values: dict):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="signal_functions")
+
+        in_plan = {step.index for step in plan.steps}
+        n_deps = {step.index: len(step.depends_on & in_plan) for step in plan.steps}
+        dependents = {step.index: [] for step in plan.steps}
+        for step in plan.steps:
+            for j in step.depends_on & in_plan:
+                dependents[j].append(step)
+
+        # Inputs are gathered and outputs stored on this thread, the workers only run the functions
+        running = {}
+        ready = [step for step in plan.steps if n_deps[step.index] == 0]
+        try:
+            while ready or running:
+                for step in ready:
+                    running[self._executor.submit(self._run_step, step, self._inputs(step, values))] = step
+                ready = []
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                # Handle finished steps in plan order s.t. the scheduling doesn't depend on timing more than needed
+                for future in sorted(done, key=lambda f: running[f].index):
+                    step = running.pop(future)
+                    self._store(step, values, *future.result())
+                    for dependent in dependents[step.index]:
+                        n_deps[dependent.index] -= 1
+                        if n_deps[dependent.index] == 0:
+                            ready.append(dependent)
+        except Exception:
+            for future in running:
+                future.cancel()
+            wait(running)
+            raise
+
+        # Consumers of a signal may finish in any order, so intermediates are only dropped once everything is done
+        for step in plan.steps:
+            for key in step.release:
+                del values[key]
+
+    def critical_path(self) -> tuple[list[str], float]:
+        """
+        The chain of dependent functions that took the longest in the last call, and its total duration in seconds.
+        This is the lower bound on the time a call takes regardless of the number of workers.
+        """
+        if self._last_plan is None:
+            return [], 0.0
+        finish, previous = {}, {}
+        for step in self._last_plan.steps:
+            deps = [j for j in step.depends_on if j in finish]
+            before = max(deps, key=lambda j: finish[j], default=None)
+            previous[step.index] = before
+            finish[step.index] = (0.0 if before is None else finish[before]) + self.timings.get(step.function.name, 0.0)
+        if not finish:
+            return [], 0.0
+        last = max(finish, key=finish.get)
+        total = finish[last]
+        path = []
+        while last is not None:
+            path.append(self.functions[last].name)
+            last = previous[last]
+        return path[::-1], total
+
+    def close(self):
+        """Shut down the thread pool, if this pipeline started one"""
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import numpy as np
 
-from genki_signals.functions.base import SignalFunction, SignalName
+from genki_signals.functions.base import SignalFunction, SignalName, signal_history
 
 
 class ExtractDimension(SignalFunction):
@@ -91,6 +91,14 @@ class Combine(SignalFunction):
         inputs = all_inputs - set(internal_outputs)
         super().__init__(*inputs, name=name, params={"signal_fns": signal_fns})
 
+    @property
+    def history(self):
+        return signal_history(self.signal_fns)[0]
+
+    @property
+    def history_alignment(self):
+        return signal_history(self.signal_fns)[1]
+
     def __call__(self, *args):
         internal_outputs = {}
         for fn in self.signal_fns:
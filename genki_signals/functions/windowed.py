@@ -2,10 +2,10 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 
 import numpy as np
-import scipy
 
 from genki_signals.buffers import NumpyBuffer
 from genki_signals.functions.base import SignalFunction, SignalName
+from genki_signals.stft import STFT
 
 
 def upsample(signal, factor):
@@ -27,6 +27,10 @@ class SampleRate(SignalFunction):
         self.unit_multiplier = unit_multiplier
         self.last_ts = 0
 
+    @property
+    def history(self):
+        return 1
+
     def __call__(self, signal):
         rate = 1 / np.diff(signal, prepend=self.last_ts)
         self.last_ts = signal[-1]
@@ -49,29 +53,59 @@ class WindowedSignalFunction(ABC):
         self.window_overlap = window_overlap
         self.num_to_pop = self.win_size - window_overlap
         self.input_buffer = NumpyBuffer(None)
-        self.output_buffer = NumpyBuffer(None, n_cols=output_shape)
-        if upsample:
-            self.output_buffer.extend(default_value * np.ones((*output_shape, window_size - 1)))
         self.default_value = default_value
         self.upsample = upsample
+        self.init_output_buffer(output_shape)
+
+    def init_output_buffer(self, output_shape: tuple[int]):
+        self.output_shape = tuple(output_shape)
+        self.output_buffer = NumpyBuffer(None, n_cols=self.output_shape)
+        if self.upsample:
+            self.output_buffer.extend(np.full((*self.output_shape, self.win_size - 1), self.default_value))
 
     def __call__(self, inputs):
+        n_samples = inputs.shape[-1]
         self.input_buffer.extend(inputs)
-        while len(self.input_buffer) >= self.win_size:
-            inputs = self.input_buffer.view(self.win_size)
-            self.input_buffer.popleft(self.num_to_pop)
-            out = self.windowed_fn(inputs)
+        n_windows = self.n_complete_windows(len(self.input_buffer))
+        if n_windows > 0:
+            out = self.windowed_fn_batch(self.window_view(self.input_buffer.view(), n_windows))
+            self.input_buffer.popleft(n_windows * self.num_to_pop)
             if self.upsample:
-                upsampled = upsample(out, self.num_to_pop)
-            else:
-                upsampled = out
-            self.output_buffer.extend(upsampled)
+                out = upsample(out, self.num_to_pop)
+            self.output_buffer.extend(out)
 
         if self.upsample:
-            return self.output_buffer.popleft(len(inputs))
+            return self.output_buffer.popleft(n_samples)
         else:
             return self.output_buffer.popleft_all()
 
+    def n_complete_windows(self, n_samples: int) -> int:
+        if n_samples < self.win_size:
+            return 0
+        return (n_samples - self.win_size) // self.num_to_pop + 1
+
+    def window_view(self, signal: np.ndarray, n_windows: int) -> np.ndarray:
+        """The first n_windows windows of a signal as a read-only view of shape (..., n_windows, win_size)"""
+        signal = signal[..., : (n_windows - 1) * self.num_to_pop + self.win_size]
+        windows = np.lib.stride_tricks.sliding_window_view(signal, self.win_size, axis=-1)
+        return windows[..., :: self.num_to_pop, :]
+
+    def windowed_fn_batch(self, windows: np.ndarray) -> np.ndarray:
+        """
+        Compute windowed_fn for a stack of windows of shape (..., n_windows, win_size). The result is the outputs of
+        windowed_fn for each window concatenated along the last axis. Override this with a vectorized implementation
+        when possible, by default windowed_fn is called for each window.
+        """
+        return np.concatenate([self.windowed_fn(windows[..., i, :]) for i in range(windows.shape[-2])], axis=-1)
+
+    @property
+    def history(self):
+        return self.win_size - 1
+
+    @property
+    def history_alignment(self):
+        return self.num_to_pop
+
     @abstractmethod
     def windowed_fn(self, **inputs):
         raise NotImplementedError
@@ -80,7 +114,8 @@ class WindowedSignalFunction(ABC):
 class FourierTransform(WindowedSignalFunction, SignalFunction):
     """
     Computes a windowed FFT from a raw signal. The output is a complex valued
-    signal with shape (window_size // 2 + 1, t)
+    signal with shape (window_size // 2 + 1, t), or (*channels, window_size // 2 + 1, t) for multichannel input.
+    With dtype="complex64" the FFT is computed in single precision.
     """
 
     def __init__(
@@ -91,6 +126,7 @@ class FourierTransform(WindowedSignalFunction, SignalFunction):
         window_overlap: int = 0,
         detrend_type: str = "linear",
         window_type: str = "hann",
+        dtype: str = "complex128",
         **kwargs,
     ):
         super().__init__(
@@ -101,31 +137,34 @@ class FourierTransform(WindowedSignalFunction, SignalFunction):
                 "window_overlap": window_overlap,
                 "detrend_type": detrend_type,
                 "window_type": window_type,
+                "dtype": dtype,
                 **kwargs,
             },
         )
         self.win_size = window_size
         self.no_buckets = window_size // 2 + 1
         self.detrend_type = detrend_type
-        if window_type == "hann":
-            self.window_fn = scipy.signal.windows.hann
-        else:
-            raise ValueError(f"Unknown window type: {window_type}")
+        self.stft = STFT(window_size, window_type=window_type, detrend_type=detrend_type, dtype=dtype)
         self.init_windowing(
             window_size=window_size,
             window_overlap=window_overlap,
             output_shape=(self.no_buckets,),
-            default_value=0 + 0j,
+            default_value=np.zeros((), dtype=dtype),
             **kwargs,
         )
 
+    def __call__(self, sig):
+        channels = sig.shape[:-1]
+        if self.output_shape[:-1] != channels:
+            # Set up the output for the number of channels in the input
+            self.init_output_buffer((*channels, self.no_buckets))
+        return super().__call__(sig)
+
     def windowed_fn(self, sig):
-        sig = scipy.signal.detrend(sig, type=self.detrend_type)
-        sig = sig * self.window_fn(sig.shape[-1])
-        sig_fft = np.fft.rfft(sig) / self.win_size
-        if sig_fft.ndim == 1:
-            sig_fft = sig_fft[:, None]
-        return sig_fft
+        return self.stft(sig[..., np.newaxis, :])
+
+    def windowed_fn_batch(self, windows):
+        return self.stft(windows)
 
 
 class Delay(SignalFunction):
@@ -136,6 +175,10 @@ class Delay(SignalFunction):
         self.n = n
         self.buffer = None
 
+    @property
+    def history(self):
+        return self.n
+
     def __call__(self, sig):
         if self.buffer is None:
             self.buffer = NumpyBuffer(None, sig.shape[:-1])
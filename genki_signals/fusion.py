@@ -1,5 +1,68 @@
+"""
+Sensor fusion (AHRS) algorithms that process a whole chunk of samples per call.
+
+The filters are recursive, so the samples have to be processed one at a time. The per sample loops are written as
+kernels on plain floats which are compiled with numba if it is installed (`pip install genki-signals[fusion]`).
+Without numba they run as plain Python on lists, which is about a hundred times slower, and a warning is logged.
+
+Inputs are of shape (n, 3) and quaternions of shape (n, 4) in (w, x, y, z) order.
+"""
+import logging
+import math
+
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+_warned_no_numba = False
+
+
+def _kernel(fn):
+    return njit(cache=True)(fn) if NUMBA_AVAILABLE else fn
+
+
+def _run_kernel(kernel, inputs, n_out, *args):
+    """Run a kernel on (n, 3) inputs, returns the (n, n_out) output and the new state returned by the kernel"""
+    global _warned_no_numba
+    n = inputs[0].shape[0]
+    if NUMBA_AVAILABLE:
+        out = np.zeros((n, n_out))
+        state = kernel(*[np.ascontiguousarray(x, dtype=np.float64) for x in inputs], out, *args)
+        return out, state
+    if not _warned_no_numba:
+        logger.warning("numba is not installed, sensor fusion runs as plain Python. Install genki-signals[fusion].")
+        _warned_no_numba = True
+    out = [[0.0] * n_out for _ in range(n)]
+    state = kernel(*[np.asarray(x, dtype=np.float64).tolist() for x in inputs], out, *args)
+    return np.array(out).reshape(n, n_out), state
+
+
+@_kernel
+def _offset_kernel(gyro, out, ox, oy, oz, timer, filter_coeff, timeout, threshold):
+    for i in range(len(gyro)):
+        gx = gyro[i][0] - ox
+        gy = gyro[i][1] - oy
+        gz = gyro[i][2] - oz
+        if abs(gx) > threshold or abs(gy) > threshold or abs(gz) > threshold:
+            timer = 0
+        elif timer < timeout:
+            timer += 1
+        else:
+            ox += gx * filter_coeff
+            oy += gy * filter_coeff
+            oz += gz * filter_coeff
+        out[i][0] = gx
+        out[i][1] = gy
+        out[i][2] = gz
+    return ox, oy, oz, timer
+
 
 class OffsetGyro:
     """
@@ -26,3 +89,210 @@ class OffsetGyro:
         else:
             self._offset = self._offset + gyro * self._filter_coeff
         return gyro
+
+    def update_batch(self, gyro):
+        """Same as calling `update` for each row of gyro (n, 3)"""
+        out, (ox, oy, oz, self._timer) = _run_kernel(
+            _offset_kernel, [gyro], 3, *self._offset, self._timer, self._filter_coeff, self._timeout, self._threshold
+        )
+        self._offset = np.array([ox, oy, oz])
+        return out
+
+
+@_kernel
+def _madgwick_kernel(gyro, acc, out, qw, qx, qy, qz, gain, dt):
+    for i in range(len(gyro)):
+        gx, gy, gz = gyro[i][0], gyro[i][1], gyro[i][2]
+        if gx != 0.0 or gy != 0.0 or gz != 0.0:
+            # Rate of change of the quaternion from the gyroscope, 0.5 * q * (0, g)
+            dw = 0.5 * (-qx * gx - qy * gy - qz * gz)
+            dx = 0.5 * (qw * gx + qy * gz - qz * gy)
+            dy = 0.5 * (qw * gy - qx * gz + qz * gx)
+            dz = 0.5 * (qw * gz + qx * gy - qy * gx)
+
+            ax, ay, az = acc[i][0], acc[i][1], acc[i][2]
+            a_norm = math.sqrt(ax * ax + ay * ay + az * az)
+            if a_norm > 0.0:
+                ax, ay, az = ax / a_norm, ay / a_norm, az / a_norm
+                q_norm = math.sqrt(qw * qw + qx * qx + qy * qy + qz * qz)
+                nw, nx, ny, nz = qw / q_norm, qx / q_norm, qy / q_norm, qz / q_norm
+                # Objective function and its gradient J.T @ f
+                f0 = 2.0 * (nx * nz - nw * ny) - ax
+                f1 = 2.0 * (nw * nx + ny * nz) - ay
+                f2 = 2.0 * (0.5 - nx * nx - ny * ny) - az
+                if f0 != 0.0 or f1 != 0.0 or f2 != 0.0:
+                    sw = -2.0 * ny * f0 + 2.0 * nx * f1
+                    sx = 2.0 * nz * f0 + 2.0 * nw * f1 - 4.0 * nx * f2
+                    sy = -2.0 * nw * f0 + 2.0 * nz * f1 - 4.0 * ny * f2
+                    sz = 2.0 * nx * f0 + 2.0 * ny * f1
+                    s_norm = math.sqrt(sw * sw + sx * sx + sy * sy + sz * sz)
+                    if s_norm > 0.0:
+                        dw -= gain * sw / s_norm
+                        dx -= gain * sx / s_norm
+                        dy -= gain * sy / s_norm
+                        dz -= gain * sz / s_norm
+
+            qw, qx, qy, qz = qw + dw * dt, qx + dx * dt, qy + dy * dt, qz + dz * dt
+            q_norm = math.sqrt(qw * qw + qx * qx + qy * qy + qz * qz)
+            qw, qx, qy, qz = qw / q_norm, qx / q_norm, qy / q_norm, qz / q_norm
+        out[i][0] = qw
+        out[i][1] = qx
+        out[i][2] = qy
+        out[i][3] = qz
+    return qw, qx, qy, qz
+
+
+class MadgwickAHRS:
+    """
+    Madgwick's IMU orientation filter, same as `ahrs.filters.Madgwick.updateIMU` but for a chunk of samples.
+    Gyroscope in rad/s, accelerometer in any unit.
+    """
+
+    def __init__(self, sample_rate, gain=0.033, q0=None):
+        self.dt = 1 / sample_rate
+        self.gain = gain
+        self.q = np.array(q0 if q0 is not None else [1.0, 0.0, 0.0, 0.0], dtype=np.float64)
+
+    def update_batch(self, gyro, acc):
+        out, q = _run_kernel(_madgwick_kernel, [gyro, acc], 4, *self.q, self.gain, self.dt)
+        self.q = np.array(q)
+        return out
+
+
+# See https://github.com/xioTechnologies/Fusion/blob/main/Fusion/FusionAhrs.c
+FUSION_INITIAL_GAIN = 10.0
+FUSION_INITIALISATION_PERIOD = 3.0
+
+
+@_kernel
+def _fusion_kernel(
+    gyro,
+    acc,
+    out,
+    qw,
+    qx,
+    qy,
+    qz,
+    ramped_gain,
+    initialising,
+    rejection_timer,
+    rejection_timed_out,
+    gain,
+    ramped_gain_step,
+    acc_rejection,
+    rejection_timeout,
+    dt,
+):
+    half_deg_to_rad = 0.5 * math.pi / 180.0
+    for i in range(len(gyro)):
+        # Ramp down the gain during initialisation
+        if initialising:
+            ramped_gain -= ramped_gain_step * dt
+            if ramped_gain < gain:
+                ramped_gain = gain
+                initialising = False
+                rejection_timed_out = False
+
+        # Direction of gravity indicated by the algorithm, scaled by 0.5
+        hgx = qx * qz - qw * qy
+        hgy = qw * qx + qy * qz
+        hgz = qw * qw - 0.5 + qz * qz
+
+        fx, fy, fz = 0.0, 0.0, 0.0
+        ax, ay, az = acc[i][0], acc[i][1], acc[i][2]
+        if ax != 0.0 or ay != 0.0 or az != 0.0:
+            # Restart initialisation (keeping the orientation) if the accelerometer was ignored for too long
+            if rejection_timer > rejection_timeout:
+                initialising = True
+                ramped_gain = FUSION_INITIAL_GAIN
+                rejection_timer = 0
+                rejection_timed_out = True
+            a_norm = math.sqrt(ax * ax + ay * ay + az * az)
+            ax, ay, az = ax / a_norm, ay / a_norm, az / a_norm
+            # Accelerometer feedback scaled by 0.5
+            cx = ay * hgz - az * hgy
+            cy = az * hgx - ax * hgz
+            cz = ax * hgy - ay * hgx
+            if initialising or cx * cx + cy * cy + cz * cz <= acc_rejection:
+                fx, fy, fz = cx, cy, cz
+                if rejection_timer >= 10:
+                    rejection_timer -= 10
+            else:
+                rejection_timer += 1
+
+        # Gyroscope in rad/s scaled by 0.5, with the feedback applied, integrated over dt
+        vx = (gyro[i][0] * half_deg_to_rad + fx * ramped_gain) * dt
+        vy = (gyro[i][1] * half_deg_to_rad + fy * ramped_gain) * dt
+        vz = (gyro[i][2] * half_deg_to_rad + fz * ramped_gain) * dt
+        qw, qx, qy, qz = (
+            qw - qx * vx - qy * vy - qz * vz,
+            qx + qw * vx + qy * vz - qz * vy,
+            qy + qw * vy - qx * vz + qz * vx,
+            qz + qw * vz + qx * vy - qy * vx,
+        )
+        q_norm = math.sqrt(qw * qw + qx * qx + qy * qy + qz * qz)
+        qw, qx, qy, qz = qw / q_norm, qx / q_norm, qy / q_norm, qz / q_norm
+
+        # Zero the heading during initialisation
+        if initialising and not rejection_timed_out:
+            half_yaw = 0.5 * math.atan2(qw * qz + qx * qy, 0.5 - qy * qy - qz * qz)
+            c, s = math.cos(half_yaw), math.sin(half_yaw)
+            qw, qx, qy, qz = c * qw + s * qz, c * qx + s * qy, c * qy - s * qx, c * qz - s * qw
+
+        out[i][0] = qw
+        out[i][1] = qx
+        out[i][2] = qy
+        out[i][3] = qz
+    return qw, qx, qy, qz, ramped_gain, initialising, rejection_timer, rejection_timed_out
+
+
+class FusionAHRS:
+    """
+    Re-implementation of the Fusion AHRS (`imufusion.Ahrs.update_no_magnetometer`) for a chunk of samples.
+    Gyroscope in deg/s, accelerometer in g.
+
+    See original:
+    https://github.com/xioTechnologies/Fusion/blob/main/Fusion/FusionAhrs.c
+    """
+
+    def __init__(self, sample_rate, gain=0.5, acc_rejection=90.0, rejection_timeout_sec=3.0):
+        self.dt = 1 / sample_rate
+        self.gain = gain
+        self.ramped_gain_step = (FUSION_INITIAL_GAIN - gain) / FUSION_INITIALISATION_PERIOD
+        self.rejection_timeout = int(rejection_timeout_sec * sample_rate)
+        if acc_rejection == 0 or self.rejection_timeout == 0:
+            self.acc_rejection = np.inf
+        else:
+            self.acc_rejection = (0.5 * np.sin(np.radians(acc_rejection))) ** 2
+        self.q = np.array([1.0, 0.0, 0.0, 0.0])
+        self.ramped_gain = FUSION_INITIAL_GAIN
+        self.initialising = True
+        self.rejection_timer = 0
+        self.rejection_timed_out = False
+
+    def update_batch(self, gyro, acc):
+        out, state = _run_kernel(
+            _fusion_kernel,
+            [gyro, acc],
+            4,
+            *self.q,
+            self.ramped_gain,
+            self.initialising,
+            self.rejection_timer,
+            self.rejection_timed_out,
+            self.gain,
+            self.ramped_gain_step,
+            self.acc_rejection,
+            self.rejection_timeout,
+            self.dt,
+        )
+        self.q = np.array(state[:4])
+        self.ramped_gain, self.initialising, self.rejection_timer, self.rejection_timed_out = state[4:]
+        return out
+
+
+__all__ = [
+    "OffsetGyro",
+    "MadgwickAHRS",
+    "FusionAHRS",
+]
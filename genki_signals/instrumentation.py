@@ -0,0 +1,162 @@
+"""
+Low overhead runtime statistics for signal functions and systems.
+
+Durations are recorded into histograms with power of two buckets (in nanoseconds), so recording a value is a few
+integer operations and the memory used is constant no matter how long a system runs. Percentiles computed from the
+histograms are upper bounds accurate to a factor of two, which is enough to tell which function is expensive and to
+catch regressions.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+N_BUCKETS = 64
+
+
+class Histogram:
+    """A histogram of non-negative integers (e.g. durations in ns) with power of two buckets"""
+
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value: int):
+        value = max(int(value), 0)
+        self.counts[min(value.bit_length(), N_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else float("nan")
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket containing the q-th percentile (0 <= q <= 100)"""
+        if self.count == 0:
+            return float("nan")
+        rank = q / 100 * self.count
+        cumulative = 0
+        for bucket, n in enumerate(self.counts):
+            cumulative += n
+            if cumulative >= rank and n > 0:
+                return float(min((1 << bucket) - 1, self.max))
+        return float(self.max)
+
+
+class FunctionStats:
+    def __init__(self):
+        self.calls = 0
+        self.samples_in = 0
+        self.samples_out = 0
+        self.wall_ns = Histogram()
+        self.cpu_ns = Histogram()
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "samples_in": self.samples_in,
+            "samples_out": self.samples_out,
+            **_summary("wall", self.wall_ns),
+            **_summary("cpu", self.cpu_ns),
+        }
+
+
+def _summary(prefix: str, histogram: Histogram) -> dict:
+    """Summary of a histogram of durations in ns, in milliseconds"""
+    return {
+        f"{prefix}_mean_ms": histogram.mean / 1e6,
+        f"{prefix}_p50_ms": histogram.percentile(50) / 1e6,
+        f"{prefix}_p99_ms": histogram.percentile(99) / 1e6,
+        f"{prefix}_max_ms": histogram.max / 1e6,
+        f"{prefix}_total_ms": histogram.total / 1e6,
+    }
+
+
+def n_samples(x) -> int:
+    """Number of samples in a signal, i.e. the length of the last (time) axis"""
+    shape = getattr(x, "shape", None)
+    if shape is None:
+        try:
+            shape = np.shape(x)
+        except ValueError:
+            # Ragged sequences of arrays
+            return 0
+    return shape[-1] if shape else 1
+
+
+class Instrumentation:
+    """
+    Collects per signal function call counts, samples in/out and wall and CPU time histograms, the duration of each
+    system tick and the latency from data arriving at the source to it being passed to the data feeds.
+
+    If log_interval is given, a summary line is logged (at most) every log_interval seconds.
+    """
+
+    def __init__(self, log_interval: float | None = None):
+        self.log_interval = log_interval
+        self.functions = {}
+        self.tick_ns = Histogram()
+        self.latency_ns = Histogram()
+        self._lock = threading.Lock()
+        self._last_log = time.perf_counter()
+
+    def record_function(self, name: str, wall_ns: int, cpu_ns: int, samples_in: int, samples_out: int):
+        with self._lock:
+            stats = self.functions.get(name)
+            if stats is None:
+                stats = self.functions[name] = FunctionStats()
+            stats.calls += 1
+            stats.samples_in += samples_in
+            stats.samples_out += samples_out
+            stats.wall_ns.record(wall_ns)
+            stats.cpu_ns.record(cpu_ns)
+
+    def record_tick(self, wall_ns: int, latency_ns: int | None = None):
+        with self._lock:
+            self.tick_ns.record(wall_ns)
+            if latency_ns is not None:
+                self.latency_ns.record(latency_ns)
+        if self.log_interval is not None and time.perf_counter() - self._last_log >= self.log_interval:
+            self.log()
+
+    def snapshot(self) -> dict:
+        """A dict with the stats of each signal function, plus 'tick' and 'latency' summaries of the system"""
+        with self._lock:
+            return {
+                "functions": {name: stats.as_dict() for name, stats in self.functions.items()},
+                "tick": {"count": self.tick_ns.count, **_summary("wall", self.tick_ns)},
+                "latency": {"count": self.latency_ns.count, **_summary("latency", self.latency_ns)},
+            }
+
+    def to_dataframe(self):
+        """The signal function stats as a DataFrame with one row per function"""
+        return pd.DataFrame.from_dict(self.snapshot()["functions"], orient="index")
+
+    def reset(self):
+        with self._lock:
+            self.functions = {}
+            self.tick_ns = Histogram()
+            self.latency_ns = Histogram()
+
+    def log(self):
+        self._last_log = time.perf_counter()
+        snapshot = self.snapshot()
+        slowest = sorted(snapshot["functions"].items(), key=lambda item: -item[1]["wall_total_ms"])[:3]
+        functions = ", ".join(f"{name} {stats['wall_mean_ms']:.3f}ms" for name, stats in slowest)
+        tick, latency = snapshot["tick"], snapshot["latency"]
+        logger.info(
+            f"ticks: {tick['count']} (p99 {tick['wall_p99_ms']:.2f}ms), "
+            f"latency p50/p99: {latency['latency_p50_ms']:.2f}/{latency['latency_p99_ms']:.2f}ms, "
+            f"slowest functions: {functions}"
+        )
@@ -0,0 +1,131 @@
+"""
+Batched quaternion math.
+
+Quaternions are arrays of shape (4, n) in (w, x, y, z) order and vectors are arrays of shape (3, n), i.e. channel
+first with time along the last axis like all signals in this library. A single quaternion (4,) or vector (3,) is
+broadcast against a batch.
+
+Every function takes an optional `out` array that the result is written into (and returned), so chained computations
+on a stream can reuse preallocated buffers for their results. Unless noted otherwise, `out` may be one of the inputs.
+`rotate` also takes a `work` array for its intermediate results, s.t. it doesn't allocate at all, the other functions
+compute their intermediate results in temporary arrays.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+
+def _output(out, shape, *arrays):
+    if out is None:
+        return np.empty(shape + np.broadcast_shapes(*(a.shape[1:] for a in arrays)), dtype=np.result_type(*arrays))
+    return out
+
+
+def conjugate(q: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """The conjugate (w, -x, -y, -z) of quaternions q, which is the inverse rotation for unit quaternions"""
+    out = _output(out, (4,), q)
+    out[0] = q[0]
+    np.negative(q[1:], out=out[1:])
+    return out
+
+
+def multiply(p: np.ndarray, q: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """The Hamilton product p * q, i.e. the rotation q followed by the rotation p"""
+    out = _output(out, (4,), p, q)
+    pw, px, py, pz = p
+    qw, qx, qy, qz = q
+    # All components are computed before any is written, in case out is p or q
+    w = pw * qw - px * qx - py * qy - pz * qz
+    x = pw * qx + px * qw + py * qz - pz * qy
+    y = pw * qy - px * qz + py * qw + pz * qx
+    z = pw * qz + px * qy - py * qx + pz * qw
+    out[0], out[1], out[2], out[3] = w, x, y, z
+    return out
+
+
+def _expand(a, ndim):
+    """Add trailing axes to a single quaternion or vector so it broadcasts against a batch"""
+    return a.reshape(a.shape + (1,) * (ndim - a.ndim))
+
+
+def _cross(a, b, out, tmp):
+    """Cross product of (3, n) arrays, out must not be a or b and tmp is a scratch array of shape (n,)"""
+    for i, j, k in ((0, 1, 2), (1, 2, 0), (2, 0, 1)):
+        np.multiply(a[j], b[k], out=out[i, ...])
+        np.multiply(a[k], b[j], out=tmp)
+        out[i] -= tmp
+    return out
+
+
+def rotate(
+    q: np.ndarray, v: np.ndarray, out: np.ndarray | None = None, work: np.ndarray | None = None
+) -> np.ndarray:
+    """
+    Rotate vectors v by unit quaternions q, i.e. q * (0, v) * q^-1. With q the orientation of a device this takes v
+    from the device frame to the global frame; use the conjugate of q for the opposite direction.
+
+    work is a scratch array of shape (3, *out.shape) for the intermediate results, which is allocated if not given.
+    """
+    out = _output(out, (3,), q, v)
+    if work is None:
+        work = np.empty((3, *out.shape), dtype=out.dtype)
+    q, v = _expand(q, out.ndim), _expand(v, out.ndim)
+    # v + w * t + u x t with u the vector part of q and t = 2 * u x v
+    u, t, ut, tmp = q[1:], work[0], work[1], work[2, 0, ...]
+    _cross(u, v, t, tmp)
+    t *= 2
+    _cross(u, t, ut, tmp)
+    ut += v
+    np.multiply(q[0], t, out=out)
+    out += ut
+    return out
+
+
+def to_euler(q: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """Euler angles (roll, pitch, yaw) in radians of unit quaternions q, of shape (3, n)"""
+    out = _output(out, (3,), q)
+    qw, qx, qy, qz = q
+    roll = np.arctan2(2 * (qw * qx + qy * qz), 1 - 2 * (qx * qx + qy * qy))
+    # Clipped so rounding errors at the poles (gimbal lock) give +-pi/2 instead of nan
+    pitch = np.arcsin(np.clip(2 * (qw * qy - qz * qx), -1, 1))
+    yaw = np.arctan2(2 * (qw * qz + qx * qy), 1 - 2 * (qy * qy + qz * qz))
+    out[0], out[1], out[2] = roll, pitch, yaw
+    return out
+
+
+def to_axis_angle(q: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    The rotation angle in degrees and the unit rotation axis of unit quaternions q, of shape (4, n). The axis is zero
+    for the identity rotation.
+    """
+    out = _output(out, (4,), q)
+    qw = np.clip(q[0], -1, 1)
+    sin_half_angle = np.sqrt(1 - qw * qw)
+    axis = np.divide(q[1:], sin_half_angle, out=np.zeros_like(out[1:]), where=sin_half_angle > 0)
+    np.rad2deg(2 * np.arccos(qw), out=out[0])
+    out[1:] = axis
+    return out
+
+
+def gravity(q: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    The direction of gravity (the global z axis) in the frame of a device with orientation q, of shape (3, n).
+    Same as `rotate(conjugate(q), [0, 0, 1])` but cheaper.
+    """
+    out = _output(out, (3,), q)
+    qw, qx, qy, qz = q
+    gx = 2.0 * (qx * qz - qw * qy)
+    gy = 2.0 * (qw * qx + qy * qz)
+    gz = 2.0 * (qw * qw + qz * qz) - 1.0
+    out[0], out[1], out[2] = gx, gy, gz
+    return out
+
+
+__all__ = [
+    "conjugate",
+    "multiply",
+    "rotate",
+    "to_euler",
+    "to_axis_angle",
+    "gravity",
+]
@@ -2,10 +2,28 @@
 This module contains classes for recording data.
 """
 import abc
+import json
+import logging
 import pickle
+import time
 import wave
+from pathlib import Path
+from queue import Empty, Full, Queue
+from threading import Thread
+
+import numpy as np
 
 from genki_signals.buffers import DataBuffer
+from genki_signals.data_formats import (
+    CHUNKED_MAGIC,
+    COLUMNS_INDEX,
+    column_filename,
+    npy_header,
+    write_chunk,
+    write_column,
+)
+
+logger = logging.getLogger(__name__)
 
 
 class Recorder(abc.ABC):
@@ -17,13 +35,17 @@ class Recorder(abc.ABC):
     def stop(self):
         pass
 
+    def flush(self):
+        """Write buffered data to disk, recorders where this is expensive can ignore it"""
+        pass
+
 
 class PickleRecorder(Recorder):
     def __init__(self, path, rec_buffer_size=1_000_000):
         self.path = path
         self.rec_buffer_size = rec_buffer_size
         self._has_written_file = False
-        self._recording_buffer = DataBuffer()
+        self._recording_buffer = DataBuffer(storage="growable")
 
     def write(self, data: DataBuffer):
         self._recording_buffer.extend(data)
@@ -36,16 +58,99 @@ class PickleRecorder(Recorder):
     def _flush_to_file(self):
         if self._has_written_file:
             with open(self.path, "rb") as f:
-                old_data = pickle.load(f)
-                data = old_data.extend(self._recording_buffer)
+                data = pickle.load(f)
+            data.extend(self._recording_buffer.freeze())
         else:
-            data = self._recording_buffer
+            data = self._recording_buffer.freeze()
         with open(self.path, "wb") as f:
             pickle.dump(data, f)
             self._has_written_file = True
         self._recording_buffer.clear()
 
 
+class ChunkedFileRecorder(Recorder):
+    """
+    Records to an append-only chunked file (see `genki_signals.data_formats`). Each flush appends one chunk to the
+    end of the file without reading or rewriting the earlier ones, so the cost of a flush doesn't grow with the
+    length of the recording.
+    """
+
+    def __init__(self, path, rec_buffer_size=10_000):
+        self.path = path
+        self.rec_buffer_size = rec_buffer_size
+        self._recording_buffer = DataBuffer(storage="chunked")
+        self._file = open(self.path, "wb")
+        self._file.write(CHUNKED_MAGIC)
+
+    def write(self, data: DataBuffer):
+        self._recording_buffer.extend(data)
+        if len(self._recording_buffer) > self.rec_buffer_size:
+            self._flush_to_file()
+
+    def stop(self):
+        self._flush_to_file()
+        self._file.close()
+
+    def flush(self):
+        self._flush_to_file()
+
+    def _flush_to_file(self):
+        if len(self._recording_buffer) > 0:
+            write_chunk(self._file, self._recording_buffer.freeze())
+            self._file.flush()
+        self._recording_buffer.clear()
+
+
+class ColumnarRecorder(Recorder):
+    """
+    Records to a columnar raw data directory (see `genki_signals.data_formats`), with one .npy file per signal
+    that is appended to on each write. Sessions recorded this way are memory mapped when loaded.
+
+    The .npy headers and the index are only brought up to date on `flush` and `stop`.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=False)
+        self._files = {}
+        self._index = {}
+
+    def write(self, data: DataBuffer):
+        for key, value in data.items():
+            value = np.asarray(value)
+            if key not in self._files:
+                filename = column_filename(key, len(self._files))
+                self._files[key] = open(self.path / filename, "wb")
+                self._files[key].write(npy_header(value.dtype, (*value.shape[:-1], 0)))
+                self._index[key] = {"file": filename, "dtype": value.dtype.str, "shape": [*value.shape[:-1], 0]}
+
+            entry = self._index[key]
+            if tuple(entry["shape"][:-1]) != value.shape[:-1]:
+                raise ValueError(f"Expected shape {entry['shape'][:-1]} for signal '{key}', got {value.shape=}")
+            dtype = np.dtype(entry["dtype"])
+            if value.dtype != dtype:
+                value = value.astype(dtype, casting="same_kind")
+
+            write_column(self._files[key], value)
+            entry["shape"][-1] += value.shape[-1]
+
+    def flush(self):
+        for key, file in self._files.items():
+            entry = self._index[key]
+            position = file.tell()
+            file.seek(0)
+            file.write(npy_header(np.dtype(entry["dtype"]), entry["shape"]))
+            file.seek(position)
+            file.flush()
+        with open(self.path / COLUMNS_INDEX, "w") as f:
+            json.dump(self._index, f, indent=4)
+
+    def stop(self):
+        self.flush()
+        for file in self._files.values():
+            file.close()
+
+
 class WavFileRecorder(Recorder):
     def __init__(self, path, frame_rate, n_channels, sample_width):
         self.path = path
@@ -66,7 +171,7 @@ class CsvFileRecorder(Recorder):
         self.path = path
         self.rec_buffer_size = rec_buffer_size
         self._has_written_file = False
-        self._recording_buffer = DataBuffer()
+        self._recording_buffer = DataBuffer(storage="growable")
 
     def _flush_to_file(self):
         df = self._recording_buffer.to_dataframe()
@@ -84,3 +189,160 @@ class CsvFileRecorder(Recorder):
 
     def stop(self):
         self._flush_to_file()
+
+    def flush(self):
+        if len(self._recording_buffer) > 0:
+            self._flush_to_file()
+
+
+_STOP = object()
+
+
+class AsyncRecorder(Recorder):
+    """
+    Wraps a recorder s.t. all writes to it happen on a dedicated I/O thread, and `write` only puts the data on a
+    bounded queue. If the queue is full the data is dropped (and counted in `dropped_chunks`) rather than blocking
+    the caller.
+
+    The I/O thread batches the queued data and hands it to the wrapped recorder (followed by a call to its `flush`)
+    when either `flush_bytes` bytes have accumulated or `flush_interval` seconds have passed since the last flush.
+    Set either to None to disable that condition. `stop` waits until everything on the queue has been written.
+
+    Data that fails to be written is counted in `dropped_chunks`, and the first error is raised again by `stop`.
+    """
+
+    def __init__(self, recorder: Recorder, max_queue_size=1000, flush_bytes=1_000_000, flush_interval=1.0):
+        self.recorder = recorder
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self._queue = Queue(maxsize=max_queue_size)
+        self._pending = DataBuffer(storage="chunked")
+        self._pending_bytes = 0
+        self._pending_chunks = 0
+        self._error = None
+
+        self.bytes_written = 0
+        self.dropped_chunks = 0
+        self.n_flushes = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self._total_flush_latency = 0.0
+
+        self._thread = Thread(target=self._run, name=f"{self.__class__.__name__}-{recorder.__class__.__name__}")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, data: DataBuffer):
+        if not self._thread.is_alive():
+            self.dropped_chunks += 1
+            return
+        try:
+            self._queue.put_nowait(dict(data.items()))
+        except Full:
+            self.dropped_chunks += 1
+
+    def stop(self):
+        # The I/O thread only stops consuming the queue if it died, in which case it can't be waited for
+        while self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=0.1)
+                break
+            except Full:
+                pass
+        self._thread.join()
+        self.recorder.stop()
+        if self._error is not None:
+            raise self._error
+
+    def _fail(self, error: Exception, n_chunks: int):
+        self.dropped_chunks += n_chunks
+        if self._error is None:
+            self._error = error
+        logger.error(f"Error writing to {self.recorder.__class__.__name__}, dropped {n_chunks} chunks: {error!r}")
+
+    def _run(self):
+        try:
+            self._loop()
+        except Exception as e:
+            # Nothing is written after the thread dies, so everything pending or queued is dropped
+            n_queued = 0
+            while True:
+                try:
+                    n_queued += self._queue.get_nowait() is not _STOP
+                except Empty:
+                    break
+            self._fail(e, self._pending_chunks + n_queued)
+
+    def _loop(self):
+        last_flush = time.monotonic()
+        while True:
+            timeout = None
+            if self.flush_interval is not None:
+                timeout = max(0.0, last_flush + self.flush_interval - time.monotonic())
+            try:
+                data = self._queue.get(timeout=timeout)
+            except Empty:
+                data = None
+
+            if data is _STOP:
+                self._flush()
+                return
+            if data is not None:
+                try:
+                    self._pending.extend(data)
+                except Exception as e:
+                    # The pending data may have been partially extended, so it's discarded along with the chunk
+                    self._fail(e, self._pending_chunks + 1)
+                    self._clear_pending()
+                    continue
+                self._pending_bytes += sum(v.nbytes for v in data.values())
+                self._pending_chunks += 1
+
+            now = time.monotonic()
+            by_bytes = self.flush_bytes is not None and self._pending_bytes >= self.flush_bytes
+            by_time = self.flush_interval is not None and now - last_flush >= self.flush_interval
+            if by_bytes or by_time:
+                self._flush()
+                last_flush = now
+
+    def _clear_pending(self):
+        self._pending.clear()
+        self._pending_bytes = 0
+        self._pending_chunks = 0
+
+    def _flush(self):
+        if len(self._pending) == 0:
+            return
+        data = self._pending.freeze()
+        n_bytes, n_chunks = self._pending_bytes, self._pending_chunks
+        self._clear_pending()
+
+        start = time.perf_counter()
+        try:
+            self.recorder.write(data)
+            self.recorder.flush()
+        except Exception as e:
+            self._fail(e, n_chunks)
+            return
+        latency = time.perf_counter() - start
+
+        self.bytes_written += n_bytes
+        self.n_flushes += 1
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        self._total_flush_latency += latency
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "bytes_written": self.bytes_written,
+            "dropped_chunks": self.dropped_chunks,
+            "n_flushes": self.n_flushes,
+            "last_flush_latency": self.last_flush_latency,
+            "max_flush_latency": self.max_flush_latency,
+            "mean_flush_latency": self._total_flush_latency / self.n_flushes if self.n_flushes else 0.0,
+        }
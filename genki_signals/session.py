@@ -17,8 +17,10 @@ from pathlib import Path
 import numpy as np
 
 from genki_signals.buffers import DataBuffer
+from genki_signals.data_formats import memmap_wav, read_chunked_file, read_columns
 from genki_signals.functions.serialization import encode_signal_fn, decode_signal_fn
-from genki_signals.functions.base import compute_signal_functions
+from genki_signals.functions.pipeline import Pipeline
+from genki_signals.functions.windowed import WindowedSignalFunction
 
 
 def read_json_file(p: Path | str):
@@ -31,6 +33,34 @@ def write_json_file(p: Path | str, data: dict | list):
         json.dump(data, FILE, indent=4, default=encode_signal_fn)
 
 
+def _slice_range(data: DataBuffer, start: int, end: int, length: int, keys=None, windowed=None) -> DataBuffer:
+    """
+    Slice [start, end) out of each signal, where the indices are relative to a signal of the given length.
+    Signals with a different length, e.g. audio recorded in chunks with one timestamp per chunk, are sliced
+    proportionally.
+
+    The outputs of the functions in `windowed` (a dict of WindowedSignalFunction by name, without upsampling) are
+    instead sliced by window, keeping the windows that start in [start, end). The windows have to be computed on a
+    signal of the given length, starting at index 0 of it.
+    """
+    windowed = windowed or {}
+    sliced = {}
+    for key in data.keys() if keys is None else keys:
+        value = data[key]
+        n = value.shape[-1]
+        n_windows = windowed[key].n_complete_windows(length) if key in windowed else 0
+        if n_windows > 0 and n % n_windows == 0:
+            # Each window has the same number of outputs
+            per_window, stride = n // n_windows, windowed[key].num_to_pop
+            first, last = -(-start // stride), -(-end // stride)
+            sliced[key] = value[..., first * per_window : last * per_window]
+        elif n == length or length == 0:
+            sliced[key] = value[..., start:end]
+        else:
+            sliced[key] = value[..., start * n // length : end * n // length]
+    return DataBuffer(data=sliced)
+
+
 class Session:
     """Encapsulates data for a single recorded session, includes metadata.
     Use `Session.from_filename` to load a session.
@@ -38,11 +68,12 @@ class Session:
     Each Session object corresponds to a directory with the following structure:
 
     session
-    |-- raw_data.pickle
+    |-- raw_data.columns
     |-- metadata.json
 
-    The file raw_data.pickle (can also be other formats, e.g. wav and parquet)
-    contains the raw data recorded during the session, and is read-only.
+    The raw data file, here raw_data.columns (can also be other formats, e.g. chunks, pickle and wav)
+    contains the raw data recorded during the session, and is read-only. Columnar and wav
+    files are memory mapped, so only the parts of the data that are accessed are read.
 
     The file metadata.json contains various metadata about the session, and
     can be modified by the `Session` object.
@@ -98,10 +129,17 @@ class Session:
         if self.datafile_extension in [".pickle", ".pkl"]:
             with open(self.raw_data_path, "rb") as FILE:
                 self._raw_data = pickle.load(FILE)
+        elif self.datafile_extension == ".columns":
+            self._raw_data = read_columns(self.raw_data_path)
+        elif self.datafile_extension == ".chunks":
+            self._raw_data = read_chunked_file(self.raw_data_path)
         elif self.datafile_extension == ".wav":
-            wavefile = wave.open(self.raw_data_path.as_posix(), "rb")
-            data = wavefile.readframes(wavefile.getnframes())
-            self._raw_data = DataBuffer(data={"audio": np.frombuffer(data, np.int16)})
+            try:
+                audio = memmap_wav(self.raw_data_path)
+            except NotImplementedError:
+                wavefile = wave.open(self.raw_data_path.as_posix(), "rb")
+                audio = np.frombuffer(wavefile.readframes(wavefile.getnframes()), np.int16)
+            self._raw_data = DataBuffer(data={"audio": audio})
         else:
             raise NotImplementedError(f"Loading data from {self._datafile_extension} is not implemented")
 
@@ -162,11 +200,57 @@ class Session:
         self.metadata[name] = value
         self._write_metadata()
 
-    def get_data(self):
+    def _fresh_functions(self):
+        # The signal functions are stateful, so each computation needs new instances of them
+        return json.loads(json.dumps(self.functions, default=encode_signal_fn), object_hook=decode_signal_fn)
+
+    def get_data(self, start=None, end=None, keys=None, timestamp_key="timestamp"):
         """
         Compute signal functions on raw data, returns a new DataBuffer.
+
+        Args:
+            start: Start of the time range [start, end) to return, in the units of the timestamp signal
+            end: End of the time range, the range is found by binary search so the timestamps have to be sorted
+            keys: The signals to return, only the signal functions needed for these signals are computed
+            timestamp_key: The signal to use for the time range
+
+        When a time range is given, only the raw data in that range is read, along with enough data before it to
+        warm up stateful signal functions (see `SignalFunction.history`). Functions that depend on their
+        entire history (e.g. Integrate) are computed from the start of the session.
         """
-        return compute_signal_functions(self.raw_data, self.functions)
+        pipeline = Pipeline(self._fresh_functions(), outputs=keys)
+        raw_keys = None
+        if keys is not None:
+            used_inputs = pipeline.compile(self.raw_data.keys()).used_inputs
+            raw_keys = [k for k in self.raw_data.keys() if k in used_inputs]
+
+        if start is None and end is None:
+            data = self.raw_data if raw_keys is None else DataBuffer(data={k: self.raw_data[k] for k in raw_keys})
+            data = pipeline(data)
+        else:
+            timestamps = self.raw_data[timestamp_key]
+            length = timestamps.shape[-1]
+            start_idx = 0 if start is None else int(np.searchsorted(timestamps, start))
+            end_idx = length if end is None else int(np.searchsorted(timestamps, end))
+            end_idx = max(start_idx, end_idx)
+
+            history, alignment = pipeline.history(self.raw_data.keys() if raw_keys is None else raw_keys)
+            warmup_idx = 0 if history is None else max(0, start_idx - history)
+            warmup_idx -= warmup_idx % alignment
+
+            data = _slice_range(self.raw_data, warmup_idx, end_idx, length, raw_keys)
+            data = pipeline(data)
+            windowed = {
+                fn.name: fn
+                for fn in pipeline.functions
+                if isinstance(fn, WindowedSignalFunction) and not fn.upsample
+            }
+            length = end_idx - warmup_idx
+            data = _slice_range(data, start_idx - warmup_idx, length, length, windowed=windowed)
+
+        if keys is not None:
+            data = DataBuffer(data={k: data[k] for k in keys})
+        return data
 
     def get_parameters(self):
         return dict(
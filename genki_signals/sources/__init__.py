@@ -7,7 +7,7 @@ need to be sampled by a sampler.
 """
 
 from .base import SignalSource, SamplerBase  # noqa: F401, F403
-from .sampler import Sampler  # noqa: F401, F403
+from .sampler import Sampler, SharedClock  # noqa: F401, F403
 from .generators import *  # noqa: F401, F403
 from .local import *  # noqa: F401, F403
 from .dataframe import *  # noqa: F401, F403
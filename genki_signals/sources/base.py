@@ -1,4 +1,8 @@
+from __future__ import annotations
+
 import abc
+import threading
+import time
 
 
 class SignalSource(abc.ABC):
@@ -13,7 +17,64 @@ class SignalSource(abc.ABC):
         pass
 
 
+class DataNotifier:
+    """
+    Lets a sampler tell a consumer that new data is available, s.t. the consumer can wait for data instead of polling.
+    `pending` counts the data points queued since the last `reset` and `first_arrival` is the time.perf_counter()
+    of the first of them.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.pending = 0
+        self.first_arrival = None
+        self._woken = False
+
+    def notify(self, n: int = 1):
+        with self._condition:
+            if self.pending == 0:
+                self.first_arrival = time.perf_counter()
+            self.pending += n
+            self._condition.notify_all()
+
+    def wait(self, min_count: int = 1, max_wait: float | None = None) -> int:
+        """
+        Block until at least min_count data points are pending, or until max_wait seconds have passed since the first
+        pending data point arrived (if max_wait is given), or until `wake` is called. Returns the number pending.
+        """
+        with self._condition:
+            while not self._woken and self.pending < min_count:
+                if max_wait is not None and self.pending > 0:
+                    remaining = self.first_arrival + max_wait - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                else:
+                    self._condition.wait()
+            self._woken = False
+            return self.pending
+
+    def reset(self) -> tuple[int, float | None]:
+        """Mark the pending data as consumed, returns the number of data points and the first arrival time"""
+        with self._condition:
+            pending, first_arrival = self.pending, self.first_arrival
+            self.pending = 0
+            self.first_arrival = None
+            return pending, first_arrival
+
+    def wake(self):
+        """Wake up a consumer blocked in `wait`, e.g. when stopping"""
+        with self._condition:
+            self._woken = True
+            self._condition.notify_all()
+
+
 class SamplerBase(abc.ABC):
+    # Set by a consumer that wants to be notified when data is queued, samplers call `_notify` when they queue data
+    notifier: DataNotifier | None = None
+    # Whether the sampler calls `_notify`, consumers have to poll samplers that don't
+    notifies_on_data = False
+
     @abc.abstractmethod
     def start(self):
         pass
@@ -25,3 +86,7 @@ class SamplerBase(abc.ABC):
     @abc.abstractmethod
     def read(self):
         pass
+
+    def _notify(self, n: int = 1):
+        if self.notifier is not None:
+            self.notifier.notify(n)
@@ -1,15 +1,16 @@
+from __future__ import annotations
+
 import abc
 import asyncio
 import threading
-from queue import Queue
 from typing import Callable, Type
 
 from bleak import BleakClient, BleakScanner
 from genki_wave.protocols import CommunicateCancel
 from genki_wave.utils import get_or_create_event_loop
 
-from genki_signals.buffers import DataBuffer
 from genki_signals.sources.base import SamplerBase, SignalSource
+from genki_signals.sources.ring import RecordRing
 
 
 async def find_ble_address(device_name: str = None):
@@ -54,22 +55,28 @@ class BLEProtocol:
 class BLESource(SignalSource, SamplerBase):
     """Signal source to receive samples over a BLE connection"""
 
+    notifies_on_data = True
+
     def __call__(self):
         return self.latest_point
 
-    def __init__(self, ble_address: str, char_uuid: str, protocol: Type[BLEProtocol], other_sources=[]):
+    def __init__(
+        self,
+        ble_address: str,
+        char_uuid: str,
+        protocol: Type[BLEProtocol],
+        other_sources=[],
+        buffer_size: int | None = None,
+        overflow: str = "drop",
+    ):
         self.ble_address = ble_address
         self.char_uuid = char_uuid
         self.protocol = protocol
         self.sources = other_sources
-        self.buffer = Queue()
+        self.buffer = RecordRing(buffer_size, overflow=overflow)
 
     def read(self):
-        data = DataBuffer()
-        while not self.buffer.empty():
-            sample = self.buffer.get()
-            data.append(sample)
-        return data
+        return self.buffer.read_buffer()
 
     def start(self):
         if self.is_active():
@@ -91,6 +98,7 @@ class BLESource(SignalSource, SamplerBase):
             secondary_data.pop("timestamp", None)
             data.update(**secondary_data)
         self.buffer.put(data)
+        self._notify()
         self.latest_point = data
 
     def is_active(self):
@@ -3,6 +3,7 @@ from pathlib import Path
 import pandas as pd
 
 from genki_signals.buffers import DataBuffer
+from genki_signals.data_formats import iter_chunks, read_columns
 from genki_signals.sources.base import SamplerBase, SignalSource
 
 
@@ -25,47 +26,169 @@ class DataFrameSource(SamplerBase):
         self.current_line = None
         self.data = df
         self.lines_per_read = lines_per_read
+        self._columns = None
 
     def start(self):
         self.current_line = 0
-        self._load_chunk()
+        # Converted once, each read is then a slice of the columns
+        self._columns = DataBuffer.from_dataframe(self.data)
 
     def stop(self):
         pass
 
-    def _load_chunk(self):
-        if self.lines_per_read < 0:
-            data = self.data
-        else:
-            data = self.data.iloc[self.current_line : self.current_line + self.lines_per_read]
-        self.next_chunk = DataBuffer.from_dataframe(data)
-
     def read(self):
-        if not hasattr(self, "current_line"):
+        if self.current_line is None:
             raise Exception("Tried to call read() from a data source that has not been started.")
-        chunk = self.next_chunk
-        self.current_line += len(list(chunk.values())[0])
-        self._load_chunk()
+        if self.lines_per_read < 0:
+            return DataBuffer(data=dict(self._columns.items()))
+        end = self.current_line + self.lines_per_read
+        chunk = DataBuffer(data={k: v[..., self.current_line : end] for k, v in self._columns.items()})
+        self.current_line = min(end, len(self.data))
         return chunk
 
     def signal_names(self):
-        return list(self.next_chunk.keys())
+        return list(self.data.columns)
+
+
+def _skip(chunks, n):
+    """Drop the first n time steps of an iterator over chunks (dicts of arrays)"""
+    for chunk in chunks:
+        length = max((v.shape[-1] for v in chunk.values()), default=0)
+        if n >= length:
+            n -= length
+            continue
+        yield {k: v[..., n:] for k, v in chunk.items()}
+        n = 0
+
+
+def _iter_parquet(path, chunk_size, line_offset):
+    import pyarrow.parquet as pq
+
+    with pq.ParquetFile(path) as file:
+        # Row groups before the offset are skipped without being read
+        row_groups = []
+        for i in range(file.num_row_groups):
+            n_rows = file.metadata.row_group(i).num_rows
+            if not row_groups and line_offset >= n_rows:
+                line_offset -= n_rows
+            else:
+                row_groups.append(i)
+        # Like pd.read_parquet followed by DataBuffer.from_dataframe, a DataFrame index stored by pandas is dropped
+        pandas_metadata = file.schema_arrow.pandas_metadata or {}
+        index_columns = [c for c in pandas_metadata.get("index_columns", []) if isinstance(c, str)]
+        columns = [name for name in file.schema_arrow.names if name not in index_columns]
+        batches = file.iter_batches(batch_size=chunk_size, row_groups=row_groups, columns=columns)
+        chunks = ({name: batch[name].to_numpy(zero_copy_only=False) for name in columns} for batch in batches)
+        yield from _skip(chunks, line_offset)
+
+
+def _iter_csv(path, chunk_size, line_offset):
+    # Rows before the offset are skipped by the parser, the header (row 0) is kept
+    with pd.read_csv(path, chunksize=chunk_size, skiprows=range(1, line_offset + 1)) as reader:
+        for df in reader:
+            yield {k: df[k].to_numpy() for k in df.columns}
+
+
+def _iter_pickle(path, chunk_size, line_offset):
+    # Pickles can't be read incrementally, so this loads the whole DataFrame
+    df = pd.read_pickle(path).iloc[line_offset:]
+    for start in range(0, len(df), chunk_size):
+        yield {k: df[k].to_numpy()[start : start + chunk_size] for k in df.columns}
+
+
+def _iter_columns(path, chunk_size, line_offset):
+    # The arrays are memory mapped, so slicing them doesn't read anything
+    data = read_columns(path, mmap=True)
+    for start in range(line_offset, len(data), chunk_size):
+        yield {k: v[..., start : start + chunk_size] for k, v in data.items()}
+
+
+def _iter_chunk_file(path, chunk_size, line_offset):
+    yield from _skip(iter_chunks(path), line_offset)
+
+
+_READERS = {
+    ".parquet": _iter_parquet,
+    ".csv": _iter_csv,
+    ".pkl": _iter_pickle,
+    ".columns": _iter_columns,
+    ".chunks": _iter_chunk_file,
+}
 
 
 class FileSource(DataFrameSource):
-    def __init__(self, filename, lines_per_read=5, line_offset=0):
-        self.path = Path(filename)
+    """
+    Replays a recorded file, returning lines_per_read lines on each call to read(), or all lines of the file (from
+    line_offset) on every call if lines_per_read is negative, like DataFrameSource.
+
+    Supported formats are .csv, .parquet, .pkl and the raw data formats (.columns and .chunks, see data_formats).
+    Except for pickles, the file is streamed in chunks of up to chunk_size lines, converted directly to numpy arrays,
+    so the memory used doesn't depend on the size of the file. Only a negative lines_per_read and the `data` attribute
+    load the whole file.
+    """
 
-        if self.path.suffix == ".csv":
-            data = pd.read_csv(self.path)
-        elif self.path.suffix == ".pkl":
-            data = pd.read_pickle(self.path)
-        elif self.path.suffix == ".parquet":
-            data = pd.read_parquet(self.path)
-        else:
+    def __init__(self, filename, lines_per_read=5, line_offset=0, chunk_size=65536):
+        self.path = Path(filename)
+        if self.path.suffix not in _READERS:
             raise Exception(f"Suffix {self.path.suffix} not supported for FileSource (Path: {self.path})")
-        data = data.iloc[line_offset:]
-        super().__init__(data, lines_per_read)
+        self.lines_per_read = lines_per_read
+        self.line_offset = line_offset
+        self.chunk_size = chunk_size
+        self._chunks = None
+        self._pending = None
+        self._all = None
+        self._data = None
+
+    @property
+    def data(self) -> pd.DataFrame:
+        """The whole file from line_offset as a DataFrame, loaded on first access"""
+        if self._data is None:
+            df = self._load_all().to_dataframe()
+            df.index = pd.RangeIndex(self.line_offset, self.line_offset + len(df))
+            self._data = df
+        return self._data
+
+    def _load_all(self) -> DataBuffer:
+        if self._all is None:
+            self._all = DataBuffer(storage="chunked")
+            for chunk in _READERS[self.path.suffix](self.path, self.chunk_size, self.line_offset):
+                self._all.extend(chunk)
+        return self._all
+
+    def start(self):
+        self.stop()
+        self._chunks = _READERS[self.path.suffix](self.path, self.chunk_size, self.line_offset)
+        self._pending = DataBuffer(storage="chunked")
+
+    def stop(self):
+        if self._chunks is not None:
+            # Closes the file
+            self._chunks.close()
+            self._chunks = None
+
+    def _fill(self, n):
+        """Read chunks from the file until at least n lines are pending or the file is exhausted"""
+        while len(self._pending) < n:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return
+            self._pending.extend(chunk)
+
+    def read(self):
+        if self._chunks is None:
+            raise Exception("Tried to call read() from a data source that has not been started.")
+        if self.lines_per_read < 0:
+            return DataBuffer(data=dict(self._load_all().items()))
+        self._fill(self.lines_per_read)
+        if len(self._pending) == 0:
+            return DataBuffer()
+        return DataBuffer(data=self._pending.popleft(self.lines_per_read))
+
+    def signal_names(self):
+        if self._chunks is None:
+            raise Exception("Tried to call signal_names() from a data source that has not been started.")
+        self._fill(1)
+        return list(self._pending.keys())
 
     def __repr__(self):
         return f"<{self.__class__.__name__}: {self.path}>"
@@ -1,10 +1,8 @@
-from queue import Queue
-
 import time
 import numpy as np
 
-from genki_signals.buffers import DataBuffer
 from genki_signals.sources.base import SignalSource, SamplerBase
+from genki_signals.sources.ring import RecordRing
 
 
 class MouseSource(SignalSource):
@@ -97,7 +95,16 @@ class CameraSource(SignalSource):
 class MicSource(SamplerBase):
     """Samples audio data in chunks from the microphone."""
 
-    def __init__(self, key: str = "audio", chunk_size: int = 1024, followers: dict[str, SignalSource] = {}):
+    notifies_on_data = True
+
+    def __init__(
+        self,
+        key: str = "audio",
+        chunk_size: int = 1024,
+        followers: dict[str, SignalSource] = {},
+        buffer_size: int = 256,
+        overflow: str = "drop",
+    ):
         import pyaudio
 
         self.key = key
@@ -109,10 +116,12 @@ class MicSource(SamplerBase):
         self.sample_width = self.pa.get_sample_size(self.format)
         self.chunk_size = chunk_size
         self.stream = None
-        self.buffer = Queue()
+        # One record per chunk of audio
+        self.buffer = RecordRing(buffer_size, overflow=overflow)
         self.is_active = False
         self.followers = followers
-        self.signal_names = [self.key]
+        # The signals of followers are only known once they have been sampled
+        self.signal_names = None if followers else ["timestamp", self.key]
 
     def start(self):
         self.stream = self.pa.open(
@@ -152,11 +161,8 @@ class MicSource(SamplerBase):
             else:
                 data[name] = np.array([d]).T
         self.buffer.put(data)
+        self._notify()
         return in_data, paContinue
 
     def read(self):
-        data = DataBuffer()
-        while not self.buffer.empty():
-            d = self.buffer.get()
-            data.extend(d)
-        return data
+        return self.buffer.read_buffer(chunked=True)
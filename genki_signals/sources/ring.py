@@ -0,0 +1,151 @@
+"""
+A single producer, single consumer ring buffer of records, for handing data from a sampler's callback thread to the
+thread reading it.
+
+The producer only stores a reference to each record in a preallocated slot and then advances the write count, and the
+consumer only reads the slots and then advances the read count, so neither needs a lock. All conversion of the records
+to arrays happens on the consumer, s.t. the callback thread does as little work as possible.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+
+import numpy as np
+
+from genki_signals.buffers import DataBuffer
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop", "block")
+DEFAULT_MAX_CAPACITY = 4096
+DEFAULT_MAX_BYTES = 64 * 2**20
+
+
+class RecordRing:
+    """
+    A ring buffer holding up to `capacity` records, each a dict with the same keys and value shapes.
+
+    If capacity is None it is chosen when the first record arrives, as the number of records of that size that fit in
+    max_bytes (at most DEFAULT_MAX_CAPACITY records), s.t. e.g. a full ring of camera frames holds a few dozen frames
+    instead of thousands.
+
+    When the ring is full, overflow "drop" discards the new record (and counts it in `dropped`), while "block" waits
+    up to block_timeout seconds (forever if None) for the consumer to make room before dropping it. Records whose keys
+    or value shapes (apart from the chunk length if chunked) differ from the first record read are discarded by
+    `read_buffer` and counted in `invalid`.
+    """
+
+    def __init__(
+        self,
+        capacity: int | None = None,
+        overflow: str = "drop",
+        block_timeout: float | None = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}, expected one of {OVERFLOW_POLICIES}")
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self.invalid = 0
+        self._reported_dropped = 0
+        self._slots = None if capacity is None else [None] * capacity
+        # The shape of each value of the records, taken from the first record read
+        self._shapes = None
+        # Total number of records written (only changed by the producer) and read (only changed by the consumer)
+        self._written = 0
+        self._read = 0
+        self._consumed = threading.Event()
+
+    def __len__(self):
+        return self._written - self._read
+
+    def _allocate(self, record: dict):
+        record_bytes = sum(np.asarray(value).nbytes for value in record.values())
+        self.capacity = int(np.clip(self.max_bytes // max(record_bytes, 1), 1, DEFAULT_MAX_CAPACITY))
+        self._slots = [None] * self.capacity
+
+    def _wait_for_space(self) -> bool:
+        if self.overflow == "drop":
+            return False
+        while self._written - self._read >= self.capacity:
+            # Cleared before checking again, s.t. a consume in between is not missed
+            self._consumed.clear()
+            if self._written - self._read < self.capacity:
+                break
+            if not self._consumed.wait(self.block_timeout):
+                return False
+        return True
+
+    def put(self, record: dict) -> bool:
+        """Add a record, returns False if it was dropped because the ring is full. The record must not be modified."""
+        if self._slots is None:
+            self._allocate(record)
+        if self._written - self._read >= self.capacity and not self._wait_for_space():
+            self.dropped += 1
+            return False
+        self._slots[self._written % self.capacity] = record
+        self._written += 1
+        return True
+
+    def peek(self) -> list[dict]:
+        """The records available to the consumer, in order, without consuming them"""
+        if self.dropped != self._reported_dropped:
+            logger.warning(f"Ring buffer full, dropped {self.dropped - self._reported_dropped} records")
+            self._reported_dropped = self.dropped
+        n = self._written - self._read
+        if n == 0:
+            return []
+        start = self._read % self.capacity
+        records = self._slots[start : start + n]
+        return records + self._slots[: n - len(records)]
+
+    def consume(self, n: int):
+        """Release the first n available records, s.t. the producer can reuse their slots"""
+        if n > len(self):
+            raise IndexError(f"Cannot consume {n} records, only {len(self)} available")
+        if n == 0:
+            return
+        # The slots are cleared s.t. the ring doesn't keep consumed records alive
+        start = self._read % self.capacity
+        first = min(n, self.capacity - start)
+        self._slots[start : start + first] = [None] * first
+        self._slots[: n - first] = [None] * (n - first)
+        self._read += n
+        self._consumed.set()
+
+    def read(self) -> list[dict]:
+        """All available records, which are consumed"""
+        records = self.peek()
+        self.consume(len(records))
+        return records
+
+    @staticmethod
+    def _shape(value, chunked: bool) -> tuple:
+        # The chunks of non-scalar values may differ in length along the last axis
+        shape = np.shape(value)
+        return shape[:-1] if chunked and shape else shape
+
+    def _matches(self, record: dict, chunked: bool) -> bool:
+        if record.keys() != self._shapes.keys():
+            return False
+        return all(self._shape(value, chunked) == self._shapes[key] for key, value in record.items())
+
+    def _valid(self, records: list[dict], chunked: bool) -> list[dict]:
+        """The records with the same keys and value shapes as the first record read"""
+        if self._shapes is None and records:
+            self._shapes = {key: self._shape(value, chunked) for key, value in records[0].items()}
+        valid = [record for record in records if self._matches(record, chunked)]
+        if len(valid) != len(records):
+            self.invalid += len(records) - len(valid)
+            logger.warning(
+                f"Discarded {len(records) - len(valid)} records that don't match the keys and shapes {self._shapes}"
+            )
+        return valid
+
+    def read_buffer(self, chunked: bool = False) -> DataBuffer:
+        """All available records as a DataBuffer (see `DataBuffer.from_records`), which are consumed"""
+        return DataBuffer.from_records(self._valid(self.read(), chunked), chunked=chunked)
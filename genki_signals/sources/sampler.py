@@ -1,57 +1,226 @@
+from __future__ import annotations
+
 import threading
 import time
-from queue import Queue
 from typing import Callable
 
-from genki_signals.buffers import DataBuffer
+from genki_signals.instrumentation import Histogram
 from genki_signals.sources.base import SamplerBase
+from genki_signals.sources.ring import RecordRing
+
+
+LATE_POLICIES = ("catch_up", "drop")
+
+
+class SchedulerStats:
+    """
+    Timing statistics of a BusyThread. Jitter is how late each callback started relative to its deadline and an
+    overrun is a callback that took longer than the interval.
+    """
+
+    def __init__(self):
+        self.ticks = 0
+        self.dropped = 0
+        self.overruns = 0
+        self.jitter_ns = Histogram()
+        self.callback_ns = Histogram()
+
+    def as_dict(self) -> dict:
+        return {
+            "ticks": self.ticks,
+            "dropped": self.dropped,
+            "overruns": self.overruns,
+            "jitter_mean_us": self.jitter_ns.mean / 1e3,
+            "jitter_p99_us": self.jitter_ns.percentile(99) / 1e3,
+            "jitter_max_us": self.jitter_ns.max / 1e3,
+            "callback_mean_us": self.callback_ns.mean / 1e3,
+            "callback_max_us": self.callback_ns.max / 1e3,
+        }
 
 
 class BusyThread(threading.Thread):
     """
-    Opens a thread that runs a callback at a given interval.
+    Opens a thread that runs a callback at a given interval (in seconds).
+
+    The callback for tick k is due at start + k * interval on the time.perf_counter_ns clock, so the rate doesn't
+    drift with the time spent in the callback. The thread sleeps until spin_time seconds before each deadline and
+    then spins (yielding the GIL) for the rest, which is accurate to a few microseconds without keeping a core busy.
+    The callback is passed the scheduled time of its tick, i.e. time.time() at start + k * interval.
+
+    When the callback falls behind by more than one interval, late_policy "catch_up" runs the missed ticks back to
+    back, while "drop" skips them and continues with the latest tick that is due.
     """
 
-    def __init__(self, interval: int, callback: Callable, sleep_time: float = 1e-6):
+    def __init__(self, interval: float, callback: Callable, spin_time: float = 1e-4, late_policy: str = "catch_up"):
         super().__init__()
+        if late_policy not in LATE_POLICIES:
+            raise ValueError(f"Unknown late policy {late_policy!r}, expected one of {LATE_POLICIES}")
         self.interval = interval
         self.callback = callback
+        self.spin_time = spin_time
+        self.late_policy = late_policy
+        self.stats = SchedulerStats()
+        # Index of the current tick, counted from 0 at start
+        self.tick = 0
         self._stop_event = threading.Event()
-        self.sleep_time = sleep_time
 
     def run(self):
+        interval_ns = self.interval * 1e9
+        start_ns = time.perf_counter_ns()
+        start_time = time.time()
+        tick = 0
         while not self._stop_event.is_set():
-            start_time = time.time()
-            self.callback(start_time)
-            sleep_end = start_time + self.interval
-            while time.time() < sleep_end:
-                time.sleep(self.sleep_time)
+            deadline = start_ns + round(tick * interval_ns)
+            if not self._wait_until(deadline):
+                break
+            now = time.perf_counter_ns()
+            if self.late_policy == "drop" and now - deadline >= interval_ns:
+                missed = int((now - deadline) // interval_ns)
+                self.stats.dropped += missed
+                tick += missed
+                deadline = start_ns + round(tick * interval_ns)
+            self.stats.ticks += 1
+            self.stats.jitter_ns.record(now - deadline)
+
+            self.tick = tick
+            self.callback(start_time + tick * self.interval)
+            duration = time.perf_counter_ns() - now
+            self.stats.callback_ns.record(duration)
+            if duration > interval_ns:
+                self.stats.overruns += 1
+            tick += 1
+
+    def _wait_until(self, deadline: int) -> bool:
+        """Wait until time.perf_counter_ns() >= deadline, returns False if the thread was stopped meanwhile"""
+        spin_ns = self.spin_time * 1e9
+        remaining = deadline - time.perf_counter_ns()
+        if remaining > spin_ns and self._stop_event.wait((remaining - spin_ns) / 1e9):
+            return False
+        while time.perf_counter_ns() < deadline:
+            time.sleep(0)
+        return not self._stop_event.is_set()
 
     def stop(self):
         self._stop_event.set()
 
 
+class SharedClock:
+    """
+    A single timing thread that drives several samplers (or other callbacks) at rates that divide its base rate.
+
+    A subscriber at rate r is called on every (base_rate / r)-th tick of the clock, counted from the clock's start,
+    so all subscribers are called with identical timestamps on the ticks where they coincide. The thread is started
+    when the first subscriber is added and stopped when the last one is removed.
+    """
+
+    def __init__(self, base_rate: float, spin_time: float = 1e-4, late_policy: str = "catch_up"):
+        if late_policy not in LATE_POLICIES:
+            raise ValueError(f"Unknown late policy {late_policy!r}, expected one of {LATE_POLICIES}")
+        self.base_rate = base_rate
+        self.spin_time = spin_time
+        self.late_policy = late_policy
+        # (divisor, callback) pairs, replaced rather than mutated s.t. the clock thread can call them outside the lock
+        self._subscribers = ()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = False
+
+    def divisor(self, rate: float) -> int:
+        """Number of clock ticks per tick at the given rate"""
+        divisor = round(self.base_rate / rate)
+        if divisor < 1 or abs(divisor * rate - self.base_rate) > 1e-9 * self.base_rate:
+            raise ValueError(f"Rate {rate} does not divide the base rate {self.base_rate} of the clock")
+        return divisor
+
+    def subscribe(self, callback: Callable, rate: float):
+        divisor = self.divisor(rate)
+        with self._lock:
+            self._subscribers = (*self._subscribers, (divisor, callback))
+            if not self._running:
+                self._thread = BusyThread(
+                    1 / self.base_rate, self._tick, spin_time=self.spin_time, late_policy=self.late_policy
+                )
+                self._thread.start()
+                self._running = True
+
+    def unsubscribe(self, callback: Callable):
+        with self._lock:
+            self._subscribers = tuple((d, cb) for d, cb in self._subscribers if cb != callback)
+            if self._subscribers or not self._running:
+                return
+            self._running = False
+            thread = self._thread
+        thread.stop()
+        thread.join()
+
+    @property
+    def stats(self):
+        """Timing statistics of the clock thread since it was last started, see SchedulerStats"""
+        return None if self._thread is None else self._thread.stats
+
+    def _tick(self, t):
+        with self._lock:
+            # A thread that was stopped by unsubscribe may still finish a tick after a new one was started
+            if threading.current_thread() is not self._thread:
+                return
+            tick = self._thread.tick
+            subscribers = self._subscribers
+        for divisor, callback in subscribers:
+            if tick % divisor == 0:
+                callback(t)
+
+    def __repr__(self):
+        return f"SharedClock({self.base_rate=})"
+
+
 class Sampler(SamplerBase):
     """
     A data source that samples data from other sources at a given rate.
+    See BusyThread for the meaning of spin_time and late_policy, and RecordRing for buffer_size (the capacity, by
+    default sized from the size of a record) and overflow.
+
+    By default each sampler runs its own timing thread. Samplers given the same SharedClock are instead driven by its
+    thread and share timestamps on coinciding ticks, in which case spin_time and late_policy are those of the clock.
     """
-    def __init__(self, sources, sample_rate, sleep_time=1e-6, timestamp_key="timestamp"):
+    notifies_on_data = True
+
+    def __init__(
+        self,
+        sources,
+        sample_rate,
+        spin_time=1e-4,
+        late_policy="catch_up",
+        timestamp_key="timestamp",
+        clock: SharedClock | None = None,
+        buffer_size: int | None = None,
+        overflow: str = "drop",
+    ):
         self.sources = sources
         self.is_active = False
-        self.buffer = Queue()
+        self.buffer = RecordRing(buffer_size, overflow=overflow)
+        # Only set when the sampler runs its own thread, with a clock the timestamps count from the clock's start
         self.start_time = None
         self.timestamp_key = timestamp_key
         self._busy_loop = None
         self.sample_rate = sample_rate
-        self.sleep_time = sleep_time
+        self.spin_time = spin_time
+        self.late_policy = late_policy
+        self.clock = clock
+        if clock is not None:
+            clock.divisor(sample_rate)
 
     def start(self):
         for source in self.sources.values():
             if hasattr(source, "start"):
                 source.start()
-        self.start_time = time.time()
-        self._busy_loop = BusyThread(1 / self.sample_rate, self._callback, sleep_time=self.sleep_time)
-        self._busy_loop.start()
+        if self.clock is not None:
+            self.clock.subscribe(self._callback, self.sample_rate)
+        else:
+            self.start_time = time.time()
+            self._busy_loop = BusyThread(
+                1 / self.sample_rate, self._callback, spin_time=self.spin_time, late_policy=self.late_policy
+            )
+            self._busy_loop.start()
         self.is_active = True
 
     def stop(self):
@@ -60,10 +229,20 @@ class Sampler(SamplerBase):
         for source in self.sources.values():
             if hasattr(source, "stop"):
                 source.stop()
-        self._busy_loop.stop()
-        self._busy_loop.join()
+        if self.clock is not None:
+            self.clock.unsubscribe(self._callback)
+        else:
+            self._busy_loop.stop()
+            self._busy_loop.join()
         self.is_active = False
 
+    @property
+    def stats(self):
+        """Timing statistics of the sampling thread, see SchedulerStats"""
+        if self.clock is not None:
+            return self.clock.stats
+        return None if self._busy_loop is None else self._busy_loop.stats
+
     def _callback(self, t):
         data = {self.timestamp_key: t}
         for name, source in self.sources.items():
@@ -74,13 +253,10 @@ class Sampler(SamplerBase):
             else:
                 data[name] = d
         self.buffer.put(data)
+        self._notify()
 
     def read(self):
-        data = DataBuffer()
-        while not self.buffer.empty():
-            d = self.buffer.get()
-            data.append(d)
-        return data
+        return self.buffer.read_buffer()
 
     def __repr__(self):
         return f"Sampler({self.sources}, {self.sample_rate=})"
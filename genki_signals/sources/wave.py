@@ -1,13 +1,12 @@
 import logging
 import sys
 import time
-from queue import Queue
 
 import numpy as np
 from genki_wave.data import DataPackage, RawDataPackage, SpectrogramDataPackage
 
-from genki_signals.buffers import DataBuffer
 from genki_signals.sources.base import SignalSource, SamplerBase
+from genki_signals.sources.ring import RecordRing
 
 logger = logging.getLogger(__name__)
 
@@ -26,17 +25,28 @@ class WaveSource(SignalSource, SamplerBase):
     godot connection.
     """
 
+    notifies_on_data = True
+
     def __call__(self):
         return self.latest_point
 
-    def __init__(self, ble_address=None, godot=False, spectrogram=False, sample_rate=100, followers=None):
+    def __init__(
+        self,
+        ble_address=None,
+        godot=False,
+        spectrogram=False,
+        sample_rate=100,
+        followers=None,
+        buffer_size=None,
+        overflow="drop",
+    ):
         if ble_address is None and not godot:
             raise ValueError("Either ble_address must be provided or godot set to True.")
         self.godot = godot
         self.wave = None
         self._signal_names = None
         self.followers = followers or {}
-        self.buffer = Queue()
+        self.buffer = RecordRing(buffer_size, overflow=overflow)
         self.ble_address = ble_address
         self.latest_point = None
         self.lead = True
@@ -44,11 +54,7 @@ class WaveSource(SignalSource, SamplerBase):
         self.sample_rate = sample_rate
 
     def read(self):
-        data = DataBuffer()
-        while not self.buffer.empty():
-            d = self.buffer.get()
-            data.append(d)
-        return data
+        return self.buffer.read_buffer()
 
     def start(self):
         from genki_wave.threading_runner import WaveListener
@@ -94,6 +100,7 @@ class WaveSource(SignalSource, SamplerBase):
                 self._signal_names = list(data.keys())
 
             self.buffer.put(data)
+            self._notify()
             self.latest_point = data
 
     def is_active(self):
@@ -0,0 +1,106 @@
+"""
+A short time Fourier transform engine for stacks of windows.
+
+The window function and the detrending projection depend only on the window size, so they are computed once and
+cached. Linear (or constant) detrending is the projection onto the orthogonal complement of the polynomials of degree
+1 (or 0), i.e. `x - (x @ Q) @ Q.T` where Q is an orthonormal basis of the polynomials. Q has only one or two columns,
+so detrending a stack of windows is two thin matrix products instead of a least squares fit per window.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+
+import numpy as np
+import scipy
+
+WINDOW_FUNCTIONS = {
+    "hann": scipy.signal.windows.hann,
+}
+
+DETREND_DEGREES = {
+    "linear": 1,
+    "l": 1,
+    "constant": 0,
+    "c": 0,
+    None: None,
+    "none": None,
+}
+
+
+@lru_cache(maxsize=32)
+def get_window(window_type: str, n: int, dtype=np.float64) -> np.ndarray:
+    """The (read-only) window function of length n"""
+    if window_type not in WINDOW_FUNCTIONS:
+        raise ValueError(f"Unknown window type: {window_type}")
+    window = WINDOW_FUNCTIONS[window_type](n).astype(dtype)
+    window.flags.writeable = False
+    return window
+
+
+@lru_cache(maxsize=32)
+def detrend_basis(detrend_type: str | None, n: int, dtype=np.float64) -> np.ndarray | None:
+    """
+    An orthonormal basis of shape (n, degree + 1) for the polynomials removed by detrending windows of length n,
+    or None if there is no detrending
+    """
+    if detrend_type not in DETREND_DEGREES:
+        raise ValueError(f"Unknown detrend type: {detrend_type}")
+    degree = DETREND_DEGREES[detrend_type]
+    if degree is None:
+        return None
+    vandermonde = np.vander(np.arange(n, dtype=np.float64), degree + 1, increasing=True)
+    basis, _ = np.linalg.qr(vandermonde)
+    basis = basis.astype(dtype)
+    basis.flags.writeable = False
+    return basis
+
+
+class STFT:
+    """
+    Computes the detrended, windowed and normalized (divided by window_size) real FFT of every window in a stack.
+    Windows of shape (..., n_windows, window_size) are transformed into an array of shape
+    (..., window_size // 2 + 1, n_windows), i.e. with time along the last axis. Leading dimensions (e.g. channels) are
+    transformed independently.
+
+    With dtype=np.complex64 the computation is done in single precision, which halves the memory used.
+    """
+
+    def __init__(
+        self,
+        window_size: int,
+        window_type: str = "hann",
+        detrend_type: str | None = "linear",
+        dtype=np.complex128,
+        workers: int | None = None,
+    ):
+        self.window_size = window_size
+        self.n_buckets = window_size // 2 + 1
+        self.dtype = np.dtype(dtype)
+        if self.dtype.kind != "c":
+            raise ValueError(f"STFT output dtype must be complex, got {self.dtype}")
+        self.real_dtype = np.finfo(self.dtype).dtype
+        self.workers = workers
+
+        # The normalization is folded into the window
+        self.window = get_window(window_type, window_size, self.real_dtype) / window_size
+        self.basis = detrend_basis(detrend_type, window_size, self.real_dtype)
+        # Detrending and windowing combined: (x - (x @ Q) @ Q.T) * w = x * w - (x @ Q) @ (Q.T * w)
+        self.windowed_basis = None if self.basis is None else self.basis.T * self.window
+
+    def __call__(self, windows: np.ndarray) -> np.ndarray:
+        windows = np.asarray(windows, dtype=self.real_dtype)
+        if windows.shape[-1] != self.window_size:
+            raise ValueError(f"Expected windows of size {self.window_size}, got {windows.shape[-1]}")
+        windowed = windows * self.window
+        if self.basis is not None:
+            windowed -= (windows @ self.basis) @ self.windowed_basis
+        spectrum = scipy.fft.rfft(windowed, axis=-1, workers=self.workers)
+        return np.swapaxes(spectrum.astype(self.dtype, copy=False), -1, -2)
+
+    def spectrogram(self, signal: np.ndarray, hop: int | None = None) -> np.ndarray:
+        """The STFT of all complete windows of a signal, spaced hop samples apart (defaults to window_size)"""
+        hop = self.window_size if hop is None else hop
+        if signal.shape[-1] < self.window_size:
+            return np.empty((*signal.shape[:-1], self.n_buckets, 0), dtype=self.dtype)
+        windows = np.lib.stride_tricks.sliding_window_view(signal, self.window_size, axis=-1)[..., ::hop, :]
+        return self(windows)
@@ -1,12 +1,16 @@
+import inspect
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from threading import Thread
 
-from genki_signals.recorders import PickleRecorder, WavFileRecorder
+from genki_signals.instrumentation import Instrumentation
+from genki_signals.recorders import AsyncRecorder, ColumnarRecorder, WavFileRecorder
 from genki_signals.session import Session
-from genki_signals.functions.base import compute_signal_functions
+from genki_signals.functions.pipeline import Pipeline
 from genki_signals.sources import MicSource
+from genki_signals.sources.base import DataNotifier, SamplerBase
 
 logger = logging.getLogger(__name__)
 
@@ -18,14 +22,63 @@ class System:
     The system update_rate is the rate at which the system will check for new data points,
     specified in Hz. Note that the update_rate will not be exact, as it is limited by the
     use of time.sleep(), so an error of up to 15% is expected.
+
+    If outputs is given, only the functions needed to compute those signals (and the signals requested by the
+    data feeds) are computed. Data feeds can request the signals they need with the keys argument to
+    register_data_feed, if every feed does, functions that nobody uses are skipped. Functions that carry state between
+    chunks are always computed, s.t. they are up to date when a feed that needs them is registered later.
+
+    The functions are checked (for missing inputs, cyclic dependencies etc.) when the system is created, when it is
+    started and when functions or feeds are added, and a ValueError is raised there instead of in the thread that
+    computes them.
+
+    If max_workers is given, functions that don't depend on each other are computed concurrently with up to
+    max_workers threads. The thread pool is owned by the system and shared by the pipelines it builds when data feeds
+    or signals are added, so the pipeline can be rebuilt while the system is running.
+
+    If event_driven is True and the source is a sampler, the system waits for the source to signal that data has
+    arrived instead of polling at update_rate. It wakes up once min_batch_size data points are queued, or max_wait
+    seconds after the first of them arrived (defaults to 1 / update_rate). Sources that can't signal arrival are
+    polled as before.
+
+    If instrumentation is True (or an Instrumentation), the time spent in each function and each tick, and the latency
+    from data arriving at the source to it being passed to the data feeds are recorded, see Instrumentation.snapshot().
+    The latency is measured in both polling and event-driven mode, but only for samplers that signal arrival (see
+    SamplerBase.notifies_on_data), e.g. not for sources that read recorded data.
     """
 
-    def __init__(self, source, functions=None, update_rate=25):
+    def __init__(
+        self,
+        source,
+        functions=None,
+        update_rate=25,
+        outputs=None,
+        max_workers=None,
+        event_driven=False,
+        min_batch_size=1,
+        max_wait=None,
+        instrumentation=None,
+    ):
         self.source = source
         self.functions = [] if functions is None else functions
         self.update_rate = update_rate
+        self.outputs = outputs
+        self.max_workers = max_workers
+        self.event_driven = event_driven
+        self.min_batch_size = min_batch_size
+        self.max_wait = 1 / update_rate if max_wait is None else max_wait
+        self.notifier = None
+        # Whether the main thread waits on the notifier, otherwise it is only used to time the arrival of data
+        self._wait_for_data = False
+        self.instrumentation = Instrumentation() if instrumentation is True else instrumentation or None
         self.is_active = False
         self.data_feeds = {}
+        self.data_feed_keys = {}
+        self.pipeline = None
+        self._executor = None
+        # The signals of the source, once it has been started and if it can tell before any data arrives
+        self._input_keys = None
+        self._update_pipeline()
         self.main_thread = None
         self.recorder = None
         self.is_recording = False
@@ -35,32 +88,110 @@ class System:
 
     def _busy_loop(self):
         while self.is_active:
+            first_arrival = None
+            if self.notifier is not None:
+                if self._wait_for_data:
+                    self.notifier.wait(self.min_batch_size, self.max_wait)
+                _, first_arrival = self.notifier.reset()
+            start = time.perf_counter_ns()
             new_data = self._read()
             if len(new_data) > 0:
-                for feed in self.data_feeds.values():
+                for feed in list(self.data_feeds.values()):
                     feed(new_data)
-            time.sleep(1 / self.update_rate)
-
-    def register_data_feed(self, feed_id, callback):
+                if self.instrumentation is not None:
+                    end = time.perf_counter_ns()
+                    latency = None if first_arrival is None else end - int(first_arrival * 1e9)
+                    self.instrumentation.record_tick(end - start, latency)
+            if not self._wait_for_data:
+                time.sleep(1 / self.update_rate)
+
+    def register_data_feed(self, feed_id, callback, keys=None):
+        """Register a callback for new data, keys are the signals the callback needs (None means all)"""
+        self.data_feed_keys[feed_id] = None if keys is None else list(keys)
+        try:
+            self._update_pipeline()
+        except ValueError:
+            del self.data_feed_keys[feed_id]
+            raise
         self.data_feeds[feed_id] = callback
 
     def deregister_data_feed(self, feed_id):
         self.data_feeds.pop(feed_id)
+        self.data_feed_keys.pop(feed_id, None)
+        self._update_pipeline()
+
+    def _requested_outputs(self):
+        if self.outputs is None and not self.data_feed_keys:
+            return None
+        if any(keys is None for keys in self.data_feed_keys.values()):
+            return None
+        outputs = list(self.outputs or [])
+        for keys in self.data_feed_keys.values():
+            outputs.extend(k for k in keys if k not in outputs)
+        return outputs
+
+    def _update_pipeline(self):
+        if self.max_workers is not None and self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="signal_functions")
+        pipeline = Pipeline(
+            self.functions,
+            self._requested_outputs(),
+            self.max_workers,
+            self.instrumentation,
+            executor=self._executor,
+            prune_stateful=False,
+        )
+        pipeline.validate(self._input_keys)
+        # The main thread may still be running the old pipeline, so it is swapped out rather than closed. The pipelines
+        # share the system's thread pool, which is only shut down when the system stops.
+        self.pipeline = pipeline
+
+    def _source_signal_names(self):
+        """The signals of the (started) source, or None if it can't tell without waiting for data"""
+        names = inspect.getattr_static(self.source, "signal_names", None)
+        # Properties (e.g. of WaveSource) wait for the first data to arrive
+        if names is None or isinstance(names, property):
+            return None
+        return self.source.signal_names() if callable(names) else names
 
     def start(self):
+        notifies = isinstance(self.source, SamplerBase) and self.source.notifies_on_data
+        if notifies and (self.event_driven or self.instrumentation is not None):
+            self.notifier = DataNotifier()
+            self.source.notifier = self.notifier
+            self._wait_for_data = self.event_driven
         self.source.start()
+        self._input_keys = self._source_signal_names()
+        try:
+            # Also recreates the thread pool if it was shut down when the system was last stopped
+            self._update_pipeline()
+        except ValueError:
+            self._input_keys = None
+            self.source.stop()
+            raise
         self.is_active = True
         self.main_thread = Thread(target=self._busy_loop)
         self.main_thread.start()
 
     def stop(self):
         self.is_active = False
+        if self.notifier is not None:
+            self.notifier.wake()
         self.main_thread.join()
         # We need to call stop_recording here, after the main thread has stopped,
         # otherwise we might send data to the feeds that will not be recorded.
         if self.is_recording:
             self.stop_recording()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
         self.source.stop()
+        if self.notifier is not None:
+            self.source.notifier = None
+            self.notifier = None
+            self._wait_for_data = False
+        # Whether the main thread waits on the notifier, otherwise it is only used to time the arrival of data
+        self._wait_for_data = False
 
     def __enter__(self):
         self.start()
@@ -80,7 +211,10 @@ class System:
                     self.source.sample_width
                 )
             else:
-                recorder = PickleRecorder(path / "raw_data.pickle")
+                recorder = ColumnarRecorder(path / "raw_data.columns")
+        if not isinstance(recorder, AsyncRecorder):
+            # Keep disk I/O off the thread that reads from the source
+            recorder = AsyncRecorder(recorder)
         self.recorder = recorder
         self.is_recording = True
 
@@ -97,8 +231,13 @@ class System:
         if self.is_recording:
             self.recorder.write(data)
         if len(data) > 0:
-            data = compute_signal_functions(data, self.functions)
+            data = self.pipeline(data)
         return data
 
     def add_derived_signal(self, signal):
         self.functions.append(signal)
+        try:
+            self._update_pipeline()
+        except ValueError:
+            self.functions.pop()
+            raise
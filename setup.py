@@ -38,6 +38,10 @@ setuptools.setup(
         "bleak",
         "genki_wave",
     ],
+    extras_require={
+        # Compiles the per sample loops of the sensor fusion filters
+        "fusion": ["numba"],
+    },
     author="Genki Instruments",
     author_email="genki@genkiinstruments.com",
     keywords = ["Signal Processing", "Machine Learning", "Realtime"],
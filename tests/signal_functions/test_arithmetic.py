@@ -1,6 +1,6 @@
 import pytest
 import numpy as np
-from genki_signals.functions.arithmetic import Sum, Difference, Scale
+from genki_signals.functions.arithmetic import Sum, Difference, Scale, MovingAverage
 
 
 @pytest.mark.parametrize(
@@ -81,3 +81,25 @@ def test_difference_shape_mismatch(input_a, input_b):
     func = Difference("input_a", "input_b", name="output_data")
     with pytest.raises(Exception):
         func(*(input_a, input_b))
+
+
+@pytest.mark.parametrize(
+    "length, shape, chunk_sizes",
+    [
+        (5, (), [1] * 12),
+        (4, (), [3, 10, 1, 2]),
+        (1, (2,), [4, 4]),
+        (25, (3, 2), [7, 30, 1, 60]),
+        (1000, (), [1] * 2500 + [0, 700]),
+    ],
+)
+def test_moving_average(length, shape, chunk_sizes):
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=shape + (sum(chunk_sizes),))
+    expected = np.stack(
+        [x[..., max(i + 1 - length, 0) : i + 1].mean(axis=-1) for i in range(x.shape[-1])], axis=-1
+    )
+    func = MovingAverage("input_data", name="output_data", length=length)
+    bounds = np.cumsum([0] + chunk_sizes)
+    result = np.concatenate([func(x[..., a:b]) for a, b in zip(bounds[:-1], bounds[1:])], axis=-1)
+    np.testing.assert_allclose(result, expected, rtol=1e-12, atol=1e-12)
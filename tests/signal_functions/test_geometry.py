@@ -1,7 +1,17 @@
 import pytest
 import numpy as np
 
-from genki_signals.functions.geometry import Norm
+from genki_signals.buffers import DataBuffer
+from genki_signals.functions.geometry import (
+    FusionOrientation,
+    Gravity,
+    GravityProjection,
+    MadgwickOrientation,
+    Norm,
+    OrientationXy,
+    ZeroCrossing,
+)
+from genki_signals.functions.pipeline import Pipeline
 
 
 @pytest.mark.parametrize(
@@ -22,4 +32,61 @@ def test_norm(input_data, order, expected):
     np.testing.assert_almost_equal(result, expected)
 
 
+def test_gravity_projection():
+    rng = np.random.default_rng(0)
+    g = rng.normal(size=(3, 100))
+    g[:, :4] = [[0, 0, 1, 0], [0, 1, 0, 0], [1, 0, 0, 0]]  # Including g_z = 0 and g = 0
+    g[:, 4] = [0, 0, -9.81]
+    x = rng.normal(size=(3, 100))
+    func = GravityProjection("x", "g", name="x_proj")
+
+    basis = func.basis(g)
+    identity = np.broadcast_to(np.eye(2)[..., None], (2, 2, 100))
+    np.testing.assert_allclose(np.einsum("kit,lit->klt", basis, basis), identity, atol=1e-12)
+    np.testing.assert_allclose(np.einsum("kit,it->kt", basis, g), 0, atol=1e-12)
+
+    result = func(x, g)
+    assert result.shape == (2, 100)
+    # The projection preserves the length of the component of x orthogonal to gravity
+    g_unit = g[:, 5:] / np.linalg.norm(g[:, 5:], axis=0)
+    x_orth = x[:, 5:] - np.sum(x[:, 5:] * g_unit, axis=0) * g_unit
+    np.testing.assert_allclose(np.linalg.norm(result[:, 5:], axis=0), np.linalg.norm(x_orth, axis=0))
+
+    flat = func(np.array([[1.0, 0.0], [0.0, 2.0], [5.0, 5.0]]), np.array([[0.0, 0.0], [0.0, 0.0], [1.0, 1.0]]))
+    np.testing.assert_allclose(flat, [[0.0, 2.0], [1.0, 0.0]])
+
+
+def test_orientation_xy():
+    half_angles = np.deg2rad(np.array([0.0, 30.0, -60.0])) / 2
+    qs = np.stack([np.cos(half_angles), np.zeros(3), np.zeros(3), np.sin(half_angles)])  # Rotations about z
+    result = OrientationXy("q", name="orientation_xy")(qs)
+    assert result.shape == (4, 3)
+    np.testing.assert_allclose(result[0], [0.0, -30.0, 60.0])
+
+
+def test_zero_crossing():
+    x = np.array([[1.0, -1.0, -2.0, 3.0, 0.0, -1.0], [-1.0, -1.0, 2.0, 2.0, -3.0, 4.0]])
+    expected = np.array([[0, 1, 0, 1, 0, 1], [0, 0, 1, 0, 1, 1]])
+    func = ZeroCrossing("x", name="zc")
+    # The sign of the last sample is carried over to the next chunk
+    result = np.concatenate([func(x[:, :2]), func(x[:, 2:2]), func(x[:, 2:])], axis=-1)
+    assert result.dtype == np.int8
+    np.testing.assert_array_equal(result, expected)
+
+    rate = ZeroCrossing("x", name="zcr", rate_window=2)
+    result = np.concatenate([rate(x[:, :3]), rate(x[:, 3:])], axis=-1)
+    np.testing.assert_allclose(result, [[0, 0.5, 0.5, 0.5, 0.5, 0.5], [0, 0, 0.5, 0.5, 0.5, 1]])
+
 
+@pytest.mark.parametrize("orientation", [FusionOrientation, MadgwickOrientation])
+def test_orientation_into_gravity(orientation):
+    # A device lying still, tilted s.t. gravity is along (0, 0.6, 0.8) in its frame
+    n = 3000
+    acc = np.array([[0.0], [0.6], [0.8]]) * np.ones(n)
+    # Madgwick skips samples without any rotation, so the gyro isn't exactly zero
+    data = DataBuffer(data={"gyro": np.full((3, n), 1e-3), "acc": acc})
+    pipeline = Pipeline([orientation("gyro", "acc", 100, name="q"), Gravity("q", name="gravity")])
+    result = pipeline(data)
+    assert result["q"].shape == (4, n)
+    assert result["gravity"].shape == (3, n)
+    np.testing.assert_allclose(result["gravity"][:, -1], [0.0, 0.6, 0.8], atol=1e-2)
@@ -0,0 +1,86 @@
+import json
+from pathlib import Path
+
+import pytest
+import numpy as np
+from onnxruntime import InferenceSession
+
+from genki_signals.functions.inference import Inference, WindowedInference
+from genki_signals.functions.serialization import decode_signal_fn, encode_signal_fn
+
+SWIPE_MODEL = Path(__file__).parents[2] / "genki_signals" / "models" / "swipe_model" / "model.onnx"
+IS_TOUCHING_MODEL = Path(__file__).parents[2] / "genki_signals" / "models" / "is_touching_model" / "model.onnx"
+
+
+@pytest.fixture
+def dynamic_batch_model(tmp_path):
+    onnx = pytest.importorskip("onnx")
+    model = onnx.load(SWIPE_MODEL.as_posix())
+    for value in [*model.graph.input, *model.graph.output]:
+        value.type.tensor_type.shape.dim[0].dim_param = "batch"
+    path = tmp_path / "model.onnx"
+    onnx.save(model, path.as_posix())
+    return path
+
+
+@pytest.mark.parametrize("dynamic_batch", [False, True])
+def test_windowed_inference_matches_per_window(dynamic_batch, request):
+    model = request.getfixturevalue("dynamic_batch_model") if dynamic_batch else SWIPE_MODEL
+    x = np.random.default_rng(0).normal(size=(6, 128 * 5 + 40))
+    func = WindowedInference("x", "swipe", model.as_posix(), window_size=128, output_shape=(3,), max_batch_size=2)
+    assert func.fixed_batch_size == (None if dynamic_batch else 1)
+    result = np.concatenate([func(x[:, :300]), func(x[:, 300:])], axis=-1)
+
+    session = InferenceSession(SWIPE_MODEL.as_posix())
+    expected = []
+    for i in range(5):
+        window = x[:, i * 128 : (i + 1) * 128].T[np.newaxis, ...].astype(np.float32)
+        expected.append(session.run(["output"], {"input": window})[0][0])
+    np.testing.assert_allclose(result, np.concatenate(expected, axis=-1), rtol=1e-5, atol=1e-6)
+
+
+def test_stateful_inference_runs_every_sample():
+    x = np.random.default_rng(0).normal(size=(6, 16, 20))
+
+    session = InferenceSession(IS_TOUCHING_MODEL.as_posix())
+    state = np.zeros((1, 512), dtype=np.float32)
+    expected = []
+    for i in range(x.shape[-1]):
+        output, state = session.run(
+            ["output", "output_state"], {"input": x[np.newaxis, ..., i].astype(np.float32), "input_state": state}
+        )
+        expected.append(output[0])
+    expected = np.stack(expected, axis=-1)
+
+    live = Inference("x", "touching", IS_TOUCHING_MODEL.as_posix(), stateful=True)
+    live_output = np.concatenate([live(x[..., :1]), live(x[..., 1:7]), live(x[..., 7:])], axis=-1)
+    replay = Inference("x", "touching", IS_TOUCHING_MODEL.as_posix(), stateful=True)
+    replay_output = replay(x)
+
+    assert replay_output.shape == (4, 20)
+    np.testing.assert_allclose(replay_output, expected, rtol=1e-5, atol=1e-6)
+    np.testing.assert_array_equal(live_output, replay_output)
+    np.testing.assert_array_equal(live.state, state)
+
+
+def test_sessions_are_shared():
+    a = WindowedInference("x", "a", SWIPE_MODEL.as_posix(), window_size=128, output_shape=(3,))
+    b = WindowedInference("x", "b", SWIPE_MODEL.as_posix(), window_size=128, output_shape=(3,))
+    options = {"intra_op_num_threads": 1}
+    c = WindowedInference("x", "c", SWIPE_MODEL.as_posix(), window_size=128, output_shape=(3,), session_options=options)
+    assert a.session is b.session
+    assert a.session is not c.session
+    assert c.params["session_options"] == {"intra_op_num_threads": 1}
+
+
+def test_inference_serialization_round_trip():
+    options = {"intra_op_num_threads": 1, "graph_optimization_level": "all"}
+    functions = [
+        Inference("x", "touching", IS_TOUCHING_MODEL, stateful=True, session_options=options),
+        WindowedInference("x", "swipe", SWIPE_MODEL, window_size=128, output_shape=(3,), session_options=options),
+    ]
+    decoded = json.loads(json.dumps(functions, default=encode_signal_fn), object_hook=decode_signal_fn)
+    for fn, fn_decoded in zip(functions, decoded):
+        assert type(fn_decoded) is type(fn)
+        assert fn_decoded.session is fn.session
+        assert json.dumps(fn_decoded.params) == json.dumps(fn.params)
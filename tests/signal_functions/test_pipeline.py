@@ -0,0 +1,113 @@
+import pytest
+import numpy as np
+
+from genki_signals.buffers import DataBuffer
+from genki_signals.functions.arithmetic import MovingAverage, Scale, Sum
+from genki_signals.functions.base import compute_signal_functions
+from genki_signals.functions.pipeline import Pipeline
+
+
+@pytest.fixture
+def data():
+    return DataBuffer(data={"a": np.arange(5.0), "acc": np.arange(15.0).reshape(3, 5)})
+
+
+def test_pipeline_matches_sequential(data):
+    functions = [
+        Scale("a", "b", 2.0),
+        Sum("b", "acc_1", name="c"),
+        Scale("c", "d", -1.0),
+    ]
+    expected = dict(data.items())
+    for fn in functions:
+        expected[fn.name] = fn(*(data[name] if name in data else expected[name] for name in fn.input_signals))
+    result = compute_signal_functions(data, functions)
+    assert set(result.keys()) == set(expected.keys())
+    for key in expected:
+        np.testing.assert_array_equal(result[key], expected[key])
+
+
+def test_pipeline_orders_by_dependencies(data):
+    functions = [Scale("b", "c", 3.0), Scale("a", "b", 2.0)]
+    result = Pipeline(functions)(data)
+    np.testing.assert_array_equal(result["c"], 6 * data["a"])
+
+
+def test_pipeline_prunes_and_releases(data):
+    calls = []
+
+    class Counted(Scale):
+        def __call__(self, x):
+            calls.append(self.name)
+            return super().__call__(x)
+
+    functions = [Counted("a", "b", 2.0), Counted("b", "c", 2.0), Counted("a", "unused", 2.0)]
+    pipeline = Pipeline(functions, outputs=["c"])
+    result = pipeline(data)
+    assert calls == ["b", "c"]
+    assert "b" not in result and "unused" not in result
+    np.testing.assert_array_equal(result["c"], 4 * data["a"])
+    pipeline(data)
+    assert len(pipeline._plans) == 1
+
+
+def test_pipeline_missing_input(data):
+    with pytest.raises(ValueError, match="missing"):
+        Pipeline([Scale("missing", "b", 1.0)]).compile(data.keys())
+    # Functions that are pruned don't need their inputs
+    Pipeline([Scale("missing", "b", 1.0), Scale("a", "c", 1.0)], outputs=["c"]).compile(data.keys())
+
+
+def test_pipeline_cycle(data):
+    functions = [Scale("c", "b", 1.0), Scale("b", "c", 1.0)]
+    with pytest.raises(ValueError, match="cyclic"):
+        Pipeline(functions).compile(data.keys())
+
+
+def test_pipeline_shadowed_input(data):
+    functions = [Scale("a", "b", 1.0), Scale("a", "a", 10.0), Scale("a", "c", 1.0)]
+    result = Pipeline(functions)(data)
+    np.testing.assert_array_equal(result["b"], data["a"])
+    np.testing.assert_array_equal(result["c"], 10 * data["a"])
+
+
+def test_parallel_pipeline_matches_sequential(data):
+    functions = [
+        Scale("a", "b", 2.0),
+        Scale("acc_0", "c", 3.0),
+        Sum("b", "c", name="d"),
+        Scale("d", "e", -1.0),
+        Scale("acc", "f", 0.5),
+    ]
+    expected = Pipeline(functions, outputs=["e", "f"])(data)
+    pipeline = Pipeline(functions, outputs=["e", "f"], max_workers=4)
+    for _ in range(3):
+        result = pipeline(data)
+        assert set(result.keys()) == set(expected.keys())
+        for key in expected:
+            np.testing.assert_array_equal(result[key], expected[key])
+    pipeline.close()
+
+    path, total = pipeline.critical_path()
+    assert path[-2:] == ["d", "e"] and path[0] in ("b", "c")
+    assert total == pytest.approx(sum(pipeline.timings[name] for name in path))
+
+
+def test_pipeline_validate_without_inputs():
+    Pipeline([Scale("a", "b", 2.0), Scale("acc_0", "c", 1.0)], outputs=["c", "a"]).validate()
+    with pytest.raises(ValueError, match="cyclic"):
+        Pipeline([Scale("c", "b", 2.0), Scale("b", "c", 1.0)]).validate()
+    with pytest.raises(ValueError, match="Missing"):
+        Pipeline([Scale("a", "b", 2.0)]).validate(["x"])
+
+
+def test_pipeline_history_and_used_inputs(data):
+    functions = [
+        MovingAverage("acc_1", "smooth", length=5),
+        MovingAverage("smooth", "smoother", length=3),
+        MovingAverage("a", "other", length=50),
+    ]
+    pipeline = Pipeline(functions, outputs=["smoother", "a"])
+    assert pipeline.history(data.keys()) == (4 + 2 + 0, 1)
+    assert pipeline.compile(data.keys()).used_inputs == {"acc", "a"}
+    assert Pipeline(functions).history() == (49, 1)
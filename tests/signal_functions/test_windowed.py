@@ -0,0 +1,57 @@
+import pytest
+import numpy as np
+import scipy
+
+from genki_signals.functions.windowed import FourierTransform, WindowedSignalFunction
+
+
+class PerWindowFourierTransform(FourierTransform):
+    windowed_fn_batch = WindowedSignalFunction.windowed_fn_batch
+
+
+def _run(func, x, chunk_sizes):
+    bounds = np.cumsum([0] + chunk_sizes)
+    return [func(x[..., a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+@pytest.mark.parametrize("window_overlap", [0, 24])
+@pytest.mark.parametrize("upsample", [False, True])
+@pytest.mark.parametrize("chunk_sizes", [[1] * 200, [100, 3, 97, 200], [500]])
+def test_batched_fourier_transform_matches_per_window(window_overlap, upsample, chunk_sizes):
+    x = np.random.default_rng(0).normal(size=sum(chunk_sizes))
+    kwargs = dict(window_size=32, window_overlap=window_overlap, upsample=upsample)
+    batched = _run(FourierTransform("x", "fft", **kwargs), x, chunk_sizes)
+    expected = _run(PerWindowFourierTransform("x", "fft", **kwargs), x, chunk_sizes)
+    for result, exp in zip(batched, expected):
+        np.testing.assert_allclose(result, exp, atol=1e-12)
+    if upsample:
+        assert [r.shape[-1] for r in batched] == chunk_sizes
+    else:
+        assert sum(r.shape[-1] for r in batched) == (len(x) - 32) // (32 - window_overlap) + 1
+
+
+def _reference_fft(x, window_size, hop):
+    n_windows = (x.shape[-1] - window_size) // hop + 1
+    out = []
+    for i in range(n_windows):
+        window = scipy.signal.detrend(x[..., i * hop : i * hop + window_size], axis=-1, type="linear")
+        window = window * scipy.signal.windows.hann(window_size)
+        out.append(np.fft.rfft(window, axis=-1) / window_size)
+    return np.stack(out, axis=-1)
+
+
+@pytest.mark.parametrize("shape", [(), (2,), (3, 2)])
+def test_fourier_transform_multichannel(shape):
+    x = np.random.default_rng(1).normal(size=shape + (300,))
+    func = FourierTransform("x", "fft", window_size=64, window_overlap=16)
+    result = np.concatenate(_run(func, x, [50, 150, 100]), axis=-1)
+    np.testing.assert_allclose(result, _reference_fft(x, 64, 48), atol=1e-12)
+
+
+def test_fourier_transform_complex64():
+    x = np.random.default_rng(2).normal(size=(2, 512))
+    func = FourierTransform("x", "fft", window_size=128, dtype="complex64", upsample=True)
+    result = np.concatenate(_run(func, x, [100, 412]), axis=-1)
+    assert result.dtype == np.complex64
+    assert result.shape == (2, 65, 512)
+    np.testing.assert_allclose(result[..., 127::128], _reference_fft(x, 128, 128), atol=1e-6)
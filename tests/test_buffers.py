@@ -0,0 +1,139 @@
+import pytest
+import numpy as np
+
+from genki_signals.buffers import DataBuffer, NumpyBuffer, RingArray
+
+
+@pytest.mark.parametrize(
+    "maxlen, chunk_sizes",
+    [
+        (5, [1] * 20),
+        (5, [3, 4, 2, 7, 1]),
+        (8, [8, 8, 3]),
+        (4, [10, 1, 2]),
+    ],
+)
+def test_ring_matches_concat(maxlen, chunk_sizes):
+    concat = NumpyBuffer(maxlen)
+    ring = NumpyBuffer(maxlen, storage="ring")
+    start = 0
+    for n in chunk_sizes:
+        chunk = np.arange(2 * start, 2 * (start + n)).reshape(2, n)
+        start += n
+        concat.extend(chunk)
+        ring.extend(chunk)
+        assert len(ring) == len(concat)
+        np.testing.assert_array_equal(ring.view(), concat.view())
+        np.testing.assert_array_equal(ring.view(3), concat.view(3))
+
+
+def test_ring_popleft():
+    ring = NumpyBuffer(4, storage="ring")
+    ring.extend(np.arange(6.0))
+    popped = ring.popleft(3)
+    ring.extend(np.array([6.0, 7.0]))
+    np.testing.assert_array_equal(popped, [2.0, 3.0, 4.0])
+    np.testing.assert_array_equal(ring.view(), [5.0, 6.0, 7.0])
+    np.testing.assert_array_equal(ring.popleft_all(), [5.0, 6.0, 7.0])
+    with pytest.raises(IndexError):
+        ring.popleft(1)
+
+
+def test_ring_upcasts_dtype():
+    ring = RingArray(3)
+    ring.extend(np.array([1, 2]))
+    ring.extend(np.array([2.5]))
+    assert ring.view().dtype == np.float64
+    np.testing.assert_array_equal(ring.view(), [1.0, 2.0, 2.5])
+
+
+def test_ring_requires_maxlen():
+    with pytest.raises(ValueError):
+        DataBuffer(storage="ring")
+
+
+def test_data_buffer_ring():
+    concat = DataBuffer(maxlen=3)
+    ring = DataBuffer(maxlen=3, storage="ring")
+    for i in range(5):
+        pt = {"timestamp": float(i), "acc": np.array([i, -i, 2 * i])}
+        concat.append(pt)
+        ring.append(pt)
+    assert len(ring) == 3
+    assert set(ring.keys()) == set(concat.keys())
+    for key in ["timestamp", "acc", "acc_1"]:
+        np.testing.assert_array_equal(ring[key], concat[key])
+    copied = ring.copy()
+    ring.extend({"timestamp": np.array([5.0])})
+    np.testing.assert_array_equal(copied["timestamp"], [2.0, 3.0, 4.0])
+
+
+@pytest.mark.parametrize("storage", ["growable", "chunked"])
+def test_unbounded_storage_matches_concat(storage):
+    concat = DataBuffer()
+    buffer = DataBuffer(storage=storage)
+    for i in range(300):
+        chunk = {"timestamp": np.arange(i, i + 3), "acc": np.full((3, 3), i)}
+        concat.extend(chunk)
+        buffer.extend(chunk)
+    np.testing.assert_array_equal(buffer.popleft(10)["acc"], concat.popleft(10)["acc"])
+    frozen = buffer.freeze()
+    assert frozen.storage == "concat"
+    for key in concat:
+        np.testing.assert_array_equal(frozen[key], concat[key])
+    buffer.extend({"timestamp": np.array([-1]), "acc": np.zeros((3, 1))})
+    np.testing.assert_array_equal(frozen["timestamp"], concat["timestamp"])
+
+
+def test_growable_capacity_doubles():
+    buffer = NumpyBuffer(None, storage="growable")
+    for _ in range(1000):
+        buffer.extend(np.ones((2, 1)))
+    assert len(buffer) == 1000
+    assert buffer._store.capacity == 1024
+    buffer._store.shrink_to_fit()
+    assert buffer._store.capacity == 1000
+
+
+def test_unbounded_storage_requires_no_maxlen():
+    with pytest.raises(ValueError):
+        DataBuffer(maxlen=10, storage="growable")
+
+
+@pytest.mark.parametrize("maxlen", [None, 3])
+def test_data_buffer_from_records(maxlen):
+    records = [{"timestamp": 0.1 * i, "acc": np.arange(3.0) + i, "button": i % 2 == 0} for i in range(5)]
+    appended = DataBuffer(maxlen=maxlen)
+    for record in records:
+        appended.append(record)
+    stacked = DataBuffer.from_records(records, maxlen=maxlen)
+    assert stacked.keys() == appended.keys()
+    for key in appended:
+        np.testing.assert_array_equal(stacked[key], appended[key])
+        assert stacked[key].dtype == appended[key].dtype
+    assert len(DataBuffer.from_records([])) == 0
+
+
+def test_data_buffer_from_chunked_records():
+    records = [{"timestamp": np.array([i]), "audio": np.arange(4) + 4 * i, "level": 0.5} for i in range(3)]
+    data = DataBuffer.from_records(records, chunked=True)
+    np.testing.assert_array_equal(data["audio"], np.arange(12))
+    np.testing.assert_array_equal(data["timestamp"], [0, 1, 2])
+    np.testing.assert_array_equal(data["level"], [0.5] * 3)
+
+
+def test_growable_extend_after_shrinking_empty():
+    buffer = NumpyBuffer(None, storage="growable")
+    buffer.extend(np.ones((2, 3)))
+    buffer.popleft(3)
+    buffer._store.shrink_to_fit()
+    assert buffer._store.capacity == 0
+    buffer.extend(np.arange(8.0).reshape(2, 4))
+    np.testing.assert_array_equal(buffer.view(), np.arange(8.0).reshape(2, 4))
+
+    data = DataBuffer(storage="growable")
+    data.extend({"x": np.arange(3)})
+    data.popleft_all()
+    data.freeze()
+    data.extend({"x": np.arange(5)})
+    np.testing.assert_array_equal(data["x"], np.arange(5))
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from genki_signals.buffers import DataBuffer
+from genki_signals.recorders import ChunkedFileRecorder, ColumnarRecorder
+from genki_signals.sources.dataframe import DataFrameSource, FileSource
+
+
+@pytest.fixture
+def data():
+    n = 1000
+    return DataBuffer(data={"timestamp": np.arange(n) / 100, "acc": np.arange(3 * n, dtype=float).reshape(3, n)})
+
+
+def write_file(data, path):
+    df = pd.DataFrame({"timestamp": data["timestamp"], **{f"acc_{i}": data["acc"][i] for i in range(3)}})
+    if path.suffix == ".csv":
+        df.to_csv(path, index=False)
+    elif path.suffix == ".parquet":
+        df.to_parquet(path, row_group_size=128)
+    elif path.suffix == ".pkl":
+        df.to_pickle(path)
+    else:
+        if path.suffix == ".chunks":
+            recorder = ChunkedFileRecorder(path, rec_buffer_size=100)
+        else:
+            recorder = ColumnarRecorder(path)
+        for start in range(0, len(data), 90):
+            recorder.write(DataBuffer(data={k: v[..., start : start + 90] for k, v in data.items()}))
+        recorder.stop()
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet", ".pkl", ".columns", ".chunks"])
+def test_file_source_streams_chunks(tmp_path, data, suffix):
+    path = tmp_path / f"raw_data{suffix}"
+    write_file(data, path)
+    source = FileSource(path, lines_per_read=70, line_offset=150, chunk_size=64)
+    source.start()
+    assert "timestamp" in source.signal_names()
+    reads = [source.read() for _ in range(13)]
+    source.stop()
+
+    assert [len(r) for r in reads] == [70] * 12 + [10]
+    assert len(source._pending) == 0
+    timestamps = np.concatenate([r["timestamp"] for r in reads])
+    np.testing.assert_allclose(timestamps, data["timestamp"][150:])
+    np.testing.assert_allclose(reads[0]["acc_2"], data["acc"][2, 150:220])
+
+    source.start()
+    assert len(source.read()) == 70
+    source.stop()
+
+
+def test_file_source_read_all(tmp_path, data):
+    path = tmp_path / "data.parquet"
+    write_file(data, path)
+    source = FileSource(path, lines_per_read=-1, line_offset=200, chunk_size=100)
+    source.start()
+    # Like DataFrameSource, every read returns all the data
+    for _ in range(2):
+        read = source.read()
+        assert len(read) == 800
+        np.testing.assert_allclose(read["timestamp"], data["timestamp"][200:])
+    assert isinstance(source, DataFrameSource)
+    assert list(source.data.columns) == ["timestamp", "acc_0", "acc_1", "acc_2"]
+    assert source.data.index[0] == 200
+    np.testing.assert_allclose(source.data["acc_1"], data["acc"][1, 200:])
+    with pytest.raises(Exception):
+        FileSource(tmp_path / "data.txt")
+
+
+def test_dataframe_source():
+    df = pd.DataFrame({"a": np.arange(12), "b": np.arange(12) * 2.0})
+    source = DataFrameSource(df, lines_per_read=5)
+    source.start()
+    reads = [source.read() for _ in range(4)]
+    assert [len(r) for r in reads] == [5, 5, 2, 0]
+    np.testing.assert_array_equal(reads[1]["b"], np.arange(5, 10) * 2.0)
@@ -0,0 +1,77 @@
+import pytest
+import numpy as np
+from ahrs.filters import Madgwick
+
+from genki_signals import fusion
+from genki_signals.fusion import FusionAHRS, MadgwickAHRS, OffsetGyro
+
+
+@pytest.fixture
+def imu():
+    rng = np.random.default_rng(0)
+    t = np.arange(2000) / 100
+    gyro = np.stack([30 * np.sin(t), 20 * np.cos(0.7 * t), 10 * np.sin(0.3 * t)], axis=1) + rng.normal(size=(2000, 3))
+    gyro[500:1200] = 0.5 * rng.normal(size=(700, 3)) + 0.2  # still s.t. the offset is updated
+    acc = np.array([0.0, 0.0, 1.0]) + 0.05 * rng.normal(size=(2000, 3))
+    return gyro, acc
+
+
+def _in_chunks(fn, *inputs, chunk_sizes=(1, 332, 667, 1000)):
+    bounds = np.cumsum([0, *chunk_sizes])
+    return np.concatenate([fn(*[x[a:b] for x in inputs]) for a, b in zip(bounds[:-1], bounds[1:])])
+
+
+def test_offset_gyro_batch(imu):
+    gyro, _ = imu
+    looped = OffsetGyro(100)
+    expected = np.array([looped.update(g) for g in gyro])
+    batched = OffsetGyro(100)
+    np.testing.assert_allclose(_in_chunks(batched.update_batch, gyro), expected, atol=1e-12)
+    np.testing.assert_allclose(batched._offset, looped._offset, atol=1e-12)
+    assert np.any(batched._offset != 0)
+
+
+def test_madgwick_matches_ahrs(imu):
+    gyro, acc = imu
+    gyro = np.radians(gyro)
+    madgwick = Madgwick(gain=0.033, frequency=100)
+    q = np.array([1.0, 0.0, 0.0, 0.0])
+    expected = []
+    for g, a in zip(gyro, acc):
+        q = madgwick.updateIMU(q, g, a)
+        expected.append(q)
+    result = _in_chunks(MadgwickAHRS(100, gain=0.033).update_batch, gyro, acc)
+    np.testing.assert_allclose(result, np.array(expected), atol=1e-10)
+
+
+def test_fusion_matches_imufusion(imu):
+    imufusion = pytest.importorskip("imufusion")
+    if not hasattr(imufusion, "AhrsSettings"):
+        pytest.skip("Requires the imufusion settings API with sample_rate")
+    gyro, acc = imu
+    settings = imufusion.AhrsSettings()
+    settings.gain = 0.5
+    settings.sample_rate = 100
+    settings.acceleration_rejection = 90
+    settings.magnetic_rejection = 90
+    settings.rejection_timeout = 300
+    ahrs = imufusion.Ahrs()
+    ahrs.set_settings(settings)
+    expected = []
+    for g, a in zip(gyro, acc):
+        ahrs.update_no_magnetometer(g, a)
+        expected.append(ahrs.get_quaternion())
+    result = _in_chunks(FusionAHRS(100, gain=0.5).update_batch, gyro, acc)
+    # imufusion computes in single precision
+    np.testing.assert_allclose(result, np.array(expected), atol=2e-3)
+
+
+def test_fallback_without_numba_warns_once(monkeypatch, caplog):
+    monkeypatch.setattr(fusion, "NUMBA_AVAILABLE", False)
+    monkeypatch.setattr(fusion, "_warned_no_numba", False)
+    kernel = getattr(fusion._offset_kernel, "py_func", fusion._offset_kernel)
+    gyro = np.ones((5, 3))
+    for _ in range(2):
+        out, state = fusion._run_kernel(kernel, [gyro], 3, 0.0, 0.0, 0.0, 0, 0.1, 10, 1.0)
+    np.testing.assert_array_equal(out, gyro)
+    assert sum("numba is not installed" in r.message for r in caplog.records) == 1
@@ -0,0 +1,56 @@
+import time
+
+import numpy as np
+
+from genki_signals.buffers import DataBuffer
+from genki_signals.functions.arithmetic import Scale
+from genki_signals.functions.pipeline import Pipeline
+from genki_signals.instrumentation import Histogram, Instrumentation
+from genki_signals.sources import Sampler
+from genki_signals.system import System
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+    for value in [1, 2, 3, 100, 1000]:
+        histogram.record(value)
+    assert histogram.count == 5
+    assert histogram.mean == 1106 / 5
+    assert histogram.max == 1000
+    assert 3 <= histogram.percentile(50) < 8
+    assert histogram.percentile(100) == 1000
+
+
+def test_pipeline_instrumentation():
+    instrumentation = Instrumentation()
+    pipeline = Pipeline([Scale("a", "b", 2.0), Scale("b", "c", 2.0)], instrumentation=instrumentation)
+    data = DataBuffer(data={"a": np.arange(10.0)})
+    for _ in range(3):
+        pipeline(data)
+    instrumentation.record_tick(1000, latency_ns=2000)
+
+    snapshot = instrumentation.snapshot()
+    assert set(snapshot["functions"]) == {"b", "c"}
+    assert snapshot["functions"]["b"]["calls"] == 3
+    assert snapshot["functions"]["b"]["samples_in"] == 30
+    assert snapshot["functions"]["c"]["samples_out"] == 30
+    assert snapshot["tick"]["count"] == 1
+    assert snapshot["latency"]["latency_max_ms"] == 2000 / 1e6
+
+    df = instrumentation.to_dataframe()
+    assert list(df.index) == ["b", "c"]
+    instrumentation.reset()
+    assert instrumentation.snapshot()["functions"] == {}
+
+
+def test_polling_system_records_latency():
+    source = Sampler({"value": lambda: 1.0}, sample_rate=200)
+    system = System(source, update_rate=20, instrumentation=True)
+    system.register_data_feed("test", lambda d: None)
+    with system:
+        time.sleep(0.3)
+    snapshot = system.instrumentation.snapshot()
+    assert snapshot["latency"]["count"] > 0
+    # Polling every 50 ms, the first data point of a tick waits up to that long
+    assert 0 < snapshot["latency"]["latency_max_ms"] < 200
+    assert source.notifier is None
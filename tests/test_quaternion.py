@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from scipy.spatial.transform import Rotation
+
+from genki_signals import quaternion
+
+
+@pytest.fixture
+def qs():
+    q = Rotation.random(50, random_state=0).as_quat()  # (x, y, z, w)
+    return q[:, [3, 0, 1, 2]].T.copy()
+
+
+def to_scipy(qs):
+    return Rotation.from_quat(qs[[1, 2, 3, 0]].T)
+
+
+def test_rotate(qs):
+    v = np.random.default_rng(0).normal(size=(3, 50))
+    expected = to_scipy(qs).apply(v.T).T
+    np.testing.assert_allclose(quaternion.rotate(qs, v), expected, atol=1e-12)
+    # In place and with a single vector
+    quaternion.rotate(qs, v, out=v)
+    np.testing.assert_allclose(v, expected, atol=1e-12)
+    np.testing.assert_allclose(quaternion.rotate(qs, np.array([1.0, 0, 0])), to_scipy(qs).as_matrix()[:, :, 0].T)
+
+
+def test_rotate_with_work_buffer(qs):
+    v = np.random.default_rng(1).normal(size=(3, 50))
+    expected = to_scipy(qs).apply(v.T).T
+    out, work = np.empty((3, 50)), np.empty((3, 3, 50))
+    assert quaternion.rotate(qs, v, out=out, work=work) is out
+    np.testing.assert_allclose(out, expected, atol=1e-12)
+    # A single quaternion and vector
+    single = quaternion.rotate(qs[:, 0], v[:, 0], work=np.empty((3, 3)))
+    np.testing.assert_allclose(single, expected[:, 0], atol=1e-12)
+
+
+def test_multiply_and_conjugate(qs):
+    p = np.roll(qs, 1, axis=1)
+    expected = (to_scipy(p) * to_scipy(qs)).as_matrix()
+    np.testing.assert_allclose(to_scipy(quaternion.multiply(p, qs)).as_matrix(), expected, atol=1e-12)
+
+    identity = quaternion.multiply(qs, quaternion.conjugate(qs))
+    np.testing.assert_allclose(identity, np.array([[1.0, 0, 0, 0]]).T.repeat(50, axis=1), atol=1e-12)
+    quaternion.multiply(p, qs, out=p)
+    np.testing.assert_allclose(to_scipy(p).as_matrix(), expected, atol=1e-12)
+
+
+def test_to_euler(qs):
+    expected = to_scipy(qs).as_euler("ZYX")[:, ::-1].T
+    np.testing.assert_allclose(quaternion.to_euler(qs), expected, atol=1e-12)
+
+
+def test_to_axis_angle(qs):
+    qs = qs * np.sign(qs[0])  # Angles up to 180 degrees, like scipy
+    result = quaternion.to_axis_angle(np.concatenate([qs, [[1.0], [0], [0], [0]]], axis=1))
+    rotvec = to_scipy(qs).as_rotvec().T
+    np.testing.assert_allclose(np.deg2rad(result[0, :-1]) * result[1:, :-1], rotvec, atol=1e-12)
+    np.testing.assert_array_equal(result[:, -1], 0)
+
+
+def test_gravity(qs):
+    expected = quaternion.rotate(quaternion.conjugate(qs), np.array([0.0, 0, 1]))
+    np.testing.assert_allclose(quaternion.gravity(qs), expected, atol=1e-12)
@@ -0,0 +1,187 @@
+import pickle
+import time
+
+import numpy as np
+import pytest
+
+from genki_signals.buffers import DataBuffer
+from genki_signals.data_formats import iter_chunks, memmap_wav, read_chunked_file
+from genki_signals.recorders import (
+    AsyncRecorder,
+    ChunkedFileRecorder,
+    ColumnarRecorder,
+    PickleRecorder,
+    Recorder,
+    WavFileRecorder,
+)
+from genki_signals.session import Session, write_json_file
+
+
+def _make_chunks(n_chunks, chunk_size=7):
+    for i in range(n_chunks):
+        t = np.arange(i * chunk_size, (i + 1) * chunk_size)
+        yield DataBuffer(
+            data={
+                "timestamp": t / 100,
+                "acc": np.stack([t, -t, 2 * t]).astype(np.float32),
+                "button": (t % 2).astype(np.int8),
+            }
+        )
+
+
+def test_chunked_recorder_round_trip(tmp_path):
+    session_path = tmp_path / "session"
+    session_path.mkdir()
+    write_json_file(session_path / "metadata.json", {"signal_functions": []})
+
+    expected = DataBuffer()
+    recorder = ChunkedFileRecorder(session_path / "raw_data.chunks", rec_buffer_size=10)
+    for chunk in _make_chunks(9):
+        recorder.write(chunk)
+        expected.extend(chunk)
+    recorder.stop()
+
+    assert len(list(iter_chunks(session_path / "raw_data.chunks"))) > 1
+    raw_data = Session.from_filename(session_path).raw_data
+    for key in expected:
+        assert raw_data[key].dtype == expected[key].dtype
+        np.testing.assert_array_equal(raw_data[key], expected[key])
+
+
+def test_chunked_file_ignores_truncated_chunk(tmp_path):
+    path = tmp_path / "raw_data.chunks"
+    recorder = ChunkedFileRecorder(path, rec_buffer_size=0)
+    for chunk in _make_chunks(3):
+        recorder.write(chunk)
+    recorder.stop()
+
+    with open(path, "r+b") as f:
+        f.truncate(path.stat().st_size - 20)
+    data = read_chunked_file(path)
+    assert len(data) == 14
+
+
+def test_pickle_recorder_appends_across_flushes(tmp_path):
+    path = tmp_path / "raw_data.pickle"
+    recorder = PickleRecorder(path, rec_buffer_size=10)
+    for chunk in _make_chunks(5):
+        recorder.write(chunk)
+    recorder.stop()
+
+    session_data = DataBuffer()
+    for chunk in _make_chunks(5):
+        session_data.extend(chunk)
+    with open(path, "rb") as f:
+        data = pickle.load(f)
+    np.testing.assert_array_equal(data["acc"], session_data["acc"])
+
+
+class SlowRecorder(Recorder):
+    def __init__(self, delay):
+        self.delay = delay
+        self.data = DataBuffer()
+        self.stopped = False
+
+    def write(self, data):
+        time.sleep(self.delay)
+        self.data.extend(data)
+
+    def stop(self):
+        self.stopped = True
+
+
+def test_async_recorder_drains_on_stop():
+    inner = SlowRecorder(delay=0.01)
+    recorder = AsyncRecorder(inner, flush_bytes=1, flush_interval=None)
+    start = time.perf_counter()
+    for chunk in _make_chunks(20):
+        recorder.write(chunk)
+    assert time.perf_counter() - start < 0.1
+    recorder.stop()
+
+    assert inner.stopped
+    assert len(inner.data) == 140
+    stats = recorder.stats()
+    assert stats["dropped_chunks"] == 0
+    assert stats["queue_depth"] == 0
+    assert stats["bytes_written"] == sum(v.nbytes for chunk in _make_chunks(20) for v in chunk.values())
+
+
+def test_async_recorder_drops_when_full():
+    inner = SlowRecorder(delay=0.2)
+    recorder = AsyncRecorder(inner, max_queue_size=2, flush_bytes=1, flush_interval=None)
+    for chunk in _make_chunks(10):
+        recorder.write(chunk)
+    recorder.stop()
+    assert recorder.dropped_chunks > 0
+    assert len(inner.data) == 7 * (10 - recorder.dropped_chunks)
+
+
+class FailingRecorder(Recorder):
+    def __init__(self, error):
+        self.error = error
+        self.stopped = False
+
+    def write(self, data):
+        raise self.error
+
+    def stop(self):
+        self.stopped = True
+
+
+def test_async_recorder_counts_and_raises_write_errors():
+    inner = FailingRecorder(TypeError("can't write object arrays"))
+    recorder = AsyncRecorder(inner, flush_bytes=1, flush_interval=None)
+    for chunk in _make_chunks(5):
+        recorder.write(chunk)
+    recorder.write(DataBuffer(data={"acc": np.zeros(3)}))
+    with pytest.raises(TypeError):
+        recorder.stop()
+    assert inner.stopped
+    assert recorder.dropped_chunks == 6
+    assert recorder.stats()["bytes_written"] == 0
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_async_recorder_stops_after_io_thread_died():
+    # SystemExit isn't caught by the I/O thread, which just ends
+    recorder = AsyncRecorder(FailingRecorder(SystemExit()), max_queue_size=1, flush_bytes=1, flush_interval=None)
+    recorder.write(DataBuffer(data={"x": np.zeros(3)}))
+    recorder._thread.join(timeout=1)
+    for chunk in _make_chunks(3):
+        recorder.write(chunk)
+    recorder.stop()
+    assert recorder.dropped_chunks == 3
+
+
+def test_columnar_recorder_round_trip(tmp_path):
+    session_path = tmp_path / "session"
+    session_path.mkdir()
+    write_json_file(session_path / "metadata.json", {"signal_functions": []})
+
+    expected = DataBuffer()
+    recorder = ColumnarRecorder(session_path / "raw_data.columns")
+    for chunk in _make_chunks(5):
+        recorder.write(chunk)
+        expected.extend(chunk)
+        recorder.flush()
+    recorder.stop()
+
+    raw_data = Session.from_filename(session_path).raw_data
+    assert isinstance(raw_data["acc"], np.memmap)
+    for key in expected:
+        assert raw_data[key].dtype == expected[key].dtype
+        np.testing.assert_array_equal(raw_data[key], expected[key])
+        np.testing.assert_array_equal(raw_data[key][..., 10:20], expected[key][..., 10:20])
+
+
+def test_memmap_wav(tmp_path):
+    path = tmp_path / "raw_data.wav"
+    audio = (np.arange(2000) % 300 - 150).astype(np.int16)
+    recorder = WavFileRecorder(path.as_posix(), frame_rate=8000, n_channels=2, sample_width=2)
+    recorder.write({"audio": audio})
+    recorder.stop()
+
+    mapped = memmap_wav(path)
+    assert isinstance(mapped, np.memmap)
+    np.testing.assert_array_equal(mapped, audio)
@@ -0,0 +1,118 @@
+import threading
+
+import numpy as np
+import pytest
+
+from genki_signals.sources.ring import RecordRing
+
+
+def test_ring_wraps_around():
+    ring = RecordRing(capacity=4)
+    for i in range(3):
+        ring.put({"timestamp": float(i), "acc": np.full(3, i)})
+    ring.consume(2)
+    for i in range(3, 6):
+        ring.put({"timestamp": float(i), "acc": np.full(3, i)})
+    assert [record["timestamp"] for record in ring.peek()] == [2, 3, 4, 5]
+
+    data = ring.read_buffer()
+    assert len(ring) == 0
+    assert ring._slots == [None] * 4
+    np.testing.assert_array_equal(data["acc"], np.arange(2, 6) * np.ones((3, 1)))
+    with pytest.raises(IndexError):
+        ring.consume(1)
+
+
+def test_ring_drops_when_full():
+    ring = RecordRing(capacity=2)
+    assert [ring.put({"x": i}) for i in range(4)] == [True, True, False, False]
+    assert ring.dropped == 2
+    assert [record["x"] for record in ring.read()] == [0, 1]
+
+
+def test_ring_blocks_until_consumed():
+    ring = RecordRing(capacity=2, overflow="block", block_timeout=1)
+    ring.put({"x": 0})
+    ring.put({"x": 1})
+    timer = threading.Timer(0.05, ring.consume, args=(1,))
+    timer.start()
+    assert ring.put({"x": 2})
+    assert [record["x"] for record in ring.read()] == [1, 2]
+    ring = RecordRing(capacity=1, overflow="block", block_timeout=0.01)
+    ring.put({"x": 0})
+    assert not ring.put({"x": 1})
+    assert ring.dropped == 1
+    assert len(RecordRing().read_buffer()) == 0
+
+
+def test_ring_single_producer_single_consumer():
+    ring = RecordRing(capacity=64, overflow="block")
+    n = 20000
+
+    def produce():
+        for i in range(n):
+            ring.put({"i": i, "v": np.array([i, -i])})
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    chunks, n_read = [], 0
+    while n_read < n:
+        if len(ring) > 0:
+            chunks.append(ring.read_buffer())
+            n_read += len(chunks[-1])
+    producer.join()
+    np.testing.assert_array_equal(np.concatenate([data["i"] for data in chunks]), np.arange(n))
+    np.testing.assert_array_equal(np.concatenate([data["v"][1] for data in chunks]), -np.arange(n))
+
+
+def test_ring_chunked_records():
+    ring = RecordRing(capacity=8)
+    for i in range(3):
+        ring.put({"timestamp": np.array([i]), "audio": np.arange(4) + 4 * i, "level": 0.5})
+    data = ring.read_buffer(chunked=True)
+    np.testing.assert_array_equal(data["audio"], np.arange(12))
+    np.testing.assert_array_equal(data["timestamp"], [0, 1, 2])
+    np.testing.assert_array_equal(data["level"], [0.5] * 3)
+
+
+def test_ring_widens_dtypes():
+    ring = RecordRing(capacity=4)
+    ring.put({"timestamp": 0, "label": "a"})
+    ring.put({"timestamp": 1.5, "label": "long"})
+    data = ring.read_buffer()
+    np.testing.assert_array_equal(data["timestamp"], [0, 1.5])
+    np.testing.assert_array_equal(data["label"], ["a", "long"])
+
+
+def test_ring_discards_other_schemas():
+    ring = RecordRing(capacity=8)
+    ring.put({"timestamp": 0.0, "acc": np.zeros(3)})
+    assert ring.put({"timestamp": 1.0, "gyro": np.zeros(3)})
+    assert ring.put({"timestamp": 2.0, "acc": np.zeros(4)})
+    ring.put({"timestamp": 3.0, "acc": np.ones(3)})
+    data = ring.read_buffer()
+    np.testing.assert_array_equal(data["timestamp"], [0, 3])
+    assert ring.invalid == 2
+    ring.put({"timestamp": 4.0, "gyro": np.zeros(3)})
+    assert len(ring.read_buffer()) == 0
+    assert ring.invalid == 3
+
+
+def test_ring_default_capacity_from_record_size():
+    ring = RecordRing(max_bytes=2**20)
+    ring.put({"timestamp": 0.0, "frame": np.zeros((120, 160, 3), dtype=np.uint8)})
+    assert ring.capacity == 2**20 // (120 * 160 * 3 + 8)
+
+    ring = RecordRing()
+    ring.put({"timestamp": 0.0})
+    assert ring.capacity == 4096
+
+
+def test_ring_chunks_of_different_lengths():
+    ring = RecordRing(capacity=8)
+    ring.put({"timestamp": np.array([0]), "audio": np.zeros((2, 4))})
+    ring.put({"timestamp": np.array([1]), "audio": np.ones((2, 3))})
+    ring.put({"timestamp": np.array([2]), "audio": np.ones((3, 3))})
+    data = ring.read_buffer(chunked=True)
+    assert data["audio"].shape == (2, 7)
+    assert ring.invalid == 1
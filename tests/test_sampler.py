@@ -0,0 +1,99 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from genki_signals.sources.sampler import BusyThread, Sampler, SharedClock
+
+
+def test_sampler_timestamps_are_scheduled():
+    sampler = Sampler({"value": lambda: 1.0}, sample_rate=500)
+    sampler.start()
+    time.sleep(0.2)
+    sampler.stop()
+    timestamps = sampler.read()["timestamp"]
+    assert len(timestamps) > 50
+    # Up to the float64 resolution of epoch timestamps
+    np.testing.assert_allclose(np.diff(timestamps), 1 / 500, atol=1e-6)
+    assert sampler.stats.ticks == len(timestamps)
+    assert sampler.stats.dropped == 0
+
+
+def test_rate_does_not_drift():
+    n_calls = []
+    thread = BusyThread(0.002, lambda t: n_calls.append(t) or time.sleep(0.0015))
+    thread.start()
+    time.sleep(0.3)
+    thread.stop()
+    thread.join()
+    # Sleeping in the callback doesn't lower the rate as long as it fits in the interval
+    assert len(n_calls) > 0.8 * 0.3 / 0.002
+    assert thread.stats.jitter_ns.count == len(n_calls)
+
+
+@pytest.mark.parametrize("late_policy", ["catch_up", "drop"])
+def test_late_policy(late_policy):
+    timestamps = []
+    stall = threading.Event()
+
+    def callback(t):
+        timestamps.append(t)
+        if len(timestamps) == 5:
+            stall.set()
+            time.sleep(0.05)
+
+    thread = BusyThread(0.005, callback, late_policy=late_policy)
+    thread.start()
+    stall.wait(1)
+    time.sleep(0.1)
+    thread.stop()
+    thread.join()
+    steps = np.round(np.diff(timestamps) / 0.005)
+    assert thread.stats.overruns >= 1
+    if late_policy == "drop":
+        assert thread.stats.dropped >= 5
+        assert steps.max() > 5
+    else:
+        assert thread.stats.dropped == 0
+        assert np.all(steps == 1)
+
+
+def test_unknown_late_policy():
+    with pytest.raises(ValueError):
+        BusyThread(0.01, lambda t: None, late_policy="skip")
+
+
+def test_shared_clock():
+    clock = SharedClock(base_rate=400)
+    fast = Sampler({"value": lambda: 1.0}, sample_rate=200, clock=clock)
+    slow = Sampler({"value": lambda: 2.0}, sample_rate=100, clock=clock)
+    fast.start()
+    slow.start()
+    time.sleep(0.2)
+    slow.stop()
+    assert clock.stats is not None and clock._running
+    fast.stop()
+    assert not clock._running
+
+    fast_ts, slow_ts = fast.read()["timestamp"], slow.read()["timestamp"]
+    assert len(slow_ts) > 10
+    np.testing.assert_allclose(np.diff(fast_ts), 1 / 200, atol=1e-6)
+    np.testing.assert_allclose(np.diff(slow_ts), 1 / 100, atol=1e-6)
+    # Every tick of the slow sampler coincides with a tick of the fast one
+    assert np.isin(slow_ts, fast_ts).all()
+
+    with pytest.raises(ValueError):
+        Sampler({"value": lambda: 1.0}, sample_rate=300, clock=clock)
+
+
+def test_shared_clock_ignores_ticks_of_other_threads():
+    clock = SharedClock(base_rate=100)
+    calls = []
+    clock.subscribe(calls.append, rate=100)
+    clock.unsubscribe(calls.append)
+    n_calls = len(calls)
+    # Like a late tick of a stopped clock thread, after the clock was restarted
+    clock._subscribers = ((1, calls.append),)
+    clock._tick(0.0)
+    assert len(calls) == n_calls
@@ -0,0 +1,60 @@
+import pytest
+import numpy as np
+
+import genki_signals.functions as sf
+from genki_signals.buffers import DataBuffer
+from genki_signals.recorders import ColumnarRecorder
+from genki_signals.session import Session, write_json_file
+
+
+@pytest.fixture
+def session(tmp_path):
+    path = tmp_path / "session"
+    path.mkdir()
+    functions = [
+        sf.Differentiate("acc", "timestamp", name="jerk"),
+        sf.MovingAverage("acc_0", name="acc_0_avg", length=25),
+        sf.Delay("acc_0_avg", n=5, name="acc_0_delayed"),
+        sf.Integrate("acc_1", "timestamp", name="vel_1"),
+        sf.LowPassFilter("acc_2", name="acc_2_low", order=2, cutoff_freq=10, sample_rate=100),
+        sf.Scale("missing_signal", name="never_computed", scale_factor=2.0),
+    ]
+    write_json_file(path / "metadata.json", {"signal_functions": functions})
+
+    rng = np.random.default_rng(0)
+    n = 2000
+    recorder = ColumnarRecorder(path / "raw_data.columns")
+    recorder.write(DataBuffer(data={"timestamp": np.arange(n) / 100, "acc": rng.normal(size=(3, n))}))
+    recorder.stop()
+    return Session.from_filename(path)
+
+
+@pytest.mark.parametrize("keys", [["acc_0_delayed", "jerk"], ["vel_1"], ["acc_2_low", "acc_1", "timestamp"]])
+def test_get_data_time_range(session, keys):
+    full = session.get_data(keys=keys)
+    excerpt = session.get_data(start=10.0, end=12.5, keys=keys)
+    assert set(excerpt.keys()) == set(keys)
+    for key in keys:
+        assert excerpt[key].shape[-1] == 250
+        np.testing.assert_allclose(excerpt[key], full[key][..., 1000:1250], atol=1e-6)
+
+
+def test_get_data_only_computes_required_functions(session):
+    with pytest.raises(ValueError, match="missing_signal"):
+        session.get_data()
+    data = session.get_data(end=1.0, keys=["jerk"])
+    assert list(data.keys()) == ["jerk"]
+    np.testing.assert_array_equal(data["jerk"], session.get_data(keys=["jerk"])["jerk"][..., :100])
+
+
+@pytest.mark.parametrize("overlap", [0, 32])
+def test_get_data_time_range_windows(session, overlap):
+    fft = sf.FourierTransform("acc_0", name="fft", window_size=64, window_overlap=overlap)
+    session.add_metadata_field("signal_functions", session.functions + [fft])
+    stride = 64 - overlap
+    full = session.get_data(keys=["fft"])["fft"]
+    excerpt = session.get_data(start=10.0, end=12.5, keys=["fft"])["fft"]
+    # The windows that start in [1000, 1250) and end before 1250
+    first, last = -(-1000 // stride), (1250 - 64) // stride + 1
+    assert excerpt.shape[-1] == last - first
+    np.testing.assert_allclose(excerpt, full[..., first:last], atol=1e-9)
@@ -0,0 +1,104 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from genki_signals.functions.arithmetic import MovingAverage, Scale
+from genki_signals.sources import DataFrameSource, Sampler
+from genki_signals.sources.base import DataNotifier
+from genki_signals.system import System
+
+
+def test_notifier_min_count_and_max_wait():
+    notifier = DataNotifier()
+    notifier.notify()
+    start = time.perf_counter()
+    assert notifier.wait(min_count=5, max_wait=0.05) == 1
+    assert 0.04 < time.perf_counter() - start < 0.5
+    assert notifier.reset()[0] == 1
+
+    threading.Timer(0.05, notifier.wake).start()
+    assert notifier.wait() == 0
+
+
+def test_event_driven_system_receives_all_data():
+    source = Sampler({"value": lambda: 1.0}, sample_rate=200)
+    system = System(source, update_rate=1, event_driven=True, min_batch_size=2)
+    received = []
+    system.register_data_feed("test", lambda d: received.append(d["timestamp"]))
+    with system:
+        time.sleep(0.3)
+    assert source.notifier is None
+    timestamps = np.concatenate(received)
+    # With update_rate=1 polling would have read at most once
+    assert len(received) > 5
+    assert np.all(np.diff(timestamps) > 0)
+
+
+class SlowScale(Scale):
+    def __call__(self, x):
+        time.sleep(0.005)
+        return super().__call__(x)
+
+
+def test_register_data_feed_while_running_in_parallel():
+    source = Sampler({"value": lambda: 1.0}, sample_rate=200)
+    # Slow functions s.t. the pipeline is rebuilt while the main thread is running it
+    functions = [
+        SlowScale("value", name="double", scale_factor=2.0),
+        SlowScale("value", name="triple", scale_factor=3.0),
+    ]
+    system = System(source, functions, update_rate=100, max_workers=4)
+    received = []
+    with system:
+        time.sleep(0.1)
+        for i in range(20):
+            system.register_data_feed(i, lambda d: received.append(d["triple"]))
+            time.sleep(0.005)
+            system.deregister_data_feed(i)
+        time.sleep(0.1)
+        assert system.main_thread.is_alive()
+    assert len(received) > 0
+    np.testing.assert_array_equal(np.concatenate(received), 3.0)
+
+    # The thread pool is recreated when the system is started again
+    with system:
+        time.sleep(0.05)
+        assert system.main_thread.is_alive()
+
+
+def test_invalid_functions_raise_up_front():
+    source = Sampler({"value": lambda: 1.0}, sample_rate=100)
+    with pytest.raises(ValueError, match="cyclic"):
+        System(source, [Scale("b", name="a", scale_factor=1.0), Scale("a", name="b", scale_factor=1.0)])
+
+    # The inputs are only known once the source has started
+    system = System(DataFrameSource(pd.DataFrame({"value": np.arange(10.0)})), [Scale("value", "double", 2.0)])
+    system.start()
+    with pytest.raises(ValueError, match="Missing signals"):
+        system.add_derived_signal(Scale("missing", "nothing", 1.0))
+    assert len(system.functions) == 1
+    system.stop()
+
+    system = System(DataFrameSource(pd.DataFrame({"value": np.arange(10.0)})), [Scale("missing", "nothing", 1.0)])
+    with pytest.raises(ValueError, match="Missing signals"):
+        system.start()
+    assert not system.is_active
+
+
+def test_stateful_functions_are_not_pruned():
+    source = DataFrameSource(pd.DataFrame({"value": np.arange(100.0)}), lines_per_read=10)
+    functions = [MovingAverage("value", "average", length=20), Scale("value", "double", 2.0)]
+    system = System(source, functions, outputs=["double"])
+    system.register_data_feed("double", lambda d: None, keys=["double"])
+    source.start()
+    for _ in range(5):
+        system._read()
+    received = []
+    system.register_data_feed("average", lambda d: received.append(d["average"]), keys=["average"])
+    for _ in range(5):
+        received.append(system._read()["average"])
+    expected = MovingAverage("value", "average", length=20)(np.arange(100.0))
+    np.testing.assert_allclose(np.concatenate(received), expected[50:])